@@ -3,7 +3,8 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.utils.config import get_db
 from app.utils.jwt_security import verify_password,hash_password,create_access_token
-from app.utils.dependencies import require_role
+from app.utils.dependencies import require_role, get_current_user
+from app.utils.session_cache import session_cache, hash_token
 from app.apis.api_schema import LoginRequest, CreateUserRequest
 from pydantic import BaseModel
 from datetime import datetime, timedelta
@@ -33,6 +34,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
     session = UserSession(
         user_id=user.id,
         access_token=access_token,
+        token_hash=hash_token(access_token),
         expires_at=datetime.utcnow() + timedelta(hours=1)
     )
 
@@ -71,3 +73,43 @@ def create_user(
     db.commit()
 
     return {"message": "User created successfully"}
+
+
+# end the caller's session; the token stops working immediately
+@auth_router.post("/logout")
+def logout(
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db)):
+
+    db.query(UserSession).filter(UserSession.id == user.session_id).update(
+        {UserSession.is_active: False}, synchronize_session=False)
+    db.commit()
+
+    session_cache.invalidate_session(user.session_id)
+
+    return {"message": "Logged out"}
+
+
+# disable a user and end all of their sessions (Admin only)
+@auth_router.post("/users/{user_id}/deactivate")
+def deactivate_user(
+    user_id: str,
+    user=Depends(require_role(80)),
+    db: Session = Depends(get_db)):
+
+    target = db.query(User).filter(User.id == user_id).first()
+
+    if not target:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if target.role.level >= user["role_level"]:
+        raise HTTPException(status_code=403, detail="Cannot deactivate a user with an equal or higher role")
+
+    target.is_active = False
+    db.query(UserSession).filter(UserSession.user_id == target.id).update(
+        {UserSession.is_active: False}, synchronize_session=False)
+    db.commit()
+
+    session_cache.invalidate_user(target.id)
+
+    return {"message": "User deactivated"}
@@ -1,291 +1,598 @@
 # chat.py
 # version 3
 
+import asyncio
 import logging
-from aiohttp import request
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import delete
+from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from app.kb_loader import load_kbs, parse_markdown, sanitize_metadata
-from app.apis.api_schema import ChatRequest, ChatResponse, KBReference
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.kb_loader import load_kbs, ingest_kb_files, IngestReport, KB_DIR
+from app.apis.api_schema import ChatRequest, ChatResponse, KBReference, GuardrailStatus
 from app.apis.api_schema import KBCreateRequest, KBUpdateRequest
 from app.utils.dependencies import get_current_user
-from app.utils.config import get_db
-from app.utils.config import OPENAI_API_KEY
-from app.models.database import KBDocument, Message, UserSession, Conversation, Ticket, GuardrailEvent
-from app.llm_services.retriever import retrieve_kb
-from app.llm_services.llm import generate_answer, compute_response_confidence
-from app.llm_services.escalate_classifier import classify_tier, classify_severity, should_escalate
+from app.utils.config import get_db, get_async_db, AsyncSessionLocal
+from app.utils.config import CHAT_FAST_ESCALATION
+from app.models.database import KBSource, Message, UserSession, Conversation, Ticket, GuardrailEvent
+from app.llm_services.retriever import aretrieve_kb, aembed_question
+from app.llm_services.answer_cache import answer_cache
+from app.llm_services.conversation_memory import load_memory, is_follow_up
+from app.llm_services.providers import providers
+from app.llm_services.llm import agenerate_answer, astream_answer, compute_response_confidence
+from app.llm_services.escalate_classifier import (classify_tier, classify_severity, should_escalate,
+    match_keywords, frustration_score, is_repeated_failure, forced_tier)
 from app.utils.Guardrail import check_guardrail
+from app.apis.pydantic_models import TierLevel, SeverityLevel
+from app.utils.ticket_ids import allocate_ticket_id
+from app.utils.turn_writer import PendingTurn, turn_writer
+from app.utils.stage_timer import StageTimer, stage, timed
+from app.utils.stage_graph import StageGraph
+from app.utils.prometheus import (CHAT_STAGE_SECONDS, CHAT_TURNS, ESCALATIONS, GUARDRAIL_BLOCKS,
+    SPECULATIVE_RETRIEVALS)
 from app.models.database import User
 from uuid import uuid4
 from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional
 import json
+import time
 
 router = APIRouter()
 
-# Chat Endpoint for user to ask question
+logger = logging.getLogger(__name__)
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(
-    req: ChatRequest,
-    current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    try:
+OUT_OF_SCOPE_REPLY = (
+    "I'm sorry, I can only answer questions related to the CyberLab "
+    "Training Platform — such as authentication, virtual labs, containers, "
+    "DNS, and access issues.If you believe this is a platform-related "
+    "issue, please try rephrasing your question."
+)
 
-        # Validate Active Session
-        session = db.query(UserSession).filter(UserSession.id == req.sessionId,
-        UserSession.user_id == current_user["sub"],
-        UserSession.is_active == True).first()
+GUARDRAIL_REPLY = "I'm sorry, the question you asked violates our usage policies and cannot be processed."
 
-        if not session:
-            raise HTTPException(401, "No active session")
+FORCED_ESCALATION_REPLY = (
+    "This request needs a support engineer, so I have not attempted an "
+    "automated answer. It has been escalated with priority and a ticket "
+    "has been created for you."
+)
 
-        # Get or create conversation
-        conversation = db.query(Conversation).filter(
-            Conversation.session_id == session.id).first()
-
-        if not conversation:
-            conversation = Conversation(session_id=session.id,
-                user_role=current_user["role"])
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-
-        # Fetch User Role from DB
-        user = db.query(User).filter(User.id == current_user["sub"]).first()
-        user_role = user.role.name
-        print(f"User {user.email} with role {user_role} (level {user.role.level}) is making a request.")
-
-        prior_assistant_messages = db.query(Message).filter(
-            Message.conversation_id == conversation.id,
-            Message.role == "assistant"
-        ).count()
-
-        FRUSTRATION_WEIGHTS = {
-            "still not working": 3,
-            "didn't work": 3,
-            "doesn't work": 3,
-            "same issue": 2,
-            "already tried": 2,
-            "still stuck": 2,
-            "still broken": 2,
-            "still failing": 2,
-            "keeps happening": 2,
-            "persists": 2,
-            "again": 1,
-            "twice": 1,
-            "multiple times": 1,
-            "tried": 1,
-            "already": 1
-        }
 
-        message_lower = req.message.lower()
+# ================== CHAT TURN HELPERS =================
+# shared by /chat and /chat/stream so both paths make identical decisions
+
+async def load_turn_context(req: ChatRequest, current_user, db: AsyncSession):
+    # current_user is the cached Principal (session, user and role already
+    # resolved by get_current_user), so no identity queries are needed here
+    session_id = current_user.session_id
 
-        frustration_score = sum(
-            weight for phrase, weight in FRUSTRATION_WEIGHTS.items()
-            if phrase in message_lower)
-        print(frustration_score)
+    # Validate Active Session (only when the request names another session of this user)
+    if str(req.sessionId) != session_id:
+        session_id = (await db.execute(select(UserSession.id).where(
+            UserSession.id == req.sessionId,
+            UserSession.user_id == current_user.user_id,
+            UserSession.is_active == True))).scalar()
 
-        # Escalate only if frustration score crosses threshold
-        repeated_failure = frustration_score >= 2
-        print(repeated_failure)
+        if not session_id:
+            raise HTTPException(401, "No active session")
 
-        #================== GUARDRAIL CHECK =================
-        guardrail = check_guardrail(req.message)
+    # Get or create conversation
+    conversation = (await db.execute(select(Conversation).where(
+        Conversation.session_id == session_id))).scalars().first()
+
+    if not conversation:
+        # not stored here: the first turn's PendingTurn writes it together
+        # with the turn's messages (see begin_turn)
+        conversation = Conversation(id=uuid4(), session_id=session_id,
+            user_role=current_user.role_name, context={})
+
+    user = current_user
+    logger.debug(f"User {user.email} with role {user.role_name} (level {user.role_level}) is making a request.")
+
+    return conversation, user
+
+
+def begin_turn(turn: PendingTurn, conversation):
+    # a new conversation is inserted in the same transaction as its first
+    # turn, so a failed or dropped turn never leaves an empty conversation
+    turn.add_if_new(conversation)
+
+
+def detect_repeated_failure(hits: dict) -> bool:
+    logger.debug(f"Frustration score: {frustration_score(hits)}")
+    return is_repeated_failure(hits)
+
+
+@dataclass
+class MessageChecks:
+    hits: dict
+    repeated_failure: bool
+    severity: SeverityLevel
+    guardrail: GuardrailStatus
+    # Tier 3 when the escalation does not depend on KB coverage / the answer
+    forced_tier: Optional[TierLevel] = None
+    # the repeated-failure rule is the only one forcing Tier 3: "still not
+    # working" refers to the earlier turns, so with history the turn is
+    # answered from it (and still escalated); set by resolve_fast_escalation
+    forced_by_repeated_failure: bool = False
+    has_history: Optional[bool] = None
+
+    @property
+    def awaiting_history(self) -> bool:
+        # the fast path is decided once the conversation history is loaded
+        return self.forced_by_repeated_failure and self.has_history is None
+
+    @property
+    def fast_escalation(self) -> bool:
+        # skip retrieval and the LLM: the turn is escalated whatever they return
+        if not CHAT_FAST_ESCALATION or self.guardrail.blocked or self.forced_tier is None:
+            return False
+        return not (self.forced_by_repeated_failure and self.has_history is not False)
+
+    @property
+    def needs_retrieval(self) -> bool:
+        return not self.guardrail.blocked and not self.fast_escalation
+
+
+def screen_message(message: str, hits: dict) -> MessageChecks:
+    # CPU-only checks on the message text; they run on the event loop while
+    # the context / retrieval stages wait on the database and the embedder.
+    # hits: match_keywords(message), shared with start_turn_stages
+    with stage("classifier"):
+        repeated_failure = detect_repeated_failure(hits)
+        # severity needs only the message, tier also needs the KB coverage
+        # unless one of the forced Tier 3 rules applies
+        severity = classify_severity(message, hits=hits)
+        tier = forced_tier(severity, repeated_failure, hits)
+        by_repeated_failure = tier is not None and forced_tier(severity, False, hits) is None
+
+    #================== GUARDRAIL CHECK =================
+    with stage("guardrail"):
+        guardrail = check_guardrail(message)
+
+    return MessageChecks(hits, repeated_failure, severity, guardrail, tier,
+                         forced_by_repeated_failure=by_repeated_failure)
+
+
+async def retrieve_documents(question: str):
+    # embedding + vector search on their own sessions, so this stage can run
+    # alongside load_turn_context on the request session
+    with stage("embedding"):
+        query_embedding = await aembed_question(question)
+    with stage("vector_search"):
+        documents = await aretrieve_kb(question, query_embedding=query_embedding)
+    return query_embedding, documents
+
+
+async def load_turn_memory(graph: StageGraph):
+    conversation, _ = await graph.result("context")
+    return await load_memory(conversation)
+
+
+async def retrieve_follow_up(graph: StageGraph, question: str):
+    # the query includes the user's earlier messages, so this waits for the memory stage
+    memory = await graph.result("memory")
+    return await retrieve_documents(memory.retrieval_query(question))
+
+
+def start_turn_stages(graph: StageGraph, req: ChatRequest, current_user, db: AsyncSession, hits: dict) -> bool:
+    # the retrieval is speculative: it starts before the guardrail verdict
+    # and is cancelled if the message is blocked or escalated right away.
+    # Returns whether the message is a follow-up (answered with the history).
+    follow_up = is_follow_up(req.message, hits)
+    graph.start("context", timed("context", load_turn_context(req, current_user, db)))
+    graph.start("memory", load_turn_memory(graph))
+    if follow_up:
+        graph.start("retrieval", retrieve_follow_up(graph, req.message))
+    else:
+        graph.start("retrieval", retrieve_documents(req.message))
+    return follow_up
+
+
+async def recall_history(graph: StageGraph, turn: PendingTurn, follow_up: bool) -> str:
+    # folds older turns into the conversation summary (written with this
+    # turn) and returns the history for the prompt of a follow-up
+    memory = await graph.result("memory")
+    memory.fold(turn)
+    return memory.prompt_history() if follow_up else ""
+
+
+def settle_speculative_retrieval(graph: StageGraph, checks: MessageChecks):
+    if checks.awaiting_history:
+        # settled by resolve_fast_escalation
+        return
+    if not checks.needs_retrieval:
+        graph.cancel("retrieval")
+        SPECULATIVE_RETRIEVALS.labels(outcome="cancelled").inc()
+    else:
+        SPECULATIVE_RETRIEVALS.labels(outcome="used").inc()
+
+
+async def resolve_fast_escalation(graph: StageGraph, checks: MessageChecks) -> bool:
+    # whether the turn takes the fast escalation path; a repeated failure
+    # first needs the history (the memory stage) to tell
+    if checks.awaiting_history:
+        memory = await graph.result("memory")
+        checks.has_history = memory.has_history
+        settle_speculative_retrieval(graph, checks)
+    return checks.fast_escalation
+
+
+async def store_guardrail_block(db: AsyncSession, turn: PendingTurn, conversation, message: str, guardrail):
+    # Store guardrail violation message
+    user_message = turn.add(Message(id=uuid4(), conversation_id=conversation.id,
+    role="user",content=message, guardrail_blocked=True
+    ))
+
+    turn.add(GuardrailEvent(
+        id = uuid4(),
+        conversation_id=conversation.id,
+        message_id=user_message.id,
+        severity=guardrail.severity,
+        user_message=message))
+
+    turn.add(Message(
+    conversation_id=conversation.id,
+    role="assistant",
+    confidence=0.0,
+    content=f"Guardrail triggered: {guardrail.reason}",
+    guardrail_blocked=True
+    ))
+    await turn_writer.persist(db, turn)
+    GUARDRAIL_BLOCKS.labels(severity=guardrail.severity).inc()
+    CHAT_TURNS.labels(outcome="guardrail").inc()
+
+    return ChatResponse(
+        answer=GUARDRAIL_REPLY,
+        kbReferences=[],
+        confidence=0.0,
+        tier="TIER_3",
+        severity=guardrail.severity,
+        needsEscalation=True,
+        guardrail=guardrail,
+        ticket_id=None
+    )
+
+
+async def store_forced_escalation(db: AsyncSession, turn: PendingTurn, req: ChatRequest, current_user,
+                                  conversation, user, checks: MessageChecks):
+    # ticket + templated reply without retrieval or an LLM call; complete_turn
+    # still classifies the turn, which forced_tier has already settled
+    logger.info(f"Fast escalation to {checks.forced_tier.value} (severity {checks.severity.value})")
+    return await complete_turn(db, turn, req, current_user, conversation, user,
+                               [], FORCED_ESCALATION_REPLY, 0.0, checks)
+
+
+async def store_out_of_scope(db: AsyncSession, turn: PendingTurn, conversation, guardrail):
+    turn.add(Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        confidence=0.0,
+        content=OUT_OF_SCOPE_REPLY
+    ))
+    await turn_writer.persist(db, turn)
+    CHAT_TURNS.labels(outcome="out_of_scope").inc()
+
+    return ChatResponse(
+        answer=OUT_OF_SCOPE_REPLY,
+        kbReferences=[],
+        confidence=0.0,
+        tier="TIER_0",
+        severity="LOW",
+        needsEscalation=False,
+        guardrail=guardrail,
+        ticket_id=None,
+        ticket_status=None)
+
+
+def score_answer(documents: list, answer: str) -> float:
+    # Calculate Confidence score for llm answer
+    return compute_response_confidence(
+        docs=[{"similarity": r.get("similarity", r.get("score", 0.0))}
+            for r in documents],
+        response_text=answer
+    )
+
+
+async def generate_or_reuse_answer(question: str, query_embedding, documents: list, user_role: str,
+                                   history: str = ""):
+    # Semantic answer cache first — a hit skips the LLM call entirely.
+    # Answers that depend on one conversation's history are not shared.
+    cacheable = not history
+    cached = answer_cache.lookup(query_embedding, user_role, documents) if cacheable else None
+    if cached:
+        return cached.answer, cached.confidence
+
+    docs = [r["doc"] for r in documents]
+
+    started = time.perf_counter()
+    answer = await agenerate_answer(question, docs, user_role=user_role, history=history)
+    llm_seconds = time.perf_counter() - started
+
+    confidence = score_answer(documents, answer)
+    if cacheable:
+        answer_cache.store(query_embedding, user_role, documents, answer, confidence, llm_seconds)
+    return answer, confidence
+
+
+async def complete_turn(db: AsyncSession, turn: PendingTurn, req: ChatRequest, current_user, conversation, user,
+                        documents: list, answer: str, confidence: float, checks: MessageChecks):
+    # Escalates if needed and stores the assistant message (the whole turn
+    # is written in one transaction by turn_writer)
+    kb_coverage = len(documents) > 0
+    severity, repeated_failure = checks.severity, checks.repeated_failure
+    hits, guardrail = checks.hits, checks.guardrail
+
+    with stage("classifier"):
+        # Tier check (severity was classified with the guardrail check)
+        tier = classify_tier(req.message,severity,kb_coverage,repeated_failure=repeated_failure,hits=hits)
 
-        if guardrail.blocked:
-            # Store guardrail violation message
-            user_message = Message(conversation_id=conversation.id,
-            role="user",content=req.message
-            )
-            db.add(user_message)
-            db.commit()
-
-            guardrail_event = GuardrailEvent(
-                id = str(uuid4()),
-                conversation_id=conversation.id,
-                message_id=user_message.id,
-                severity=guardrail.severity,
-                user_message=req.message)
-            db.add(guardrail_event)
-            db.commit()
-
-            assistant_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            confidence=0.0,
-            content=f"Guardrail triggered: {guardrail.reason}"
-            )
-            db.add(assistant_message)
-            db.commit()
-                        
-            return ChatResponse(
-                answer="I'm sorry, the question you asked violates our usage policies and cannot be processed.",
-                kbReferences=[],     
-                confidence=0.0,
-                tier="TIER_3",
-                severity=guardrail.severity,
-                needsEscalation=True,
-                guardrail=guardrail,
-                ticket_id=None
-            )
-        
-        # Store user message without guardrail violation
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=req.message
+        #============ Escalation handler =================#
+        needs_escalation = should_escalate(tier,severity,
+             kb_coverage,repeated_failure=repeated_failure)
+
+    kb_references = [
+        KBReference(
+            id=r["doc"].metadata.get("kb_id"),
+            title=r["doc"].metadata.get("title", "KB Article")
         )
-        db.add(user_message)
-        db.commit()
+        for r in documents
+    ]
 
-        # Retrieve KB
-        documents = retrieve_kb(req.message)
-        kb_coverage = len(documents) > 0
+    # Escalation Ticket Creation
+    if needs_escalation:
+        ticket = Ticket(
+            id=await allocate_ticket_id(db),
+            conversation_id=conversation.id,
+            user_id = current_user.user_id,
+            subject=req.message[:200],
+            description=req.message,
+            tier=tier.value,
+            severity=severity.value,
+            status="OPEN",
+            user_role=user.role_name,
+            context=req.context.dict() if req.context else {},
+            created_by = user.full_name,
+            updated_by = user.full_name
+        )
+        turn.add(ticket)
+
+        turn.add(Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        confidence = confidence,
+        content=f"Escalated ticket created: {ticket.id}"
+        ))
+        await turn_writer.persist(db, turn)
+        ESCALATIONS.labels(tier=tier.value, severity=severity.value).inc()
+        CHAT_TURNS.labels(outcome="escalated").inc()
 
-        if not kb_coverage:
-            out_of_scope_reply = (
-                "I'm sorry, I can only answer questions related to the CyberLab "
-                "Training Platform — such as authentication, virtual labs, containers, "
-                "DNS, and access issues.If you believe this is a platform-related "
-                "issue, please try rephrasing your question."
-            )
-            assistant_message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                confidence=0.0,
-                content=out_of_scope_reply
+        return ChatResponse(
+        answer=answer,
+        kbReferences=kb_references,
+        confidence=confidence,
+        tier=tier,
+        severity=severity,
+        needsEscalation=needs_escalation,
+        guardrail=guardrail,
+        ticket_id=ticket.id,
+        ticket_status=(
+                f"A support ticket ({ticket.id}) has been created and assigned to "
+                f"{tier.value}. Our team will follow up with you shortly."
             )
-            db.add(assistant_message)
-            db.commit()
-
-            return ChatResponse(
-                answer=out_of_scope_reply,
-                kbReferences=[],
-                confidence=0.0,
-                tier="TIER_0",
-                severity="LOW",
-                needsEscalation=False,
-                guardrail=guardrail,
-                ticket_id=None,
-                ticket_status=None)
-
-        docs = [r["doc"] for r in documents]
-
-        # Generate Answer
-        answer = generate_answer(req.message, docs, user_role=user_role)
-
-        # Calculate Confidence score for llm answer
-        confidence = compute_response_confidence(
-            docs=[{"similarity": r.get("similarity", r.get("score", 0.0))} 
-                for r in documents],
-            response_text=answer
         )
 
-        # Severity check
-        severity = classify_severity(req.message)
+    # Store assistant message
+    turn.add(Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        confidence = confidence,
+        content=answer
+    ))
+    await turn_writer.persist(db, turn)
+    CHAT_TURNS.labels(outcome="answered").inc()
+
+    return ChatResponse(
+        answer=answer,
+        kbReferences=kb_references,
+        confidence=confidence,
+        tier=tier,
+        severity=severity,
+        needsEscalation=needs_escalation,
+        guardrail=guardrail
+    )
+
+
+def store_user_message(turn: PendingTurn, conversation, message: str):
+    # Store user message without guardrail violation (written with the rest of the turn)
+    turn.add(Message(
+        conversation_id=conversation.id,
+        role="user",
+        content=message
+    ))
+
+
+async def save_partial_turn(db: AsyncSession, turn: PendingTurn):
+    # a failed turn still keeps the user's message
+    try:
+        await turn_writer.persist(db, turn)
+    except Exception as e:
+        logging.error(f"Could not store failed chat turn: {e}")
 
-        # Tier check
-        tier = classify_tier(req.message,severity,kb_coverage,repeated_failure=repeated_failure)
 
-        #============ Escalation handler =================#
-        needs_escalation = should_escalate(tier,severity,
-             kb_coverage,repeated_failure=repeated_failure)
+# Chat Endpoint for user to ask question
+# async end to end: embedding, vector search, LLM call and DB writes all
+# await instead of pinning one of Starlette's threadpool workers per turn
 
-        ticket = None
-
-        last_ticket = db.query(Ticket).order_by(Ticket.created_at.desc()).first()
-        if last_ticket and last_ticket.id.startswith("TICK-"):
-            last_number = int(last_ticket.id.split("-")[1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-
-        new_ticket_id = f"TICK-{new_number:05d}"
-
-        # Escalation Ticket Creation
-        if needs_escalation:
-            ticket = Ticket(
-                id=new_ticket_id,
-                conversation_id=conversation.id,
-                user_id = current_user["sub"],
-                subject=req.message[:200],
-                description=req.message,
-                tier=tier.value,
-                severity=severity.value,
-                status="OPEN",
-                user_role=user_role,
-                context=req.context.dict() if req.context else {},
-                created_by = user.full_name,
-                updated_by = user.full_name
-            )
-            db.add(ticket)
-            db.commit()
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    req: ChatRequest,
+    response: Response,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    turn = PendingTurn()
+    timer = StageTimer()
+    timer_token = timer.activate()
+    try:
+        # context, retrieval and the message checks are independent until
+        # the LLM call: the first two run as concurrent stages, the checks
+        # run once both have sent their first queries
+        # one keyword scan feeds the follow-up check and the classifier
+        hits = match_keywords(req.message)
+        async with StageGraph() as graph:
+            follow_up = start_turn_stages(graph, req, current_user, db, hits)
+            await asyncio.sleep(0)
 
-            assistant_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            confidence = confidence,
-            content=f"Escalated ticket created: {ticket.id}"
-            )
-            db.add(assistant_message)
-            db.commit()
-
-            return ChatResponse(
-            answer=answer,
-            kbReferences=[
-                KBReference(
-                    id=r["doc"].metadata.get("kb_id"),
-                    title=r["doc"].metadata.get("title", "KB Article")
-                )
-                for r in documents
-            ],
-            confidence=confidence,
-            tier=tier,
-            severity=severity,
-            needsEscalation=needs_escalation,
-            guardrail=guardrail,
-            ticket_id=ticket.id,
-            ticket_status=(
-                    f"A support ticket ({ticket.id}) has been created and assigned to "
-                    f"{tier.value}. Our team will follow up with you shortly."
-                )
-            )
+            checks = screen_message(req.message, hits)
+            settle_speculative_retrieval(graph, checks)
 
-        # Store assistant message
-        assistant_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            confidence = confidence,
-            content=answer
-        )
-        db.add(assistant_message)
-        db.commit()
+            conversation, user = await graph.result("context")
+            user_role = user.role_name
+            begin_turn(turn, conversation)
 
-        return ChatResponse(
-            answer=answer,
-            kbReferences=[
-                KBReference(
-                    id=r["doc"].metadata.get("kb_id"),
-                    title=r["doc"].metadata.get("title", "KB Article")
-                )
-                for r in documents
-            ],
-            confidence=confidence,
-            tier=tier,
-            severity=severity,
-            needsEscalation=needs_escalation,
-            guardrail=guardrail
-        )
+            if checks.guardrail.blocked:
+                return await store_guardrail_block(db, turn, conversation, req.message, checks.guardrail)
 
+            store_user_message(turn, conversation, req.message)
+
+            if await resolve_fast_escalation(graph, checks):
+                return await store_forced_escalation(db, turn, req, current_user, conversation, user, checks)
+
+            # Retrieve KB
+            query_embedding, documents = await graph.result("retrieval")
+            history = await recall_history(graph, turn, follow_up)
+
+        if not documents:
+            return await store_out_of_scope(db, turn, conversation, checks.guardrail)
+
+        # Generate Answer (or reuse a cached one)
+        with stage("generation"):
+            answer, confidence = await generate_or_reuse_answer(req.message, query_embedding, documents, user_role,
+                                                                history)
+
+        return await complete_turn(db, turn, req, current_user, conversation, user,
+                                   documents, answer, confidence, checks)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Chat error: {e}")
-        db.rollback()
+        CHAT_TURNS.labels(outcome="error").inc()
+        await db.rollback()
+        await save_partial_turn(db, turn)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        timer.finish()
+        timer.deactivate(timer_token)
+        response.headers["Server-Timing"] = timer.server_timing()
+
+
+# Streaming Chat Endpoint (server-sent events)
+# emits "token" events while the LLM is generating and a single "final"
+# event carrying the full ChatResponse once the turn has been stored
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    req: ChatRequest,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # session / conversation problems surface as normal HTTP errors before
+    # streaming starts; the retrieval runs meanwhile and is handed over to
+    # the stream. The graph is closed when the stream ends, and again by the
+    # response's background task, which also runs when the client goes away
+    # before the stream is read to the end (or at all).
+    hits = match_keywords(req.message)
+    graph = StageGraph()
+    try:
+        follow_up = start_turn_stages(graph, req, current_user, db, hits)
+        conversation, user = await graph.result("context")
+        user_role = user.role_name
+    except BaseException:
+        await graph.close()
+        raise
+
+    async def event_stream():
+        # own session: the request scoped one may already be closed while streaming
+        async with graph, AsyncSessionLocal() as stream_db:
+            turn = PendingTurn()
+            begin_turn(turn, conversation)
+            try:
+                checks = screen_message(req.message, hits)
+                settle_speculative_retrieval(graph, checks)
+
+                if checks.guardrail.blocked:
+                    response = await store_guardrail_block(stream_db, turn, conversation, req.message,
+                                                           checks.guardrail)
+                    yield sse_event("token", {"text": response.answer})
+                    yield sse_event("final", response.model_dump(mode="json"))
+                    return
+
+                store_user_message(turn, conversation, req.message)
+
+                if await resolve_fast_escalation(graph, checks):
+                    response = await store_forced_escalation(stream_db, turn, req, current_user,
+                                                             conversation, user, checks)
+                    yield sse_event("token", {"text": response.answer})
+                    yield sse_event("final", response.model_dump(mode="json"))
+                    return
+
+                query_embedding, documents = await graph.result("retrieval")
+                history = await recall_history(graph, turn, follow_up)
+
+                if not documents:
+                    response = await store_out_of_scope(stream_db, turn, conversation, checks.guardrail)
+                    yield sse_event("token", {"text": response.answer})
+                    yield sse_event("final", response.model_dump(mode="json"))
+                    return
+
+                cacheable = not history
+                cached = answer_cache.lookup(query_embedding, user_role, documents) if cacheable else None
+                if cached:
+                    answer, confidence = cached.answer, cached.confidence
+                    yield sse_event("token", {"text": answer})
+                else:
+                    docs = [r["doc"] for r in documents]
+
+                    parts = []
+                    started = time.perf_counter()
+                    async for token in astream_answer(req.message, docs, user_role=user_role, history=history):
+                        parts.append(token)
+                        yield sse_event("token", {"text": token})
+                    llm_seconds = time.perf_counter() - started
+                    # tokens are yielded to the client as they arrive, so
+                    # the stage is recorded after the fact
+                    CHAT_STAGE_SECONDS.labels(stage="generation").observe(llm_seconds)
+
+                    answer = "".join(parts)
+                    confidence = score_answer(documents, answer)
+                    if cacheable:
+                        answer_cache.store(query_embedding, user_role, documents, answer, confidence, llm_seconds)
+
+                # persisted once, after the whole answer has been produced
+                response = await complete_turn(stream_db, turn, req, current_user, conversation, user,
+                                               documents, answer, confidence, checks)
+                yield sse_event("final", response.model_dump(mode="json"))
+
+            except Exception as e:
+                logging.error(f"Chat stream error: {e}")
+                CHAT_TURNS.labels(outcome="error").inc()
+                await stream_db.rollback()
+                await save_partial_turn(stream_db, turn)
+                yield sse_event("error", {"detail": "Internal server error"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(graph.close)
+    )
 
 
 # KB Create Endpoint KBs documents are updated by user
@@ -305,14 +612,15 @@ def create_kb(
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
-        load_kbs(db=db,
+        report = load_kbs(db=db,
             # created_by=current_user.username,
             created_by=user.full_name,
             replace_existing=req.replace_existing)
 
         return {
             "message": "Knowledge Base stored successfully",
-            "replace_existing": req.replace_existing
+            "replace_existing": req.replace_existing,
+            "report": report
         }
 
     except Exception as e:
@@ -327,59 +635,31 @@ def update_kb(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    KB_DIR = "kbs"
     try:
-        md_file = Path(KB_DIR) / f"{req.kb_id}.md"
+        # kb_id may be the front-matter id or the markdown file name
+        source = db.get(KBSource, req.kb_id)
+        md_file = Path(KB_DIR) / (source.source_file if source else f"{req.kb_id}.md")
 
         if not md_file.exists():
             raise HTTPException(status_code=404, detail="KB file not found")
 
-        metadata, body = parse_markdown(md_file)
-
         user = db.query(User).filter(User.id == current_user.get("sub")).first()
 
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
 
-        # 🔹 Delete old chunks
-        db.execute(
-            delete(KBDocument).where(
-                KBDocument.doc_metadata["kb_id"].astext == req.kb_id
-            )
-        )
-
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=80
-        )
-
-        embedder = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=OPENAI_API_KEY
-        )
-
-        chunks = splitter.split_text(body)
-        embeddings = embedder.embed_documents(chunks)
-
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            doc = KBDocument(
-                title=metadata.get("title"),
-                content=chunk,
-                embedding=emb,
-                chunk_index=str(i),
-                created_by=user.full_name,
-                updated_by=user.full_name,
-                doc_metadata=sanitize_metadata(metadata)
-            )
-            db.add(doc)
+        # only new / changed chunks are re-embedded, removed ones are deleted
+        report = IngestReport()
+        _, changed_kb_ids = ingest_kb_files(db, [md_file], user.full_name, providers.embedder, report)
 
         db.commit()
+        answer_cache.invalidate_kb(changed_kb_ids)
 
-        return {"message": f"KB '{req.kb_id}' updated successfully"}
+        return {"message": f"KB '{req.kb_id}' updated successfully", "report": report.as_dict()}
 
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logging.error(f"KB update failed: {str(e)}")
         raise HTTPException(status_code=500, detail="KB update failed")
-
-
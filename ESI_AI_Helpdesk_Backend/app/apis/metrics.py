@@ -1,31 +1,55 @@
 # app/apis/metrics.py
 
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func
 
 from app.apis.api_schema import MetricsSummary, MetricsTrends, TrendDataPoint
-from app.models.database import Conversation, Message, Ticket, GuardrailEvent
+from app.models.database import MetricsHourly, MetricsHourlyTickets
+from app.metrics_rollup import floor_hour, rollup_refresher
 from app.utils.config import get_db
+from app.llm_services.retriever import embedder as query_embedder
+from app.llm_services.answer_cache import answer_cache
+from app.utils.session_cache import session_cache
+from app.utils.turn_writer import turn_writer
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.utils.prometheus import SampleCollector, render_metrics
 
 metrics_router = APIRouter()
 
-@metrics_router.get("/summary", response_model=MetricsSummary)
-def fetch_metrics_overview(db: Session = Depends(get_db)):
-    try:
-        conversation_count = db.query(func.count(Conversation.id)).scalar() or 0
+# Both endpoints read the hourly rollup tables maintained by
+# app/metrics_rollup.py (refreshed every METRICS_ROLLUP_INTERVAL_SECONDS),
+# so their cost does not grow with the messages / tickets tables.
+# start / end (optional, ISO datetimes) limit the range; hours are UTC.
 
-        ticket_count = db.query(func.count(Ticket.id)).scalar() or 0
+def rollup_range(query, column, start: Optional[datetime], end: Optional[datetime]):
+    if start:
+        query = query.filter(column >= floor_hour(start))
+    if end:
+        query = query.filter(column < end)
+    return query
 
-        guardrail_count = db.query(func.count(GuardrailEvent.id)).scalar() or 0
 
-        conversations_with_ticket = (
-            db.query(func.count(distinct(Ticket.conversation_id)))
-            .filter(Ticket.conversation_id.isnot(None))
-            .scalar()
-            or 0
-        )
+@metrics_router.get("/summary", response_model=MetricsSummary)
+def fetch_metrics_overview(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)):
+    try:
+        totals = rollup_range(db.query(
+            func.coalesce(func.sum(MetricsHourly.conversations), 0),
+            func.coalesce(func.sum(MetricsHourly.conversations_escalated), 0),
+            func.coalesce(func.sum(MetricsHourly.tickets), 0),
+            func.coalesce(func.sum(MetricsHourly.guardrail_events), 0),
+            func.coalesce(func.sum(MetricsHourly.scored_answers), 0),
+            func.coalesce(func.sum(MetricsHourly.confidence_sum), 0.0)
+        ), MetricsHourly.bucket_start, start, end).one()
+
+        (conversation_count, conversations_with_ticket, ticket_count,
+         guardrail_count, scored_answers, confidence_sum) = totals
 
         # conversation resolved without tickets
         resolved_without_ticket = max(
@@ -39,27 +63,19 @@ def fetch_metrics_overview(db: Session = Depends(get_db)):
         else:
             deflection_percentage = 0.0
 
-        avg_conf = (
-            db.query(func.avg(Message.confidence))
-            .filter(
-                Message.role == "assistant",
-                Message.confidence.isnot(None)
-            )
-            .scalar()
-        )
+        avg_confidence_value = float(confidence_sum) / scored_answers if scored_answers else 0.0
 
-        avg_confidence_value = float(avg_conf) if avg_conf else 0.0
-
-   
         tier_distribution = dict(
-            db.query(Ticket.tier, func.count(Ticket.id))
-            .group_by(Ticket.tier)
+            rollup_range(db.query(MetricsHourlyTickets.tier, func.sum(MetricsHourlyTickets.tickets)),
+                         MetricsHourlyTickets.bucket_start, start, end)
+            .group_by(MetricsHourlyTickets.tier)
             .all()
         )
 
         severity_distribution = dict(
-            db.query(Ticket.severity, func.count(Ticket.id))
-            .group_by(Ticket.severity)
+            rollup_range(db.query(MetricsHourlyTickets.severity, func.sum(MetricsHourlyTickets.tickets)),
+                         MetricsHourlyTickets.bucket_start, start, end)
+            .group_by(MetricsHourlyTickets.severity)
             .all()
         )
 
@@ -83,74 +99,96 @@ def fetch_metrics_overview(db: Session = Depends(get_db)):
 
 
 @metrics_router.get("/trends", response_model=MetricsTrends)
-def fetch_metrics_trends(db: Session = Depends(get_db)):
+def fetch_metrics_trends(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: Literal["hour", "day"] = "day",
+    db: Session = Depends(get_db)):
     try:
-
-        conversation_trend = (
-            db.query(
-                func.date_trunc("day", Conversation.created_at).label("day"),
-                func.count(Conversation.id)
-            )
-            .group_by("day")
-            .order_by("day")
-            .all()
-        )
-
-        conversation_points = [
-            TrendDataPoint(
-                start_date=day,
-                end_date=day + timedelta(days=1),
-                value=count
-            )
-            for day, count in conversation_trend
-        ]
-
-        guardrail_trend = (
-            db.query(
-                func.date_trunc("day", GuardrailEvent.created_at).label("day"),
-                func.count(GuardrailEvent.id)
-            )
-            .group_by("day")
-            .order_by("day")
+        step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+        # day buckets in UTC, matching the hourly rollup rows
+        period = func.date_trunc(granularity, func.timezone("UTC", MetricsHourly.bucket_start)).label("period")
+
+        rows = (
+            rollup_range(db.query(
+                period,
+                func.sum(MetricsHourly.conversations),
+                func.sum(MetricsHourly.guardrail_events),
+                func.sum(MetricsHourly.tickets)
+            ), MetricsHourly.bucket_start, start, end)
+            .group_by(period)
+            .order_by(period)
             .all()
         )
 
-        guardrail_points = [
-            TrendDataPoint(
-                start_date=day,
-                end_date=day + timedelta(days=1),
-                value=count
-            )
-            for day, count in guardrail_trend
-        ]
+        def points(values):
+            # periods without any events are left out, as before
+            return [
+                TrendDataPoint(
+                    start_date=day.replace(tzinfo=timezone.utc),
+                    end_date=day.replace(tzinfo=timezone.utc) + step,
+                    value=count
+                )
+                for day, count in values
+                if count
+            ]
 
-
-        ticket_trend = (
-            db.query(
-                func.date_trunc("day", Ticket.created_at).label("day"),
-                func.count(Ticket.id)
-            )
-            .group_by("day")
-            .order_by("day")
-            .all()
-        )
-
-        ticket_points = [
-            TrendDataPoint(
-                start_date=day,
-                end_date=day + timedelta(days=1),
-                value=count
-            )
-            for day, count in ticket_trend
-        ]
         return MetricsTrends(
-            conversation_volume=conversation_points,
-            guardrail_activations=guardrail_points,
-            ticket_volume=ticket_points
+            conversation_volume=points((row[0], row[1]) for row in rows),
+            guardrail_activations=points((row[0], row[2]) for row in rows),
+            ticket_volume=points((row[0], row[3]) for row in rows)
         )
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Unable to compute metrics trends: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@metrics_router.get("/rollups")
+def fetch_rollup_status(db: Session = Depends(get_db)):
+    # how fresh the numbers behind /summary and /trends are
+    return {
+        "refresher_interval_seconds": rollup_refresher.interval_seconds,
+        "last_refresh": rollup_refresher.last_refresh,
+        "latest_bucket_updated_at": db.query(func.max(MetricsHourly.updated_at)).scalar()
+    }
+
+
+@metrics_router.get("/cache")
+def fetch_cache_stats():
+    return {
+        "query_embeddings": query_embedder.stats(),
+        "answers": answer_cache.stats(),
+        "sessions": session_cache.stats()
+    }
+
+
+def cache_samples():
+    embedding_stats, answer_stats, session_stats = query_embedder.stats(), answer_cache.stats(), session_cache.stats()
+    return [
+        ({"cache": "query_embedding", "result": "hit"}, embedding_stats["memory_hits"] + embedding_stats["persistent_hits"]),
+        ({"cache": "query_embedding", "result": "miss"}, embedding_stats["misses"]),
+        ({"cache": "answer", "result": "hit"}, answer_stats["hits"]),
+        ({"cache": "answer", "result": "miss"}, answer_stats["misses"]),
+        ({"cache": "session", "result": "hit"}, session_stats["hits"]),
+        ({"cache": "session", "result": "miss"}, session_stats["misses"]),
+    ]
+
+
+# per worker values, kept by the caches / the turn writer themselves
+SCRAPE_TIME_METRICS = (
+    SampleCollector("helpdesk_cache_requests", "Cache lookups by cache and result", "counter",
+                    ["cache", "result"], cache_samples),
+    SampleCollector("helpdesk_chat_write_queue_depth", "Chat turns waiting for the write-behind writer", "gauge",
+                    [], lambda: [({}, turn_writer.stats()["queue_depth"])]),
+)
+
+
+@metrics_router.get("/prometheus")
+def fetch_prometheus_metrics():
+    # scrape target: chat stage latency histograms, turn / token /
+    # escalation / guardrail counters (all workers with
+    # PROMETHEUS_MULTIPROC_DIR) and this worker's cache hit counters
+    return Response(render_metrics(*SCRAPE_TIME_METRICS), media_type=CONTENT_TYPE_LATEST)
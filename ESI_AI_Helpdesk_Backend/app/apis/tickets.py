@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.utils.config import get_db
 from app.utils.dependencies import get_current_user
 from app.models.database import Ticket
@@ -8,6 +12,9 @@ from app.apis.api_schema import (TicketResponse,TicketUpdate)
 
 ticket_router = APIRouter()
 
+# larger ?limit= values are clamped, not rejected
+MAX_TICKET_PAGE_SIZE = 200
+
 def require_roles(allowed_roles: list, current_user):
     if current_user["role"] not in allowed_roles:
         raise HTTPException(403, "Permission denied")
@@ -31,12 +38,71 @@ def get_ticket(
     return ticket
 
 
+# ================== KEYSET PAGINATION =================
+# Tickets are listed newest first by (created_at, id). The next page starts
+# strictly after the last row of the previous one, so page 10,000 costs the
+# same index range scan as page 1 (no OFFSET). The cursor is opaque to
+# clients: base64 of the last row's sort key.
+
+def encode_cursor(ticket: Ticket) -> str:
+    key = {"t": ticket.created_at.isoformat(), "id": ticket.id}
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(key["t"]), str(key["id"])
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def filtered_tickets(db: Session, status: str = None, tier: str = None, severity: str = None):
+    query = db.query(Ticket)
+
+    if status:
+        query = query.filter(Ticket.status == status)
+    if tier:
+        query = query.filter(Ticket.tier == tier)
+    if severity:
+        query = query.filter(Ticket.severity == severity)
+    return query
+
+
+def ticket_page(db: Session, status: str = None, tier: str = None, severity: str = None,
+                cursor: str = None, limit: int = 20):
+    query = filtered_tickets(db, status, tier, severity)
+
+    if cursor:
+        created_at, ticket_id = decode_cursor(cursor)
+        # row comparison matches the (..., created_at, id) indexes
+        query = query.filter(tuple_(Ticket.created_at, Ticket.id) < tuple_(created_at, ticket_id))
+
+    # one extra row tells whether there is a next page
+    tickets = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(tickets[limit - 1]) if len(tickets) > limit else None
+    return tickets[:limit], next_cursor
+
+
+def estimate_count(db: Session, query) -> int:
+    # planner row estimate: O(1) instead of COUNT(*) over a large table
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 @ticket_router.get("/", response_model=List[TicketResponse])
 def get_all_tickets(
+    response: Response,
     status: str = None,
     tier: str = None,
     severity: str = None,
-    limit: int = 20,
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = None,
+    include_estimate: bool = False,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)):
 
@@ -44,18 +110,19 @@ def get_all_tickets(
     ["support_engineer", "admin", "super_admin"],
     current_user)
     try:
-        query = db.query(Ticket)
-        
-        if status:
-            query = query.filter(Ticket.status == status)
-        if tier:
-            query = query.filter(Ticket.tier == tier)
-        if severity:
-            query = query.filter(Ticket.severity == severity)
-        tickets = query.order_by(Ticket.created_at.desc()).limit(limit).all()
-        
+        tickets, next_cursor = ticket_page(db, status, tier, severity, cursor, min(limit, MAX_TICKET_PAGE_SIZE))
+
+        # pass X-Next-Cursor back as ?cursor= to fetch the following page
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        if include_estimate:
+            response.headers["X-Total-Count-Estimate"] = str(
+                estimate_count(db, filtered_tickets(db, status, tier, severity)))
+
         return tickets
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to list tickets")
 
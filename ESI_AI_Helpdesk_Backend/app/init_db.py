@@ -1,18 +1,174 @@
 # init_db.py
 
+import argparse
+import math
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
 from app.utils.config import Base, engine
-from app.models.database import (Conversation, Message, KBDocument, Ticket, 
-GuardrailEvent, User, Role, UserSession)
+from app.models.database import (Conversation, Message, KBDocument, Ticket,
+GuardrailEvent, User, Role, UserSession, QueryEmbeddingCache, KBSource,
+MetricsHourly, MetricsHourlyTickets, KB_SEARCH_VECTOR_SQL)
+from app.llm_services.llm_config import (
+    EMBEDDING_DIM,
+    KB_VECTOR_INDEX,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    IVFFLAT_LISTS
+)
+
+VECTOR_INDEX_NAMES = {
+    "hnsw": "ix_kb_documents_embedding_hnsw",
+    "ivfflat": "ix_kb_documents_embedding_ivfflat",
+}
+
+# create_all() never alters existing tables, so columns added after a
+# database was first initialised are applied here (idempotent)
+SCHEMA_UPGRADES = [
+    "ALTER TABLE kb_documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_kb_documents_content_hash ON kb_documents (content_hash)",
+    # GIN index on it is created with the model indexes below
+    f"ALTER TABLE kb_documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({KB_SEARCH_VECTOR_SQL}) STORED",
+    "ALTER TABLE user_sessions ADD COLUMN IF NOT EXISTS token_hash VARCHAR(64)",
+    "UPDATE user_sessions SET token_hash = encode(sha256(convert_to(access_token, 'UTF8')), 'hex') WHERE token_hash IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_user_sessions_token_hash ON user_sessions (token_hash)",
+    # created_at indexes used by the metrics rollup refresher
+    "CREATE INDEX IF NOT EXISTS ix_conversations_created_at ON conversations (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_created_at ON messages (created_at)",
+    "DROP INDEX IF EXISTS ix_tickets_created_at",  # superseded by ix_tickets_created_at_id
+    "CREATE INDEX IF NOT EXISTS ix_guardrail_events_created_at ON guardrail_events (created_at)",
+    "DROP INDEX IF EXISTS ix_messages_conversation_id",  # superseded by ix_messages_conversation_id_created_at
+    # per filter combination ticket indexes, replaced by ix_tickets_created_at_id / ix_tickets_status_created_at_id
+    "DROP INDEX IF EXISTS ix_tickets_tier_created_at_id",
+    "DROP INDEX IF EXISTS ix_tickets_severity_created_at_id",
+    "DROP INDEX IF EXISTS ix_tickets_status_tier_created_at_id",
+    "DROP INDEX IF EXISTS ix_tickets_status_severity_created_at_id",
+    "DROP INDEX IF EXISTS ix_tickets_tier_severity_created_at_id",
+    "DROP INDEX IF EXISTS ix_tickets_status_tier_severity_created_at_id",
+    # ticket ids used to be "latest ticket + 1"; move the sequence past
+    # any ticket number already in use (only ever forward)
+    "CREATE SEQUENCE IF NOT EXISTS ticket_id_seq",
+    """SELECT setval('ticket_id_seq', t.max_number)
+       FROM (SELECT MAX(CAST(substring(id FROM 6) AS BIGINT)) AS max_number
+             FROM tickets WHERE id ~ '^TICK-[0-9]+$') t
+       WHERE t.max_number >= (SELECT last_value FROM ticket_id_seq)""",
+]
 
 def create_tables():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
+        # indexes declared on models that already existed before the index did
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
     print("Tables created successfully!")
 
+
+def ivfflat_lists(row_count: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above that
+    if IVFFLAT_LISTS:
+        return IVFFLAT_LISTS
+    if row_count <= 1_000_000:
+        return max(row_count // 1000, 1)
+    return int(math.sqrt(row_count))
+
+
+def create_vector_index(kind: str = KB_VECTOR_INDEX, rebuild: bool = False):
+    # ANN index for the "ORDER BY embedding <=> :query" search in retriever.py.
+    # Only one kind is kept; switching KB_VECTOR_INDEX drops the other one.
+    if kind not in ("hnsw", "ivfflat", "none"):
+        raise ValueError(f"Unsupported vector index: {kind}")
+
+    with engine.begin() as conn:
+        for other, name in VECTOR_INDEX_NAMES.items():
+            if other != kind or rebuild:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        if kind == "hnsw":
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX_NAMES['hnsw']} "
+                f"ON kb_documents USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+            ))
+        elif kind == "ivfflat":
+            # IVFFlat centroids are trained on existing rows, so build (or
+            # rebuild with --rebuild-vector-index) after the KB is loaded
+            row_count = conn.execute(text("SELECT count(*) FROM kb_documents")).scalar()
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX_NAMES['ivfflat']} "
+                f"ON kb_documents USING ivfflat (embedding vector_cosine_ops) "
+                f"WITH (lists = {ivfflat_lists(row_count)})"
+            ))
+
+    print(f"Vector index ready: {kind}")
+
+
+# tables whose embedding column is sized by EMBEDDING_DIM
+EMBEDDING_TABLES = ("kb_documents", "query_embedding_cache")
+
+
+def embedding_dims(conn) -> dict:
+    # pgvector keeps the dimension in atttypmod
+    rows = conn.execute(text(
+        "SELECT c.relname, a.atttypmod FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid "
+        "WHERE a.attname = 'embedding' AND c.relname = ANY(:tables)"), {"tables": list(EMBEDDING_TABLES)})
+    return {table: dim for table, dim in rows}
+
+
+def migrate_embedding_dim(dim: int = EMBEDDING_DIM) -> bool:
+    # Vectors of another model cannot be converted, so the KB chunks, their
+    # source hashes and the cached query embeddings are removed and the
+    # columns resized; reload the KB afterwards (/api/kb/create or load_kbs)
+    # with the new embedding provider. Returns whether anything changed.
+    with engine.begin() as conn:
+        current = embedding_dims(conn)
+        if all(size == dim for size in current.values()):
+            print(f"Embedding columns already vector({dim})")
+            return False
+
+        for name in VECTOR_INDEX_NAMES.values():
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("DELETE FROM kb_documents"))
+        conn.execute(text("DELETE FROM kb_sources"))
+        conn.execute(text("TRUNCATE query_embedding_cache"))
+        for table in EMBEDDING_TABLES:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN embedding TYPE vector({dim})"))
+
+    print(f"Embedding columns resized {current} -> vector({dim}); KB cleared, reload it with the new embedder")
+    return True
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create database tables and indexes")
+    parser.add_argument("--vector-index", default=KB_VECTOR_INDEX, choices=["hnsw", "ivfflat", "none"])
+    parser.add_argument("--rebuild-vector-index", action="store_true")
+    parser.add_argument("--migrate-embedding-dim", action="store_true",
+                        help=f"resize the embedding columns to EMBEDDING_DIM ({EMBEDDING_DIM}); clears the KB")
+    args = parser.parse_args()
+
     create_tables()
+    if args.migrate_embedding_dim:
+        migrate_embedding_dim()
+    else:
+        with engine.connect() as conn:
+            mismatched = {t: d for t, d in embedding_dims(conn).items() if d != EMBEDDING_DIM}
+        if mismatched:
+            print(f"WARNING: embedding columns {mismatched} do not match EMBEDDING_DIM={EMBEDDING_DIM}; "
+                  f"run with --migrate-embedding-dim")
+    create_vector_index(args.vector_index, rebuild=args.rebuild_vector_index)
 
 # this is the command to initialize the database tables
 # python -m app.init_db
+# the app backfills the metrics rollups from existing data at startup; to rebuild them by hand
+# python -m app.metrics_rollup --backfill
+# after a large KB ingestion with IVFFlat, retrain the lists with
+# python -m app.init_db --vector-index ivfflat --rebuild-vector-index
+# after changing the embedding model's dimension (EMBEDDING_DIM), e.g. to a local ONNX model
+# EMBEDDING_DIM=384 python -m app.init_db --migrate-embedding-dim   (then reload the KB)
 
 #path
-# (venv) PS D:\From FEB 2026\AI Full stack Challenge\ESI_AI_Helpdesk_Backend\ESI_AI_Helpdesk_Backend> 
+# (venv) PS D:\From FEB 2026\AI Full stack Challenge\ESI_AI_Helpdesk_Backend\ESI_AI_Helpdesk_Backend>
@@ -1,20 +1,57 @@
-# version 3
 
+# version 5 — incremental ingestion, batched concurrent embedding, bulk COPY writes
+
+import hashlib
+import uuid
 import yaml
+from dataclasses import dataclass, asdict
 from pathlib import Path
 from datetime import date, datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import delete
-from app.models.database import KBDocument
+from sqlalchemy import delete, select
+from app.models.database import KBDocument, KBSource
 # from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from app.utils.config import OPENAI_API_KEY
 import logging
-from app.llm_services.embedding_factory import get_embedder
+from app.llm_services.providers import providers
+from app.llm_services.answer_cache import answer_cache
+from app.llm_services.embedding_pipeline import embed_texts
+from app.kb_writer import write_kb_documents
 
 
 KB_DIR = "kbs"
 
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 80
+
+
+@dataclass
+class IngestReport:
+    files_added: int = 0
+    files_updated: int = 0
+    files_skipped: int = 0
+    files_removed: int = 0
+    chunks_added: int = 0
+    chunks_skipped: int = 0
+    chunks_removed: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+
+
+def sha256_hex(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
 
 def sanitize_metadata(metadata: dict) -> dict:
     clean = {}
@@ -41,60 +78,170 @@ def parse_markdown(file_path: Path):
     return metadata, body.strip()
 
 
-def load_kbs(db: Session, created_by: str, replace_existing: bool = False):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=80
+def chunk_metadata(metadata: dict, md_file: Path) -> dict:
+    return sanitize_metadata({
+        "kb_id": metadata.get("id"),
+        "title": metadata.get("title"),
+        "version": metadata.get("version"),
+        "tags": metadata.get("tags", []),
+        "last_updated": metadata.get("last_updated"),
+        "source_file": md_file.name
+    })
+
+
+def delete_kb_chunks(db: Session, kb_id: str) -> int:
+    result = db.execute(
+        delete(KBDocument).where(
+            KBDocument.doc_metadata["kb_id"].astext == kb_id
+        )
     )
+    return result.rowcount or 0
+
+
+def plan_kb_file(db: Session, md_file: Path, created_by: str, splitter,
+                 report: IngestReport, pending: list, force: bool = False):
+    """Diff one markdown file against its stored chunks.
+
+    Unchanged files are skipped from the stored file hash. For changed files
+    chunks whose text hash already exists are kept (only position / metadata
+    refreshed), chunks that disappeared are deleted and new chunks are
+    appended to pending for embedding. force=True re-embeds every chunk.
+    Returns (kb_id, changed).
+    """
+    file_hash = sha256_hex(md_file.read_bytes())
+    metadata, body = parse_markdown(md_file)
+    kb_id = metadata.get("id")
+
+    if not kb_id:
+        raise ValueError(f"{md_file.name} missing 'id' in YAML")
+
+    source = db.get(KBSource, kb_id)
+
+    if source and source.file_hash == file_hash and not force:
+        report.files_skipped += 1
+        report.chunks_skipped += source.chunk_count
+        return kb_id, False
+
+    if force:
+        report.chunks_removed += delete_kb_chunks(db, kb_id)
+
+    doc_metadata = chunk_metadata(metadata, md_file)
+
+    # existing chunks by text hash (a hash may repeat if older runs inserted duplicates)
+    existing = {}
+    for row in db.execute(select(KBDocument).where(
+            KBDocument.doc_metadata["kb_id"].astext == kb_id)).scalars():
+        existing.setdefault(row.content_hash, []).append(row)
+
+    chunks = splitter.split_text(body)
+
+    for i, chunk in enumerate(chunks):
+        content_hash = sha256_hex(chunk)
+        matches = existing.get(content_hash)
+
+        if matches:
+            # same text: keep the embedding, refresh position / metadata only
+            row = matches.pop()
+            if row.chunk_index != str(i) or row.doc_metadata != doc_metadata or row.title != metadata.get("title"):
+                row.chunk_index = str(i)
+                row.doc_metadata = doc_metadata
+                row.title = metadata.get("title")
+                row.updated_by = created_by
+            report.chunks_skipped += 1
+        else:
+            pending.append({
+                "id": uuid.uuid4(),
+                "title": metadata.get("title"),
+                "content": chunk,
+                "chunk_index": str(i),
+                "original_doc_id": None,
+                "content_hash": content_hash,
+                "created_by": created_by,
+                "updated_by": created_by,
+                "doc_metadata": doc_metadata
+            })
+            report.chunks_added += 1
+
+    for rows in existing.values():
+        for row in rows:
+            db.delete(row)
+            report.chunks_removed += 1
+
+    if source:
+        source.source_file = md_file.name
+        source.file_hash = file_hash
+        source.chunk_count = len(chunks)
+        source.updated_by = created_by
+        report.files_updated += 1
+    else:
+        db.add(KBSource(
+            kb_id=kb_id,
+            source_file=md_file.name,
+            file_hash=file_hash,
+            chunk_count=len(chunks),
+            updated_by=created_by
+        ))
+        report.files_added += 1
+
+    return kb_id, True
+
+
+def ingest_kb_files(db: Session, md_files: list, created_by: str, embedder,
+                    report: IngestReport, force: bool = False):
+    # plan every file first so new chunks from all files share embedding
+    # batches, then embed them concurrently and COPY them in bulk.
+    # Does not commit. Returns (seen kb_ids, changed kb_ids).
+    splitter = make_splitter()
+    pending = []
+    seen_kb_ids, changed_kb_ids = [], []
+
+    for md_file in md_files:
+        kb_id, changed = plan_kb_file(db, md_file, created_by, splitter, report, pending, force=force)
+        seen_kb_ids.append(kb_id)
+        if changed:
+            changed_kb_ids.append(kb_id)
+
+    if pending:
+        embeddings = embed_texts(embedder, [row["content"] for row in pending])
+        for row, emb in zip(pending, embeddings):
+            row["embedding"] = emb
+
+        write_kb_documents(db, pending)
+
+    return seen_kb_ids, changed_kb_ids
+
+
+def load_kbs(db: Session, created_by: str, replace_existing: bool = False, kb_dir: str = KB_DIR,
+             embedder=None) -> dict:
+    # replace_existing=True forces every chunk to be re-embedded; otherwise
+    # only new / changed chunks are embedded and vanished ones are removed
 
     # embedder = OpenAIEmbeddings(
     #     model="text-embedding-3-small",
     #     openai_api_key=OPENAI_API_KEY
     # )
 
-    embedder = get_embedder()
-
-    for md_file in Path(KB_DIR).glob("*.md"):
-
-        metadata, body = parse_markdown(md_file)
-        kb_id = metadata.get("id")
-
-        if not kb_id:
-            raise ValueError(f"{md_file.name} missing 'id' in YAML")
-
-        # 🔹 Delete old version if updating
-        if replace_existing:
-            db.execute(
-                delete(KBDocument).where(
-                    KBDocument.doc_metadata["kb_id"].astext == kb_id
-                )
-            )
-
-        chunks = splitter.split_text(body)
-        embeddings = embedder.embed_documents(chunks)
-
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-
-            doc = KBDocument(
-                title=metadata.get("title"),
-                content=chunk,
-                embedding=emb,
-                chunk_index=str(i),
-                original_doc_id=None,
-                created_by=created_by,
-                updated_by=created_by,
-                doc_metadata=sanitize_metadata({
-                    "kb_id": kb_id,
-                    "title": metadata.get("title"),
-                    "version": metadata.get("version"),
-                    "tags": metadata.get("tags", []),
-                    "last_updated": metadata.get("last_updated"),
-                    "source_file": md_file.name
-                })
-            )
-
-            db.add(doc)
+    embedder = embedder or providers.embedder
+    report = IngestReport()
+
+    seen_kb_ids, changed_kb_ids = ingest_kb_files(
+        db, sorted(Path(kb_dir).glob("*.md")), created_by, embedder, report, force=replace_existing)
+
+    # articles whose markdown file is gone
+    stored_kb_ids = set(db.execute(select(KBSource.kb_id)).scalars())
+    stored_kb_ids |= {
+        kb_id for kb_id in db.execute(
+            select(KBDocument.doc_metadata["kb_id"].astext).distinct()).scalars()
+        if kb_id
+    }
+    for kb_id in stored_kb_ids - set(seen_kb_ids):
+        report.chunks_removed += delete_kb_chunks(db, kb_id)
+        db.execute(delete(KBSource).where(KBSource.kb_id == kb_id))
+        report.files_removed += 1
+        changed_kb_ids.append(kb_id)
 
     db.commit()
-    print("Knowledge Base loaded and indexed")
-
+    # cached answers built on these articles are no longer trustworthy
+    answer_cache.invalidate_kb(changed_kb_ids)
+    print(f"Knowledge Base loaded and indexed: {report.as_dict()}")
+    return report.as_dict()
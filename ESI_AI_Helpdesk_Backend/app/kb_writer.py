@@ -0,0 +1,142 @@
+# kb_writer.py
+#
+# Bulk writer for kb_documents rows. Rows are streamed into Postgres with
+# binary COPY (vectors in pgvector's binary format, no float -> text round
+# trip) on the session's own connection, so they land in the same
+# transaction as the rest of the ingestion. Falls back to multi-row INSERT
+# batches when COPY is unavailable (non-psycopg2 driver).
+
+import json
+import logging
+import struct
+import uuid
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.database import KBDocument
+from app.llm_services.llm_config import KB_WRITE_METHOD, KB_INSERT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# created_at / updated_at are left to their server defaults
+COPY_COLUMNS = (
+    "id", "title", "content", "embedding", "doc_metadata", "chunk_index",
+    "original_doc_id", "content_hash", "created_by", "updated_by",
+)
+
+COPY_SQL = (
+    f"COPY {KBDocument.__tablename__} ({', '.join(COPY_COLUMNS)}) "
+    f"FROM STDIN WITH (FORMAT binary)"
+)
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+NULL_FIELD = struct.pack(">i", -1)
+
+
+def _field(data: bytes) -> bytes:
+    return struct.pack(">i", len(data)) + data
+
+
+def _text(value):
+    return NULL_FIELD if value is None else _field(str(value).encode("utf-8"))
+
+
+def _uuid(value):
+    if value is None:
+        return NULL_FIELD
+    if not isinstance(value, uuid.UUID):
+        value = uuid.UUID(str(value))
+    return _field(value.bytes)
+
+
+def _jsonb(value):
+    # jsonb binary format: version byte followed by the json text
+    if value is None:
+        return NULL_FIELD
+    return _field(b"\x01" + json.dumps(value).encode("utf-8"))
+
+
+def _vector(value):
+    # pgvector binary format: dim (uint16), unused (uint16), float4[] big-endian
+    vector = np.asarray(value, dtype=">f4")
+    return _field(struct.pack(">HH", vector.shape[0], 0) + vector.tobytes())
+
+
+def encode_row(row: dict) -> bytes:
+    return b"".join((
+        struct.pack(">h", len(COPY_COLUMNS)),
+        _uuid(row.get("id") or uuid.uuid4()),
+        _text(row["title"]),
+        _text(row["content"]),
+        _vector(row["embedding"]),
+        _jsonb(row.get("doc_metadata") or {}),
+        _text(row.get("chunk_index")),
+        _uuid(row.get("original_doc_id")),
+        _text(row.get("content_hash")),
+        _text(row.get("created_by")),
+        _text(row.get("updated_by")),
+    ))
+
+
+class CopyStream:
+    # file-like object for cursor.copy_expert that encodes rows lazily,
+    # so a large corpus is never held in memory as one COPY payload
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = bytearray(COPY_HEADER)
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            row = next(self._rows, None)
+            if row is None:
+                self._buffer += COPY_TRAILER
+                self._done = True
+            else:
+                self._buffer += encode_row(row)
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def _copy_supported(db: Session) -> bool:
+    return db.get_bind().dialect.driver == "psycopg2"
+
+
+def copy_kb_documents(db: Session, rows: list) -> int:
+    # raw DBAPI connection behind the session: COPY joins the open transaction
+    dbapi_connection = db.connection().connection.driver_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(COPY_SQL, CopyStream(rows), size=1 << 20)
+    return len(rows)
+
+
+def insert_kb_documents(db: Session, rows: list, batch_size: int = KB_INSERT_BATCH_SIZE) -> int:
+    # one multi-row INSERT ... VALUES statement per batch
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(KBDocument).values(rows[start:start + batch_size]))
+    return len(rows)
+
+
+def write_kb_documents(db: Session, rows: list, method: str = KB_WRITE_METHOD) -> int:
+    """Bulk-insert kb_documents rows (dicts of KBDocument column values).
+
+    Does not commit; the rows become visible with the caller's commit.
+    Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+
+    # pending ORM changes (updated / deleted chunks) go first
+    db.flush()
+
+    if method == "copy" and _copy_supported(db):
+        return copy_kb_documents(db, rows)
+    if method == "copy":
+        logger.info("COPY needs psycopg2; writing kb_documents with multi-row INSERTs")
+    return insert_kb_documents(db, rows)
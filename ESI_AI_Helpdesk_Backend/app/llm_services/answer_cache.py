@@ -0,0 +1,163 @@
+# answer_cache.py
+#
+# Semantic cache for generated answers. A cached answer is reused when a new
+# question is close enough (cosine similarity of the query embeddings) AND it
+# was asked by the same role AND retrieval returned exactly the same KB chunks
+# (kb_id, version, chunk id).
+#
+# Chunk ids change whenever an article is re-ingested, so an edited article
+# can never serve a stale answer, in any worker. load_kbs / update_kb also
+# call invalidate_kb() / clear() so this worker frees those entries at once.
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.llm_services.llm_config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES
+)
+
+
+@dataclass
+class CachedAnswer:
+    vector: np.ndarray
+    answer: str
+    confidence: float
+    llm_seconds: float
+    expires_at: float
+
+
+@dataclass(frozen=True)
+class AnswerHit:
+    # what one lookup returns; entries are shared between requests, so the
+    # per-request similarity lives here rather than on the CachedAnswer
+    answer: str
+    confidence: float
+    llm_seconds: float
+    similarity: float
+
+
+def kb_fingerprint(documents: list) -> frozenset:
+    return frozenset(
+        (r["doc"].metadata.get("kb_id"), str(r["doc"].metadata.get("version")), r.get("id"))
+        for r in documents
+    )
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+
+    def __init__(self, threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 enabled: bool = ANSWER_CACHE_ENABLED):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        # (user_role, kb fingerprint) -> [CachedAnswer], least recently used first
+        self._buckets = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "saved_llm_seconds": 0.0}
+
+    def lookup(self, query_embedding, user_role: str, documents: list) -> Optional[AnswerHit]:
+        if not self.enabled or not documents:
+            return None
+
+        key = (user_role, kb_fingerprint(documents))
+        query = _unit(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._buckets.get(key)
+            best = None
+            if entries:
+                live = [e for e in entries if e.expires_at > now]
+                self._size -= len(entries) - len(live)
+                if live:
+                    self._buckets[key] = live
+                    self._buckets.move_to_end(key)
+                    scores = np.stack([e.vector for e in live]) @ query
+                    index = int(np.argmax(scores))
+                    if scores[index] >= self.threshold:
+                        entry = live[index]
+                        best = AnswerHit(entry.answer, entry.confidence, entry.llm_seconds,
+                                         float(scores[index]))
+                else:
+                    del self._buckets[key]
+
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            self._stats["saved_llm_seconds"] += best.llm_seconds
+            return best
+
+    def store(self, query_embedding, user_role: str, documents: list,
+              answer: str, confidence: float, llm_seconds: float):
+        if not self.enabled or not documents:
+            return
+
+        key = (user_role, kb_fingerprint(documents))
+        entry = CachedAnswer(
+            vector=_unit(query_embedding),
+            answer=answer,
+            confidence=confidence,
+            llm_seconds=llm_seconds,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+
+        with self._lock:
+            self._buckets.setdefault(key, []).append(entry)
+            self._buckets.move_to_end(key)
+            self._size += 1
+            self._stats["stores"] += 1
+
+            # evict whole least recently used buckets until we fit
+            while self._size > self.max_entries and self._buckets:
+                _, evicted = self._buckets.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate_kb(self, kb_ids: Iterable[str]):
+        kb_ids = set(kb_ids)
+        with self._lock:
+            stale = [key for key in self._buckets
+                     if any(kb_id in kb_ids for kb_id, _, _ in key[1])]
+            for key in stale:
+                self._size -= len(self._buckets.pop(key))
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._buckets)
+            self._buckets.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["saved_llm_seconds"] = round(stats["saved_llm_seconds"], 3)
+        stats["threshold"] = self.threshold
+        stats["enabled"] = self.enabled
+        return stats
+
+
+answer_cache = AnswerCache()
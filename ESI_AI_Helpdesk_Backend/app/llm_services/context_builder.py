@@ -0,0 +1,182 @@
+# context_builder.py
+#
+# Packs retrieved KB chunks into the prompt's context under a token budget.
+# Chunks are grouped per article, adjacent chunk_index pieces are merged
+# (dropping the text the splitter repeats between neighbours), duplicate
+# chunks are dropped, and the merged blocks are added best-ranked first
+# until CONTEXT_TOKEN_BUDGET is used; the block that no longer fits is
+# truncated if enough budget is left for it to be useful.
+
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import List
+
+from app.llm_services.llm_config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_ENCODING,
+    CONTEXT_MIN_TRUNCATED_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+# longest repeated text looked for between neighbouring chunks (the
+# splitter overlaps them by CHUNK_OVERLAP = 80 characters)
+MAX_OVERLAP_CHARS = 200
+
+
+class TokenCounter:
+    """tiktoken counts, or ~4 characters per token when the encoding is unavailable.
+
+    tiktoken downloads its encoding files on first use, so offline hosts
+    without a cached copy fall back to the estimate instead of failing.
+    The app lifespan calls warm_up() in a thread at startup, so that
+    download never runs on the event loop during a chat request.
+    """
+
+    def __init__(self, encoding_name: str = CONTEXT_TOKEN_ENCODING):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(f"tiktoken encoding {self.encoding_name} unavailable ({e}); estimating tokens")
+                    self._loaded = True
+        return self._encoding
+
+    def warm_up(self) -> bool:
+        # blocking (file download / BPE load); True if tiktoken is in use
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+token_counter = TokenCounter()
+
+
+@dataclass
+class ContextStats:
+    budget: int
+    chunks_retrieved: int = 0
+    chunks_duplicate: int = 0
+    chunks_merged: int = 0
+    blocks_used: int = 0
+    blocks_dropped: int = 0
+    truncated: bool = False
+    context_tokens: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def chunk_position(doc):
+    try:
+        return int(doc.metadata.get("chunk_index"))
+    except (TypeError, ValueError):
+        return None
+
+
+def join_overlapping(first: str, second: str) -> str:
+    # second usually starts with the last few words of first
+    limit = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(limit, 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+def merge_chunks(docs: list, stats: ContextStats) -> List[dict]:
+    """Group ranked docs into per-article blocks of consecutive chunks.
+
+    Returns blocks in rank order (a block ranks as its best chunk).
+    """
+    seen = set()
+    pieces = []
+    for rank, doc in enumerate(docs):
+        text = doc.page_content.strip()
+        key = " ".join(text.split())
+        if key in seen:
+            stats.chunks_duplicate += 1
+            continue
+        seen.add(key)
+        pieces.append({"rank": rank, "doc": doc, "text": text, "position": chunk_position(doc),
+                       "kb_id": doc.metadata.get("kb_id", "unknown"),
+                       "version": doc.metadata.get("version", "?")})
+
+    blocks = []
+    by_article = {}
+    for piece in pieces:
+        by_article.setdefault((piece["kb_id"], str(piece["version"])), []).append(piece)
+
+    for article_pieces in by_article.values():
+        article_pieces.sort(key=lambda p: (p["position"] is None, p["position"] or 0))
+        block = None
+        for piece in article_pieces:
+            adjacent = (block is not None and piece["position"] is not None
+                        and block["last_position"] is not None
+                        and piece["position"] == block["last_position"] + 1)
+            if adjacent:
+                block["text"] = join_overlapping(block["text"], piece["text"])
+                block["rank"] = min(block["rank"], piece["rank"])
+                block["last_position"] = piece["position"]
+                stats.chunks_merged += 1
+            else:
+                block = {"rank": piece["rank"], "kb_id": piece["kb_id"], "version": piece["version"],
+                         "text": piece["text"], "last_position": piece["position"]}
+                blocks.append(block)
+
+    blocks.sort(key=lambda b: b["rank"])
+    return blocks
+
+
+def format_block(block: dict, text: str = None) -> str:
+    return f"[{block['kb_id']} | v{block['version']}]\n{block['text'] if text is None else text}"
+
+
+def build_context(docs: list, budget: int = CONTEXT_TOKEN_BUDGET, counter: TokenCounter = token_counter):
+    """Context text for the prompt from ranked docs (best first), within budget tokens.
+
+    Returns (context, ContextStats).
+    """
+    stats = ContextStats(budget=budget, chunks_retrieved=len(docs))
+    separator_tokens = counter.count("\n\n")
+    parts = []
+
+    for block in merge_chunks(docs, stats):
+        text = format_block(block)
+        tokens = counter.count(text) + (separator_tokens if parts else 0)
+        remaining = budget - stats.context_tokens
+
+        if tokens <= remaining:
+            parts.append(text)
+            stats.context_tokens += tokens
+            stats.blocks_used += 1
+        elif not stats.truncated and remaining >= CONTEXT_MIN_TRUNCATED_TOKENS:
+            # only the best-ranked block that does not fit is cut down
+            header_tokens = counter.count(format_block(block, "")) + (separator_tokens if parts else 0)
+            text = format_block(block, counter.truncate(block["text"], remaining - header_tokens))
+            parts.append(text)
+            stats.context_tokens += counter.count(text) + (separator_tokens if len(parts) > 1 else 0)
+            stats.blocks_used += 1
+            stats.truncated = True
+        else:
+            stats.blocks_dropped += 1
+
+    return "\n\n".join(parts), stats
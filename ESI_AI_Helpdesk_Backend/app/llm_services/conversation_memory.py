@@ -0,0 +1,197 @@
+# conversation_memory.py
+#
+# Bounded conversation history for follow-up questions ("still not
+# working", "what about the VPN?"). The latest messages of a conversation
+# are read with one query on ix_messages_conversation_id_created_at: the
+# last HISTORY_TURNS turns are kept verbatim and the messages that scrolled
+# out of that window are folded into a rolling summary stored in
+# Conversation.context, so the history in the prompt stays within
+# HISTORY_TOKEN_BUDGET however long the conversation gets. The summary is
+# extractive (the user's questions and the first sentence of each reply),
+# so keeping it up to date costs no extra LLM call.
+
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import inspect, select, update
+
+from app.models.database import Message, Conversation
+from app.utils.config import AsyncSessionLocal
+from app.utils.stage_timer import stage
+from app.utils.turn_writer import PendingTurn
+from app.llm_services.context_builder import token_counter
+from app.llm_services.escalate_classifier import match_keywords
+from app.llm_services.llm_config import (
+    HISTORY_TURNS,
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_SUMMARY_TOKENS,
+    HISTORY_QUERY_TOKENS,
+    HISTORY_FOLLOWUP_MAX_WORDS
+)
+
+logger = logging.getLogger(__name__)
+
+# a turn is a user message and the reply; the query reads as many turns
+# again past the window, so messages that scrolled out during turns that
+# did not fold (blocked, escalated right away, failed) still get summarized
+MESSAGES_PER_TURN = 2
+MESSAGE_MAX_TOKENS = 150
+SUMMARY_LINE_WORDS = 25
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# "what about the VPN?", "and on my phone?": continue the previous question
+FOLLOW_UP_OPENER = re.compile(r"^\W*(?:(?:what|how) about|what if|and|also|but|then)\b", re.IGNORECASE)
+# words pointing back at an earlier turn ("does it need admin rights?")
+FOLLOW_UP_REFERENCES = frozenset({"it", "its", "it's", "this", "these", "those", "they", "them", "their",
+                                  "one", "ones", "same", "still", "instead", "else", "above"})
+
+
+def is_follow_up(question: str, hits: dict = None) -> bool:
+    # "tried that / still broken" messages, questions opening with "what
+    # about ..." and short questions that refer back to an earlier turn lean
+    # on the history. Anything else is retrieved and answered on its own
+    # (and can be served from the answer cache), however short it is.
+    if hits is None:
+        hits = match_keywords(question)
+    if hits.get("frustration") or FOLLOW_UP_OPENER.match(question):
+        return True
+    words = WORD.findall(question.lower())
+    if not words or len(words) > HISTORY_FOLLOWUP_MAX_WORDS:
+        return False
+    # "that" is usually a conjunction, except as the last word ("how do I undo that?")
+    return not FOLLOW_UP_REFERENCES.isdisjoint(words) or words[-1] == "that"
+
+
+def summary_line(role: str, content: str) -> str:
+    text = " ".join(content.split())
+    if role == "user":
+        words = text.split()
+        short = " ".join(words[:SUMMARY_LINE_WORDS]) + (" ..." if len(words) > SUMMARY_LINE_WORDS else "")
+        return f"- User asked: {short}"
+    first_sentence = SENTENCE_END.split(text, maxsplit=1)[0]
+    words = first_sentence.split()
+    short = " ".join(words[:SUMMARY_LINE_WORDS]) + (" ..." if len(words) > SUMMARY_LINE_WORDS else "")
+    return f"- Assistant: {short}"
+
+
+def trim_summary(lines: List[str], max_tokens: int = HISTORY_SUMMARY_TOKENS) -> List[str]:
+    # rolling: the oldest lines go first
+    while lines and token_counter.count("\n".join(lines)) > max_tokens:
+        lines = lines[1:]
+    return lines
+
+
+@dataclass
+class ConversationMemory:
+    conversation_id: object = None
+    context: dict = field(default_factory=dict)
+    # (role, content), oldest first
+    recent: List[tuple] = field(default_factory=list)
+    # (role, content, created_at) outside the window, not summarized yet
+    overflow: List[tuple] = field(default_factory=list)
+
+    @property
+    def summary(self) -> str:
+        return self.context.get("summary", "")
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.recent or self.summary)
+
+    def prompt_history(self, budget: int = HISTORY_TOKEN_BUDGET) -> str:
+        # summary of the older turns, then the recent turns verbatim; the
+        # newest messages win when the budget runs out
+        parts = []
+        used = 0
+        if self.summary:
+            summary = token_counter.truncate(self.summary, min(HISTORY_SUMMARY_TOKENS, budget))
+            used = token_counter.count(summary)
+            parts.append(f"Earlier in this conversation:\n{summary}")
+
+        lines = []
+        for role, content in reversed(self.recent):
+            remaining = budget - used
+            if remaining <= 0:
+                break
+            label = "User" if role == "user" else "Assistant"
+            line = f"{label}: {token_counter.truncate(content.strip(), min(MESSAGE_MAX_TOKENS, remaining))}"
+            used += token_counter.count(line)
+            lines.append(line)
+        if lines:
+            parts.append("\n".join(reversed(lines)))
+        return "\n\n".join(parts)
+
+    def retrieval_query(self, question: str) -> str:
+        # the follow-up plus the user's previous messages (newest first, up
+        # to HISTORY_QUERY_TOKENS), so "still not working" retrieves the
+        # articles about what is not working
+        earlier = []
+        used = 0
+        for role, content in reversed(self.recent):
+            if role != "user":
+                continue
+            tokens = token_counter.count(content)
+            if used + tokens > HISTORY_QUERY_TOKENS:
+                if not earlier:
+                    earlier.append(token_counter.truncate(content, HISTORY_QUERY_TOKENS))
+                break
+            earlier.append(content)
+            used += tokens
+        return "\n".join(list(reversed(earlier)) + [question])
+
+    def fold(self, turn: PendingTurn):
+        # moves the messages that left the window into the rolling summary,
+        # written with the rest of the turn
+        if not self.overflow:
+            return
+        lines = self.summary.splitlines() if self.summary else []
+        lines += [summary_line(role, content) for role, content, _ in self.overflow]
+        self.context = dict(self.context, summary="\n".join(trim_summary(lines)),
+                            summarized_until=self.overflow[-1][2].isoformat())
+        self.overflow = []
+        turn.execute(update(Conversation)
+                     .where(Conversation.id == self.conversation_id)
+                     .values(context=self.context))
+
+
+def history_statement(conversation_id, limit: int):
+    # guardrail-blocked turns are left out of the history
+    return (select(Message.role, Message.content, Message.created_at)
+            .where(Message.conversation_id == conversation_id, Message.guardrail_blocked.is_not(True))
+            .order_by(Message.created_at.desc())
+            .limit(limit))
+
+
+async def load_memory(conversation, turns: int = HISTORY_TURNS) -> ConversationMemory:
+    """Recent turns and the rolling summary of a conversation (own session).
+
+    A failed lookup only costs the turn its history, never the turn itself.
+    """
+    context = dict(conversation.context or {})
+    memory = ConversationMemory(conversation_id=conversation.id, context=context)
+    if inspect(conversation).transient:
+        # first turn: the conversation is written with it, nothing to read yet
+        return memory
+    window = turns * MESSAGES_PER_TURN
+    try:
+        with stage("history"):
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(history_statement(conversation.id, window * 2))).all()
+    except Exception as e:
+        logger.warning(f"Conversation history lookup failed: {e}")
+        return memory
+
+    rows.reverse()
+    older, recent = rows[:-window], rows[-window:]
+    memory.recent = [(row.role, row.content) for row in recent]
+
+    summarized_until = context.get("summarized_until")
+    cutoff = datetime.fromisoformat(summarized_until) if summarized_until else None
+    memory.overflow = [(row.role, row.content, row.created_at) for row in older
+                       if cutoff is None or row.created_at > cutoff]
+    return memory
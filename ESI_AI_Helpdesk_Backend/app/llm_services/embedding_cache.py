@@ -0,0 +1,230 @@
+# embedding_cache.py
+#
+# Cache in front of embed_query. Helpdesk traffic is dominated by the same
+# handful of questions, so most query embeddings can be served without a
+# round-trip to the embedding provider.
+#
+# Tier 1: in-process LRU with TTL (per worker).
+# Tier 2: optional query_embedding_cache table, shared by all workers.
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.database import QueryEmbeddingCache
+from app.utils.config import SessionLocal, AsyncSessionLocal
+from app.llm_services.llm_config import (
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_PERSIST
+)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(text: str) -> str:
+    # "MFA not working?" / "mfa  not working" -> "mfa not working"
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def _as_floats(embedding):
+    # pgvector hands back numpy arrays; callers bind plain float lists
+    return [float(x) for x in embedding] if embedding is not None else None
+
+
+class CachedQueryEmbedder:
+    """Wraps a LangChain embedder and caches its query embeddings.
+
+    Document embeddings are passed straight through — only the query hot
+    path is cached. embedder may also be a zero-argument callable returning
+    the embedder (lambda: providers.embedder): it is then resolved on every
+    call, so a module-level wrapper never builds or pins a provider client.
+    """
+
+    def __init__(self, embedder, max_size: int = EMBEDDING_CACHE_SIZE,
+                 ttl_seconds: int = EMBEDDING_CACHE_TTL_SECONDS,
+                 persist: str = EMBEDDING_CACHE_PERSIST):
+        if persist not in ("none", "postgres"):
+            raise ValueError(f"Unsupported embedding cache persistence: {persist}")
+
+        self._embedder = embedder
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+    @property
+    def embedder(self):
+        return self._embedder() if callable(self._embedder) else self._embedder
+
+    @property
+    def model(self) -> str:
+        embedder = self.embedder
+        return f"{type(embedder).__name__}:{getattr(embedder, 'model', 'default')}"
+
+    # ---------- keys / memory tier ----------
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, embedding = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return embedding
+
+    def _put_memory(self, key: str, embedding):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _record(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    # ---------- persistent tier ----------
+
+    def _persistent_cutoff(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+
+    def _lookup_stmt(self, key: str):
+        return select(QueryEmbeddingCache.embedding).where(
+            QueryEmbeddingCache.cache_key == key,
+            QueryEmbeddingCache.created_at >= self._persistent_cutoff()
+        )
+
+    def _upsert_stmt(self, key: str, text: str, embedding):
+        return insert(QueryEmbeddingCache).values(
+            cache_key=key,
+            model=self.model,
+            query_text=normalize_query(text),
+            embedding=embedding
+        ).on_conflict_do_update(
+            index_elements=[QueryEmbeddingCache.cache_key],
+            set_={"embedding": embedding, "created_at": datetime.now(timezone.utc)}
+        )
+
+    def _get_persistent(self, key: str):
+        try:
+            with SessionLocal() as db:
+                embedding = db.execute(self._lookup_stmt(key)).scalar()
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return None
+        return _as_floats(embedding)
+
+    def _put_persistent(self, key: str, text: str, embedding):
+        try:
+            with SessionLocal() as db:
+                db.execute(self._upsert_stmt(key, text, embedding))
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    async def _aget_persistent(self, key: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                embedding = (await db.execute(self._lookup_stmt(key))).scalar()
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return None
+        return _as_floats(embedding)
+
+    async def _aput_persistent(self, key: str, text: str, embedding):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(self._upsert_stmt(key, text, embedding))
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    # ---------- embedder interface ----------
+
+    def embed_query(self, text: str):
+        key = self.cache_key(text)
+
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self._record("memory_hits")
+            return embedding
+
+        if self.persist == "postgres":
+            embedding = self._get_persistent(key)
+            if embedding is not None:
+                self._record("persistent_hits")
+                self._put_memory(key, embedding)
+                return embedding
+
+        self._record("misses")
+        embedding = self.embedder.embed_query(text)
+        self._put_memory(key, embedding)
+        if self.persist == "postgres":
+            self._put_persistent(key, text, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str):
+        key = self.cache_key(text)
+
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self._record("memory_hits")
+            return embedding
+
+        if self.persist == "postgres":
+            embedding = await self._aget_persistent(key)
+            if embedding is not None:
+                self._record("persistent_hits")
+                self._put_memory(key, embedding)
+                return embedding
+
+        self._record("misses")
+        embedding = await self.embedder.aembed_query(text)
+        self._put_memory(key, embedding)
+        if self.persist == "postgres":
+            await self._aput_persistent(key, text, embedding)
+        return embedding
+
+    def embed_documents(self, texts):
+        return self.embedder.embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return await self.embedder.aembed_documents(texts)
+
+    # ---------- reporting ----------
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["max_size"] = self.max_size
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["persist"] = self.persist
+        return stats
@@ -3,22 +3,45 @@ from langchain_community.embeddings import OllamaEmbeddings
 from app.llm_services.llm_config import (
     EMBEDDING_PROVIDER,
     OPENAI_API_KEY,
-    OLLAMA_BASE_URL
+    OLLAMA_BASE_URL,
+    FAKE_EMBEDDING_LATENCY_MS,
+    FAKE_EMBEDDING_DIM,
+    EMBEDDING_TIMEOUT_SECONDS,
+    PROVIDER_MAX_RETRIES
 )
 
-def get_embedder():
+# builds a new client; the app shares one instance through providers.py
+def get_embedder(http_client=None, http_async_client=None):
 
     if EMBEDDING_PROVIDER == "openai":
         return OpenAIEmbeddings(
             model="text-embedding-3-small",
-            openai_api_key=OPENAI_API_KEY
+            openai_api_key=OPENAI_API_KEY,
+            request_timeout=EMBEDDING_TIMEOUT_SECONDS,
+            max_retries=PROVIDER_MAX_RETRIES,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
 
     elif EMBEDDING_PROVIDER == "ollama":
+        # calls the server with requests and accepts no httpx client: not pooled
         return OllamaEmbeddings(
             base_url=OLLAMA_BASE_URL,
             model="nomic-embed-text"
         )
 
+    elif EMBEDDING_PROVIDER == "onnx":
+        # in-process CPU model, no HTTP client involved
+        from app.llm_services.onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings()
+
+    elif EMBEDDING_PROVIDER == "fake":
+        # offline deterministic embeddings for load testing
+        from app.llm_services.fake_models import FakeEmbeddings
+        return FakeEmbeddings(
+            dim=FAKE_EMBEDDING_DIM,
+            latency=FAKE_EMBEDDING_LATENCY_MS / 1000
+        )
+
     else:
         raise ValueError(f"Unsupported embedding provider: {EMBEDDING_PROVIDER}")
\ No newline at end of file
@@ -0,0 +1,99 @@
+# embedding_pipeline.py
+#
+# Batched, concurrent document embedding for KB ingestion. Chunks from all
+# files are packed into batches bounded by count and total characters, the
+# batches are embedded by a small thread pool and rate-limit / transient
+# provider errors are retried with exponential backoff.
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+import httpx
+import openai
+
+from app.llm_services.llm_config import (
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_MAX_CHARS,
+    EMBED_MAX_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+    EMBED_BACKOFF_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, RETRYABLE_ERRORS):
+        return True
+    # other providers (ollama, ...) surface HTTP errors with a status code
+    status_code = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES or "rate limit" in str(exc).lower()
+
+
+def iter_batches(texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+                 max_chars: int = EMBED_BATCH_MAX_CHARS) -> Iterator[List[int]]:
+    # yields lists of positions into texts
+    batch, chars = [], 0
+    for i, text in enumerate(texts):
+        if batch and (len(batch) >= batch_size or chars + len(text) > max_chars):
+            yield batch
+            batch, chars = [], 0
+        batch.append(i)
+        chars += len(text)
+    if batch:
+        yield batch
+
+
+def embed_batch_with_retry(embedder, texts: List[str], max_retries: int = EMBED_MAX_RETRIES,
+                           backoff_seconds: float = EMBED_BACKOFF_SECONDS):
+    attempt = 0
+    while True:
+        try:
+            return embedder.embed_documents(texts)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            # exponential backoff with jitter so parallel batches do not retry in lockstep
+            delay = backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Embedding batch of {len(texts)} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def embed_texts(embedder, texts: List[str], batch_size: int = EMBED_BATCH_SIZE,
+                max_chars: int = EMBED_BATCH_MAX_CHARS,
+                max_concurrency: int = EMBED_MAX_CONCURRENCY) -> list:
+    """Embed texts in bounded batches with at most max_concurrency in flight.
+
+    Returns the embeddings in the same order as texts.
+    """
+    if not texts:
+        return []
+
+    batches = list(iter_batches(texts, batch_size, max_chars))
+    embeddings = [None] * len(texts)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as pool:
+        futures = [
+            (batch, pool.submit(embed_batch_with_retry, embedder, [texts[i] for i in batch]))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for i, embedding in zip(batch, future.result()):
+                embeddings[i] = embedding
+
+    return embeddings
@@ -1,5 +1,6 @@
 # escalate_classifier.py
 
+import re
 from app.apis.pydantic_models import TierLevel, SeverityLevel
 
 TIER_4_KEYWORDS = [
@@ -85,23 +86,150 @@ FORCE_TIER3_HIGH_SEVERITY = [
 ]
 
 
-def classify_tier(message: str, severity: SeverityLevel, kb_coverage: bool, repeated_failure: bool = False) -> TierLevel:
-    msg = message.lower()
+# phrases that signal the user already tried and is getting frustrated
+FRUSTRATION_WEIGHTS = {
+    "still not working": 3,
+    "didn't work": 3,
+    "doesn't work": 3,
+    "same issue": 2,
+    "already tried": 2,
+    "still stuck": 2,
+    "still broken": 2,
+    "still failing": 2,
+    "keeps happening": 2,
+    "persists": 2,
+    "again": 1,
+    "twice": 1,
+    "multiple times": 1,
+    "tried": 1,
+    "already": 1
+}
+
+FRUSTRATION_THRESHOLD = 2
+
+KEYWORD_CATEGORIES = {
+    "tier4": TIER_4_KEYWORDS,
+    "tier3": TIER_3_KEYWORDS,
+    "tier2": TIER_2_KEYWORDS,
+    "tier1": TIER_1_KEYWORDS,
+    "critical": CRITICAL_KEYWORDS,
+    "high": HIGH_KEYWORDS,
+    "medium": MEDIUM_KEYWORDS,
+    "force_tier2": FORCE_TIER2_PATTERNS,
+    "force_tier3": FORCE_TIER3_PATTERNS,
+    "force_tier3_high": FORCE_TIER3_HIGH_SEVERITY,
+    "frustration": list(FRUSTRATION_WEIGHTS),
+}
+
+
+# ================== KEYWORD MATCHER =================
+# every keyword list above is compiled once into a single trie-shaped regex,
+# so a message is scanned one time for all categories instead of one
+# "p in msg" pass per phrase.
+
+def _trie_pattern(phrases) -> str:
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # greedy optional tail: the longest phrase at a position wins
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    def __init__(self, categories: dict):
+        self.categories = {}
+        for category, phrases in categories.items():
+            for phrase in phrases:
+                self.categories.setdefault(phrase.lower(), set()).add(category)
+
+        self.pattern = re.compile(_trie_pattern(self.categories))
+
+        # the regex reports the longest phrase starting at each position;
+        # shorter phrases that are prefixes of it match there too
+        self.prefixes = {
+            phrase: [p for p in self.categories if phrase.startswith(p)]
+            for phrase in self.categories
+        }
+
+    def match(self, message: str) -> dict:
+        """Return {category: set of matched phrases} for a message.
+
+        Same result as "phrase in message.lower()" for every phrase, overlaps
+        included.
+        """
+        msg = message.lower()
+        search = self.pattern.search
+        hits = {}
+        pos = 0
+        while True:
+            m = search(msg, pos)
+            if m is None:
+                return hits
+            for phrase in self.prefixes[m.group()]:
+                for category in self.categories[phrase]:
+                    hits.setdefault(category, set()).add(phrase)
+            pos = m.start() + 1
+
+
+keyword_matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+
+
+def match_keywords(message: str) -> dict:
+    return keyword_matcher.match(message)
+
+
+def frustration_score(hits: dict) -> int:
+    return sum(FRUSTRATION_WEIGHTS[p] for p in hits.get("frustration", ()))
+
+
+def is_repeated_failure(hits: dict) -> bool:
+    # Escalate only if frustration score crosses threshold
+    return frustration_score(hits) >= FRUSTRATION_THRESHOLD
+
+
+def forced_tier(severity: SeverityLevel, repeated_failure: bool, hits: dict):
+    # Tier 3 rules that hold whatever the KB coverage or the answer, so the
+    # chat endpoint can decide on them before retrieval / generation.
+    # Returns None when the tier depends on the rest of the turn.
 
     # Critical severity or repeated failure always → Tier 3
     if severity == SeverityLevel.CRITICAL or repeated_failure:
         return TierLevel.TIER_3
 
     # Security policy violations / restricted requests → Tier 3
-    if any(p in msg for p in FORCE_TIER3_PATTERNS):
+    if "force_tier3" in hits:
         return TierLevel.TIER_3
 
     # High-severity platform issues → Tier 3
-    if any(p in msg for p in FORCE_TIER3_HIGH_SEVERITY):
+    if "force_tier3_high" in hits:
         return TierLevel.TIER_3
 
+    return None
+
+
+def classify_tier(message: str, severity: SeverityLevel, kb_coverage: bool, repeated_failure: bool = False,
+                  hits: dict = None) -> TierLevel:
+    # hits: result of match_keywords(message), pass it to avoid rescanning
+    if hits is None:
+        hits = match_keywords(message)
+
+    forced = forced_tier(severity, repeated_failure, hits)
+    if forced is not None:
+        return forced
+
     #Issues requiring a Support Engineer → Tier 2
-    if any(p in msg for p in FORCE_TIER2_PATTERNS):
+    if "force_tier2" in hits:
         return TierLevel.TIER_2
 
     # No KB coverage
@@ -112,25 +240,26 @@ def classify_tier(message: str, severity: SeverityLevel, kb_coverage: bool, repe
             return TierLevel.TIER_2
 
     #Keyword fallback (least reliable — only reached if no rule above matched)
-    if any(k in msg for k in TIER_4_KEYWORDS):
+    if "tier4" in hits:
         return TierLevel.TIER_4
-    if any(k in msg for k in TIER_3_KEYWORDS):
+    if "tier3" in hits:
         return TierLevel.TIER_3
-    if any(k in msg for k in TIER_2_KEYWORDS):
+    if "tier2" in hits:
         return TierLevel.TIER_2
-    if any(k in msg for k in TIER_1_KEYWORDS):
+    if "tier1" in hits:
         return TierLevel.TIER_1
 
     return TierLevel.TIER_0
 
-def classify_severity(message: str) -> SeverityLevel:
-    msg = message.lower()
+def classify_severity(message: str, hits: dict = None) -> SeverityLevel:
+    if hits is None:
+        hits = match_keywords(message)
 
-    if any(k in msg for k in CRITICAL_KEYWORDS):
+    if "critical" in hits:
         return SeverityLevel.CRITICAL
-    elif any(k in msg for k in HIGH_KEYWORDS):
+    elif "high" in hits:
         return SeverityLevel.HIGH
-    elif any(k in msg for k in MEDIUM_KEYWORDS):
+    elif "medium" in hits:
         return SeverityLevel.MEDIUM
     else:
         return SeverityLevel.LOW
@@ -0,0 +1,160 @@
+# fake_models.py
+#
+# Deterministic local stand-ins for the chat and embedding providers, used
+# by the load harness (benchmarks/load_harness.py) to exercise the whole
+# chat path offline. Selected with LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake
+# through llm_factory.get_llm and embedding_factory.get_embedder.
+#
+# Latencies are simulated with sleeps (asyncio.sleep on the async paths, so
+# the event loop behaves as it does with a real network call). Same input,
+# same output: the embedder hashes words into a fixed vector and the chat
+# model builds its answer from the KB context in the prompt.
+
+import asyncio
+import hashlib
+import math
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORD = re.compile(r"[a-z0-9]+")
+KB_HEADER = re.compile(r"^\[([^\]|]+) \|", re.MULTILINE)
+KB_HEADER_LINE = re.compile(r"^\[[^\]]*\]$", re.MULTILINE)
+
+
+def words(text: str) -> List[str]:
+    # words shorter than 3 characters are mostly stop words
+    return [w for w in WORD.findall(text.lower()) if len(w) > 2]
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings.
+
+    Texts sharing words get similar vectors, so vector search over a KB
+    embedded with this model returns the topical articles. A fixed share
+    (baseline) of every vector points in one common direction, which gives
+    unrelated texts the small positive similarity real models show.
+    """
+
+    def __init__(self, dim: int = 1536, latency: float = 0.0, per_text_latency: float = 0.0,
+                 baseline: float = 0.15):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.baseline = baseline
+
+    def _embed(self, text: str) -> List[float]:
+        counts = {}
+        for w in words(text):
+            counts[w] = counts.get(w, 0) + 1
+
+        vector = [0.0] * self.dim
+        for w, count in counts.items():
+            digest = hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest()
+            slot = int.from_bytes(digest[:4], "little") % (self.dim - 1) + 1
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[slot] += sign * (1.0 + math.log(count))
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        topical = math.sqrt(1.0 - self.baseline) / norm if norm else 0.0
+        vector = [v * topical for v in vector]
+        # slot 0 is the shared direction
+        vector[0] = math.sqrt(self.baseline) if norm else 1.0
+        return vector
+
+    def _delay(self, count: int) -> float:
+        return self.latency + self.per_text_latency * count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay(len(texts)))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self._delay(1))
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self._delay(1))
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from the KB context in the prompt.
+
+    first_token_latency is paid once per call, token_latency per streamed
+    token; invoke / ainvoke pay both for the whole answer.
+    """
+
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    answer_tokens: int = 80
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        kb_ids = KB_HEADER.findall(prompt)
+        if not kb_ids:
+            return "This information is not available in the approved knowledge base.".split(" ")
+
+        # context words in prompt order, without the "[kb-id | vN]" headers
+        context = KB_HEADER_LINE.sub(" ", prompt[prompt.find(f"[{kb_ids[0]} |"):])
+        body = words(context) or ["the", "documented", "process"]
+        tokens = f"According to {kb_ids[0]}, follow these steps:".split(" ")
+        for n in range(self.answer_tokens - len(tokens)):
+            tokens.append(body[n % len(body)])
+        return tokens
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], tokens: List[str]) -> dict:
+        # whitespace words stand in for tokens
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        return {"input_tokens": prompt_tokens, "output_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens)}
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        message = AIMessage(content=" ".join(tokens), usage_metadata=self._usage(messages, tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages: List[BaseMessage], tokens: List[str]) -> Iterator[ChatGenerationChunk]:
+        for n, token in enumerate(tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token if n == 0 else " " + token))
+        # usage in a final empty chunk, as OpenAI streams it
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens)))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._answer_tokens(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        return self._result(messages, tokens)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._answer_tokens(messages)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        return self._result(messages, tokens)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages, self._answer_tokens(messages)):
+            time.sleep(self.token_latency if chunk.message.content else 0)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(messages, self._answer_tokens(messages)):
+            await asyncio.sleep(self.token_latency if chunk.message.content else 0)
+            yield chunk
@@ -3,26 +3,64 @@
 # from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from app.utils.config import OPENAI_API_KEY
-from app.llm_services.prompts import PROMPT_TEMPLATE
-from typing import List, Dict, Any
-from app.llm_services.llm_factory import get_llm
+from app.llm_services.prompts import PROMPT_TEMPLATE, HISTORY_SECTION
+from typing import List, Dict, Any, AsyncIterator
+import logging
+from app.llm_services.providers import providers
+from app.llm_services.context_builder import build_context, token_counter
+from app.utils.prometheus import LLM_TOKENS, PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
 
 # llm = ChatOpenAI(
 #     openai_api_key=OPENAI_API_KEY,
 #     temperature=0
 # )
 
-llm = get_llm()
+def build_prompt(question: str, docs: list, user_role: str = "trainee", history: str = "") -> str:
+    # docs arrive best-ranked first; the builder keeps the context within CONTEXT_TOKEN_BUDGET
+    # history: ConversationMemory.prompt_history(), already within HISTORY_TOKEN_BUDGET
+    context, stats = build_context(docs)
+    history_section = HISTORY_SECTION.format(history=history) if history else ""
+    prompt = PROMPT_TEMPLATE.format(context=context,question=question,user_role=user_role.upper(),
+                                    history=history_section)
+
+    prompt_tokens = token_counter.count(prompt)
+    PROMPT_TOKENS.labels(part="context").observe(stats.context_tokens)
+    if history:
+        PROMPT_TOKENS.labels(part="history").observe(token_counter.count(history_section))
+    PROMPT_TOKENS.labels(part="prompt").observe(prompt_tokens)
+    logger.info(f"Prompt tokens: {prompt_tokens} (context {stats.as_dict()})")
+    return prompt
+
+def record_token_usage(usage):
+    # usage_metadata is only set by providers that report token counts
+    if usage:
+        LLM_TOKENS.labels(kind="prompt").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(kind="completion").inc(usage.get("output_tokens", 0))
+
+def generate_answer(question: str, docs: list, user_role: str = "trainee", history: str = "") -> str:
+    prompt = build_prompt(question, docs, user_role, history)
+    response = providers.llm.invoke([HumanMessage(content=prompt)])
+    record_token_usage(response.usage_metadata)
+    return response.content
 
-def generate_answer(question: str, docs: list, user_role: str = "trainee") -> str:
-    context = "\n\n".join(
-        f"[{d.metadata.get('kb_id', 'unknown')} | v{d.metadata.get('version', '?')}]\n{d.page_content}"
-        for d in docs)
-    
-    prompt = PROMPT_TEMPLATE.format(context=context,question=question,user_role=user_role.upper() )
-    response = llm.invoke([HumanMessage(content=prompt)])
+async def agenerate_answer(question: str, docs: list, user_role: str = "trainee", history: str = "") -> str:
+    prompt = build_prompt(question, docs, user_role, history)
+    response = await providers.llm.ainvoke([HumanMessage(content=prompt)])
+    record_token_usage(response.usage_metadata)
     return response.content
 
+async def astream_answer(question: str, docs: list, user_role: str = "trainee",
+                        history: str = "") -> AsyncIterator[str]:
+    prompt = build_prompt(question, docs, user_role, history)
+    async for chunk in providers.llm.astream([HumanMessage(content=prompt)]):
+        # usage arrives in its own (usually last) chunk
+        record_token_usage(chunk.usage_metadata)
+        # providers may emit empty / non-text chunks (tool calls, usage frames)
+        if isinstance(chunk.content, str) and chunk.content:
+            yield chunk.content
+
 def compute_response_confidence(docs: List[Dict[str, Any]], response_text: str) -> float:
     if not docs:
         return 0.0
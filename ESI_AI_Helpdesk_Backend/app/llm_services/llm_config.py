@@ -2,7 +2,111 @@ import os
 
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")  
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+# size of the kb_documents / query_embedding_cache vector columns; has to
+# match the embedding model (1536 = text-embedding-3-small). Changing it
+# needs "python -m app.init_db --migrate-embedding-dim" and a KB reload.
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
\ No newline at end of file
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# long-lived provider clients (see providers.py): one HTTP connection pool
+# per process shared by every LLM / embedding call
+PROVIDER_HTTP_MAX_CONNECTIONS = int(os.getenv("PROVIDER_HTTP_MAX_CONNECTIONS", "100"))
+PROVIDER_HTTP_MAX_KEEPALIVE = int(os.getenv("PROVIDER_HTTP_MAX_KEEPALIVE", "20"))
+PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "20"))
+# SDK-level retries per call (KB ingestion adds its own backoff on top, see embedding_pipeline.py)
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+
+# Query embedding cache (see embedding_cache.py)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+# "none" keeps the cache in process only, "postgres" adds the query_embedding_cache table as a second tier
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "none")
+
+# Semantic answer cache (see answer_cache.py)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "4096"))
+
+# pgvector ANN index on kb_documents.embedding (managed by init_db.py)
+# "hnsw", "ivfflat" or "none" (exact sequential scan)
+KB_VECTOR_INDEX = os.getenv("KB_VECTOR_INDEX", "hnsw")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+# per query recall knobs — higher = better recall, slower search
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "0"))  # 0 = derive from row count
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+
+# KB retrieval (see retriever.py): "vector" is cosine similarity only,
+# "hybrid" fuses full-text and vector rankings with reciprocal rank fusion.
+# Compare the two with benchmarks/retrieval_eval.py before switching.
+KB_RETRIEVAL_MODE = os.getenv("KB_RETRIEVAL_MODE", "vector")
+# share of the fused score given to the vector ranking (1.0 = vector only, 0.0 = full-text only)
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.5"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# rows taken from each ranking before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# full-text matches are kept down to this cosine similarity (vector-only hits need
+# MIN_SIMILARITY_THRESHOLD, 0.20); lowering it lets off-topic questions that share
+# a keyword with an article through, so check the out-of-scope rate of the eval first
+HYBRID_LEXICAL_MIN_SIMILARITY = float(os.getenv("HYBRID_LEXICAL_MIN_SIMILARITY", "0.20"))
+
+# prompt context assembly (see context_builder.py)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+# the block that overflows the budget is truncated only if at least this many tokens are left
+CONTEXT_MIN_TRUNCATED_TOKENS = int(os.getenv("CONTEXT_MIN_TRUNCATED_TOKENS", "100"))
+
+# conversation memory (see conversation_memory.py): the last HISTORY_TURNS
+# turns verbatim plus a rolling summary of older ones, within
+# HISTORY_TOKEN_BUDGET tokens of the prompt
+HISTORY_TURNS = int(os.getenv("HISTORY_TURNS", "3"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+# earlier user messages added to the retrieval query of a follow-up question
+HISTORY_QUERY_TOKENS = int(os.getenv("HISTORY_QUERY_TOKENS", "64"))
+# "it" / "this" / "same" ... mark a follow-up only in questions this short
+# (in words); longer questions name their own subject
+HISTORY_FOLLOWUP_MAX_WORDS = int(os.getenv("HISTORY_FOLLOWUP_MAX_WORDS", "12"))
+
+# KB ingestion embedding pipeline (see embedding_pipeline.py)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+# rough token budget per request (~4 chars per token, well under provider limits)
+EMBED_BATCH_MAX_CHARS = int(os.getenv("EMBED_BATCH_MAX_CHARS", "200000"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "1.0"))
+
+# how ingestion writes new kb_documents rows (see kb_writer.py)
+# "copy" = binary COPY (psycopg2 only), "insert" = multi-row INSERT batches
+KB_WRITE_METHOD = os.getenv("KB_WRITE_METHOD", "copy")
+KB_INSERT_BATCH_SIZE = int(os.getenv("KB_INSERT_BATCH_SIZE", "500"))
+
+# deterministic offline providers for load testing (see fake_models.py)
+# selected with LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake
+FAKE_LLM_FIRST_TOKEN_MS = float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "400"))
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "15"))
+FAKE_LLM_ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "80"))
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "40"))
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", str(EMBEDDING_DIM)))  # must match kb_documents.embedding
+
+# in-process CPU embeddings, EMBEDDING_PROVIDER=onnx (see onnx_embeddings.py)
+ONNX_EMBEDDING_MODEL_DIR = os.getenv("ONNX_EMBEDDING_MODEL_DIR", "models/all-MiniLM-L6-v2")
+ONNX_EMBEDDING_MODEL_FILE = os.getenv("ONNX_EMBEDDING_MODEL_FILE", "model.onnx")
+ONNX_EMBEDDING_BATCH_SIZE = int(os.getenv("ONNX_EMBEDDING_BATCH_SIZE", "32"))
+ONNX_EMBEDDING_MAX_LENGTH = int(os.getenv("ONNX_EMBEDDING_MAX_LENGTH", "256"))
+# "mean" for sentence-transformers models, "cls" for bge-style models
+ONNX_EMBEDDING_POOLING = os.getenv("ONNX_EMBEDDING_POOLING", "mean")
+# instruction prefixes some models expect (e5: "query: " / "passage: ")
+ONNX_EMBEDDING_QUERY_PREFIX = os.getenv("ONNX_EMBEDDING_QUERY_PREFIX", "")
+ONNX_EMBEDDING_DOCUMENT_PREFIX = os.getenv("ONNX_EMBEDDING_DOCUMENT_PREFIX", "")
+# threads per inference (0 = all cores); keep intra * workers <= cores
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "2"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
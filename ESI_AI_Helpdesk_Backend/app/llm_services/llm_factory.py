@@ -1,3 +1,8 @@
+from functools import cached_property
+from typing import Any
+
+import anthropic
+from pydantic import PrivateAttr
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_community.chat_models import ChatOllama
@@ -5,29 +10,86 @@ from app.llm_services.llm_config import (
     LLM_PROVIDER,
     OPENAI_API_KEY,
     ANTHROPIC_API_KEY,
-    OLLAMA_BASE_URL
+    OLLAMA_BASE_URL,
+    FAKE_LLM_FIRST_TOKEN_MS,
+    FAKE_LLM_TOKEN_MS,
+    FAKE_LLM_ANSWER_TOKENS,
+    LLM_TIMEOUT_SECONDS,
+    PROVIDER_MAX_RETRIES
 )
 
-def get_llm():
+
+class PooledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic on the registry's shared httpx clients.
+
+    ChatAnthropic takes no http_client argument and builds its SDK clients
+    on a pool of its own; these overrides hand the SDK the shared clients
+    instead (the SDK sets the base URL and timeouts per request).
+    """
+
+    _http_client: Any = PrivateAttr(default=None)
+    _http_async_client: Any = PrivateAttr(default=None)
+
+    def __init__(self, http_client=None, http_async_client=None, **kwargs):
+        super().__init__(**kwargs)
+        self._http_client = http_client
+        self._http_async_client = http_async_client
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        if self._http_client is None:
+            return super()._client
+        return anthropic.Client(**self._client_params, http_client=self._http_client)
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        if self._http_async_client is None:
+            return super()._async_client
+        return anthropic.AsyncClient(**self._client_params, http_client=self._http_async_client)
+
+
+# builds a new client; the app shares one instance through providers.py
+def get_llm(http_client=None, http_async_client=None):
 
     if LLM_PROVIDER == "openai":
         return ChatOpenAI(
             openai_api_key=OPENAI_API_KEY,
-            temperature=0
+            temperature=0,
+            stream_usage=True,  # token counts on streamed answers too
+            request_timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=PROVIDER_MAX_RETRIES,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
 
     elif LLM_PROVIDER == "anthropic":
-        return ChatAnthropic(
+        return PooledChatAnthropic(
             anthropic_api_key=ANTHROPIC_API_KEY,
             model="claude-3-sonnet-20240229",
-            temperature=0
+            temperature=0,
+            default_request_timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=PROVIDER_MAX_RETRIES,
+            http_client=http_client,
+            http_async_client=http_async_client
         )
 
     elif LLM_PROVIDER == "ollama":
+        # langchain_community's Ollama clients call the server with requests /
+        # aiohttp per request and accept no httpx client: not pooled
         return ChatOllama(
             base_url=OLLAMA_BASE_URL,
             model="llama3",
-            temperature=0
+            temperature=0,
+            timeout=int(LLM_TIMEOUT_SECONDS)
+        )
+
+    elif LLM_PROVIDER == "fake":
+        # offline deterministic model for load testing
+        from app.llm_services.fake_models import FakeChatModel
+        return FakeChatModel(
+            first_token_latency=FAKE_LLM_FIRST_TOKEN_MS / 1000,
+            token_latency=FAKE_LLM_TOKEN_MS / 1000,
+            answer_tokens=FAKE_LLM_ANSWER_TOKENS
         )
 
     else:
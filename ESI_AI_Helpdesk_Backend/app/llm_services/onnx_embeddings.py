@@ -0,0 +1,168 @@
+# onnx_embeddings.py
+#
+# In-process CPU embeddings (EMBEDDING_PROVIDER=onnx): a sentence-transformer
+# exported to ONNX (e.g. all-MiniLM-L6-v2, bge-small-en-v1.5) run with ONNX
+# Runtime, so query embedding is a few milliseconds of local compute instead
+# of an HTTP round-trip. ONNX_EMBEDDING_MODEL_DIR holds the exported model
+# and its tokenizer.json (Hugging Face tokenizers format):
+#
+#   optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 models/all-MiniLM-L6-v2
+#
+# Texts are tokenized and run in batches of ONNX_EMBEDDING_BATCH_SIZE
+# (sorted by length so a batch pads to similar lengths), pooled and L2
+# normalised. ONNX_INTRA_OP_THREADS / ONNX_INTER_OP_THREADS bound the cores
+# one inference may use; the session is built and warmed up by the app
+# lifespan (providers.start), so the first chat turn does not pay for it.
+# The model's output size must match EMBEDDING_DIM (the kb_documents /
+# query_embedding_cache vector columns); see init_db --migrate-embedding-dim.
+
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.llm_services.llm_config import (
+    ONNX_EMBEDDING_MODEL_DIR,
+    ONNX_EMBEDDING_MODEL_FILE,
+    ONNX_EMBEDDING_BATCH_SIZE,
+    ONNX_EMBEDDING_MAX_LENGTH,
+    ONNX_EMBEDDING_POOLING,
+    ONNX_EMBEDDING_QUERY_PREFIX,
+    ONNX_EMBEDDING_DOCUMENT_PREFIX,
+    ONNX_INTRA_OP_THREADS,
+    ONNX_INTER_OP_THREADS
+)
+
+logger = logging.getLogger(__name__)
+
+POOLING_MODES = ("mean", "cls")
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX model on the CPU.
+
+    The ONNX session and tokenizer are loaded on first use (or by
+    warm_up()); InferenceSession.run is thread safe, so one instance serves
+    the whole process.
+    """
+
+    def __init__(self, model_dir: str = ONNX_EMBEDDING_MODEL_DIR, model_file: str = ONNX_EMBEDDING_MODEL_FILE,
+                 batch_size: int = ONNX_EMBEDDING_BATCH_SIZE, max_length: int = ONNX_EMBEDDING_MAX_LENGTH,
+                 pooling: str = ONNX_EMBEDDING_POOLING, query_prefix: str = ONNX_EMBEDDING_QUERY_PREFIX,
+                 document_prefix: str = ONNX_EMBEDDING_DOCUMENT_PREFIX,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS, inter_op_threads: int = ONNX_INTER_OP_THREADS):
+        if pooling not in POOLING_MODES:
+            raise ValueError(f"Unsupported ONNX embedding pooling: {pooling}")
+        self.model_dir = Path(model_dir)
+        self.model_file = model_file
+        # part of the embedding cache key (embedding_cache.py)
+        self.model = self.model_dir.name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.pooling = pooling
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._session = None
+        self._tokenizer = None
+        self._input_names = ()
+        self._lock = threading.Lock()
+
+    # ---------- model loading ----------
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = self.model_dir / self.model_file
+        tokenizer_path = self.model_dir / "tokenizer.json"
+        for path in (model_path, tokenizer_path):
+            if not path.exists():
+                raise FileNotFoundError(f"ONNX embedding model file not found: {path}")
+
+        options = ort.SessionOptions()
+        # 0 lets ONNX Runtime use every core
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(str(model_path), sess_options=options,
+                                       providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        tokenizer.enable_truncation(max_length=self.max_length)
+        if tokenizer.padding is None:
+            pad_token = "[PAD]" if tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+            tokenizer.enable_padding(pad_id=tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        self._input_names = tuple(i.name for i in session.get_inputs())
+        self._tokenizer = tokenizer
+        self._session = session
+        logger.info(f"ONNX embedding model loaded: {model_path} (inputs {', '.join(self._input_names)}, "
+                    f"threads intra={self.intra_op_threads} inter={self.inter_op_threads})")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._load()
+        return self._session
+
+    def warm_up(self) -> int:
+        # loads the model and runs one batch so the first request does not
+        # pay for graph optimisation / memory allocation; returns the dimension
+        return len(self.embed_query("warm up"))
+
+    # ---------- inference ----------
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        session = self.session
+        encodings = self._tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        output = session.run(None, {name: feeds[name] for name in self._input_names})[0]
+
+        if output.ndim == 3:
+            # token embeddings (last_hidden_state) -> one vector per text
+            if self.pooling == "cls":
+                output = output[:, 0]
+            else:
+                weights = mask[..., None].astype(output.dtype)
+                output = (output * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / np.clip(norms, 1e-12, None)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # longest first, so each batch pads to about the same length
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._run([texts[i] for i in batch])):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([self.query_prefix + text])[0]
+
+    # CPU bound: run in a worker thread (ONNX Runtime releases the GIL) so
+    # the event loop keeps serving other requests meanwhile
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
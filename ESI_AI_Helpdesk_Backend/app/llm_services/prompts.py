@@ -35,7 +35,7 @@ RESPONSE GUIDELINES:
 - For deprecated documents: explicitly state "The 2023 process is no longer valid. Per our current policy..."
 - Keep answers concise and structured. Use numbered steps when guiding through a process.
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+{history}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 KNOWLEDGE BASE CONTEXT:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {context}
@@ -44,4 +44,15 @@ KNOWLEDGE BASE CONTEXT:
 USER QUESTION:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 {question}
-"""
\ No newline at end of file
+"""
+
+# filled into {history} for follow-up questions, empty otherwise
+HISTORY_SECTION = """━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+CONVERSATION SO FAR:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Use this only to understand what the user's question refers to. Facts, steps and policies
+still come ONLY from the Knowledge Base context below.
+
+{history}
+
+"""
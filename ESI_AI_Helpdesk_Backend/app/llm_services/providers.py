@@ -0,0 +1,97 @@
+# providers.py
+#
+# Process-wide registry of the LLM and embedding clients. Both are built
+# once (on first use or at app startup) on top of one shared pair of httpx
+# clients, so every provider call reuses the same keep-alive connection
+# pool instead of opening new TLS connections per client / per request.
+# The OpenAI and Anthropic clients use the pool; the Ollama ones
+# (langchain_community) make their own requests / aiohttp calls and do not.
+# Timeouts and SDK retries come from llm_config.py. The app lifespan
+# (app/main.py) builds the clients at startup and closes the pools on
+# shutdown; the registry lives as long as the process.
+
+import asyncio
+import logging
+import threading
+
+import httpx
+
+from app.llm_services.llm_config import (
+    LLM_PROVIDER,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_DIM,
+    PROVIDER_HTTP_MAX_CONNECTIONS,
+    PROVIDER_HTTP_MAX_KEEPALIVE,
+    PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    PROVIDER_CONNECT_TIMEOUT_SECONDS,
+    LLM_TIMEOUT_SECONDS
+)
+from app.llm_services.llm_factory import get_llm
+from app.llm_services.embedding_factory import get_embedder
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._http_async_client = None
+        self._llm = None
+        self._embedder = None
+
+    def _http_clients(self):
+        # sync client for threads (KB ingestion), async client for the event loop
+        if self._http_client is None:
+            limits = httpx.Limits(
+                max_connections=PROVIDER_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=PROVIDER_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS)
+            # per-request timeouts set by the SDKs take precedence
+            timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=PROVIDER_CONNECT_TIMEOUT_SECONDS)
+            self._http_client = httpx.Client(limits=limits, timeout=timeout)
+            self._http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        return self._http_client, self._http_async_client
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = get_llm(*self._http_clients())
+        return self._llm
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = get_embedder(*self._http_clients())
+        return self._embedder
+
+    async def start(self):
+        # fail fast on bad provider settings instead of on the first chat turn
+        llm, embedder = self.llm, self.embedder
+        # local models (onnx) load and run once here, off the first request
+        if hasattr(embedder, "warm_up"):
+            dimension = await asyncio.to_thread(embedder.warm_up)
+            if dimension != EMBEDDING_DIM:
+                raise RuntimeError(f"Embedding model returns {dimension} dimensions but EMBEDDING_DIM is "
+                                   f"{EMBEDDING_DIM} (see python -m app.init_db --migrate-embedding-dim)")
+        logger.info(f"Providers ready: llm={LLM_PROVIDER} ({type(llm).__name__}) "
+                    f"embeddings={EMBEDDING_PROVIDER} ({type(embedder).__name__})")
+
+    async def aclose(self):
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+        # the clients are bound to the closed pools: a later start() (or
+        # first use) builds new ones
+        with self._lock:
+            self._llm = self._embedder = None
+            self._http_client = self._http_async_client = None
+        logger.info("Provider connection pools closed")
+
+
+providers = ProviderRegistry()
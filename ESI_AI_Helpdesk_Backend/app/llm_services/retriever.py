@@ -1,53 +1,134 @@
 # retriever.py
 
 from sqlalchemy import text
-from app.utils.config import SessionLocal, OPENAI_API_KEY
+from app.utils.config import SessionLocal, AsyncSessionLocal, OPENAI_API_KEY
 # from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
-from app.llm_services.embedding_factory import get_embedder
+from app.llm_services.providers import providers
+from app.llm_services.embedding_cache import CachedQueryEmbedder
+from app.llm_services.llm_config import (
+    KB_VECTOR_INDEX,
+    HNSW_EF_SEARCH,
+    IVFFLAT_PROBES,
+    KB_RETRIEVAL_MODE,
+    HYBRID_VECTOR_WEIGHT,
+    HYBRID_RRF_K,
+    HYBRID_CANDIDATES,
+    HYBRID_LEXICAL_MIN_SIMILARITY
+)
 
 # embedder = OpenAIEmbeddings(
 #     model="text-embedding-3-small",
 #     openai_api_key=OPENAI_API_KEY
 # )
 
-embedder = get_embedder()
+# query embeddings go through the LRU / persistent cache (embedding_cache.py);
+# the provider is looked up per call, so importing this module builds no
+# client and the registry's current one is always used
+embedder = CachedQueryEmbedder(lambda: providers.embedder)
 
 # Minimum similarity threshold — documents below this are too weak to use
 MIN_SIMILARITY_THRESHOLD = 0.20
 
-def retrieve_kb(question: str, k: int = 5):
-    db = SessionLocal()
-    query_embedding = embedder.embed_query(question)
+KB_SEARCH_SQL = text("""
+    SELECT id, title, content, doc_metadata, chunk_index,
+           1 - (embedding <=> CAST(:embedding AS vector)) AS score
+    FROM kb_documents
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :k
+""")
+
+# Hybrid search: the vector ranking (ANN index) and a full-text ranking
+# (GIN index on search_vector) are taken in one statement and fused with
+# reciprocal rank fusion, score = w / (rrf_k + vector rank)
+# + (1 - w) / (rrf_k + full-text rank). Exact strings (error messages,
+# file paths, ids) that embeddings blur are recalled by the full-text side.
+# The question's words are OR-ed, so a chunk does not need every word.
+HYBRID_SEARCH_SQL = text("""
+    WITH vector_hits AS (
+        SELECT id, row_number() OVER (ORDER BY distance) AS rank
+        FROM (SELECT id, embedding <=> CAST(:embedding AS vector) AS distance
+              FROM kb_documents
+              ORDER BY embedding <=> CAST(:embedding AS vector)
+              LIMIT :candidates) v
+    ),
+    lexical_hits AS (
+        SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+        FROM (SELECT id, ts_rank_cd(search_vector, q.terms) AS text_rank
+              FROM kb_documents,
+                   (SELECT CAST(replace(CAST(plainto_tsquery('english', :question) AS text),
+                                        ' & ', ' | ') AS tsquery) AS terms) q
+              WHERE search_vector @@ q.terms
+              ORDER BY text_rank DESC
+              LIMIT :candidates) l
+    ),
+    fused AS (
+        SELECT coalesce(v.id, l.id) AS id,
+               coalesce(CAST(:vector_weight AS float8) / (CAST(:rrf_k AS float8) + v.rank), 0)
+                 + coalesce((1 - CAST(:vector_weight AS float8)) / (CAST(:rrf_k AS float8) + l.rank), 0) AS rrf_score,
+               l.rank AS lexical_rank
+        FROM vector_hits v FULL OUTER JOIN lexical_hits l ON v.id = l.id
+    )
+    SELECT kb.id, kb.title, kb.content, kb.doc_metadata, kb.chunk_index,
+           1 - (kb.embedding <=> CAST(:embedding AS vector)) AS score, f.rrf_score, f.lexical_rank
+    FROM fused f JOIN kb_documents kb ON kb.id = f.id
+    ORDER BY f.rrf_score DESC
+    LIMIT :k
+""")
+
+
+# transaction-local, so the knob applies to exactly this search
+ANN_SETTING_SQL = text("SELECT set_config(:name, :value, true)")
+
+
+def ann_search_settings(k: int) -> dict:
+    # Recall / latency knobs for the ANN index created by init_db.py
+    if KB_VECTOR_INDEX == "hnsw":
+        # ef_search below k would cap the number of rows HNSW can return
+        return {"hnsw.ef_search": str(max(HNSW_EF_SEARCH, k))}
+    if KB_VECTOR_INDEX == "ivfflat":
+        return {"ivfflat.probes": str(IVFFLAT_PROBES)}
+    return {}
 
-    sql = text("""
-        SELECT id, title, content, doc_metadata,
-               1 - (embedding <=> CAST(:embedding AS vector)) AS score
-        FROM kb_documents
-        ORDER BY embedding <=> CAST(:embedding AS vector)
-        LIMIT :k
-    """)
 
-    results = db.execute(sql, {
+def search_statement(question: str, query_embedding, k: int, mode: str = None,
+                     vector_weight: float = None):
+    # (sql, params, ANN candidate count) for the configured retrieval mode
+    mode = mode or KB_RETRIEVAL_MODE
+    if mode == "vector":
+        return KB_SEARCH_SQL, {"embedding": query_embedding, "k": k}, k
+    if mode != "hybrid":
+        raise ValueError(f"Unsupported KB retrieval mode: {mode}")
+
+    candidates = max(HYBRID_CANDIDATES, k)
+    return HYBRID_SEARCH_SQL, {
         "embedding": query_embedding,
+        "question": question,
+        "candidates": candidates,
+        "vector_weight": HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight,
+        "rrf_k": HYBRID_RRF_K,
         "k": k
-    }).fetchall()
+    }, candidates
 
-    db.close()
 
+def _to_documents(results):
     documents = []
 
     for row in results:
         similarity = float(row.score)
 
-        # Skip documents that are too weakly related
-        if similarity < MIN_SIMILARITY_THRESHOLD:
+        # Skip documents that are too weakly related (full-text matches
+        # only need the lower HYBRID_LEXICAL_MIN_SIMILARITY)
+        lexical_match = getattr(row, "lexical_rank", None) is not None
+        if similarity < (HYBRID_LEXICAL_MIN_SIMILARITY if lexical_match else MIN_SIMILARITY_THRESHOLD):
             continue
         documents.append({
             "doc": Document(
                 page_content=row.content,
-                metadata=row.doc_metadata or {}
+                # chunk_index lets the context builder merge neighbouring chunks
+                metadata={**(row.doc_metadata or {}), "chunk_index": row.chunk_index}
             ),
+            "id": str(row.id),
             "score": similarity,
             "similarity": similarity  # FIX: was missing — confidence calculator reads this key
         })
@@ -55,3 +136,39 @@ def retrieve_kb(question: str, k: int = 5):
     return documents
 
 
+def retrieve_kb(question: str, k: int = 5, mode: str = None, vector_weight: float = None,
+                query_embedding=None):
+    db = SessionLocal()
+    if query_embedding is None:
+        query_embedding = embedder.embed_query(question)
+    sql, params, candidates = search_statement(question, query_embedding, k, mode, vector_weight)
+
+    for name, value in ann_search_settings(candidates).items():
+        db.execute(ANN_SETTING_SQL, {"name": name, "value": value})
+
+    results = db.execute(sql, params).fetchall()
+
+    db.close()
+
+    return _to_documents(results)
+
+
+# Async variant used by the chat endpoint — the embedding call and the
+# vector search both yield to the event loop instead of blocking a worker
+async def aembed_question(question: str):
+    return await embedder.aembed_query(question)
+
+
+async def aretrieve_kb(question: str, k: int = 5, query_embedding=None, mode: str = None,
+                       vector_weight: float = None):
+    if query_embedding is None:
+        query_embedding = await embedder.aembed_query(question)
+    sql, params, candidates = search_statement(question, query_embedding, k, mode, vector_weight)
+
+    async with AsyncSessionLocal() as db:
+        for name, value in ann_search_settings(candidates).items():
+            await db.execute(ANN_SETTING_SQL, {"name": name, "value": value})
+
+        results = (await db.execute(sql, params)).fetchall()
+
+    return _to_documents(results)
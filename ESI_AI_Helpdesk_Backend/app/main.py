@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.apis.chat import router
 from app.apis.auth import auth_router
@@ -7,10 +9,30 @@ from app.apis.metrics import metrics_router
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 from fastapi.responses import JSONResponse
+from app.utils.turn_writer import turn_writer
+from app.metrics_rollup import rollup_refresher
+from app.llm_services.providers import providers
+from app.llm_services.context_builder import token_counter
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="ESI AI Help Desk")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await providers.start()
+    # tiktoken may download its encoding on first use: do it here, off the event loop
+    await asyncio.to_thread(token_counter.warm_up)
+    await turn_writer.start()
+    await rollup_refresher.start()
+    yield
+    await rollup_refresher.stop()
+    # SIGTERM lands here: write out queued chat turns before the worker exits
+    await turn_writer.stop()
+    # after the last turn: nothing calls the LLM / embedding providers any more
+    await providers.aclose()
+
+
+app = FastAPI(title="ESI AI Help Desk", lifespan=lifespan)
 
 # CORS CONFIGURATION
 origins = [
@@ -25,6 +47,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ticket list pagination headers (GET /tickets)
+    expose_headers=["X-Next-Cursor", "X-Total-Count-Estimate"],
 )
 
 # Include API routes
@@ -0,0 +1,260 @@
+# metrics_rollup.py
+#
+# Hourly rollups behind /metrics/summary and /metrics/trends. Instead of
+# aggregating conversations / messages / tickets / guardrail_events on every
+# dashboard refresh, the counters are kept per UTC hour in metrics_hourly
+# and metrics_hourly_tickets and the endpoints sum those rows.
+#
+# A refresh recomputes every hour from `since` onwards (the trailing
+# METRICS_ROLLUP_LOOKBACK_HOURS, which also covers late write-behind rows)
+# with range scans on the created_at indexes, so its cost depends on recent
+# traffic and not on table size. Conversations started before `since` that
+# got a ticket since then have their hour's escalation count corrected.
+#
+# When the rollups start later than the data (a database that predates the
+# rollup tables), the in-app refresher backfills every hour once before its
+# first refresh, so the dashboards show the full history after a deploy.
+#
+#   python -m app.metrics_rollup              # refresh the trailing window
+#   python -m app.metrics_rollup --backfill   # rebuild everything, one day per transaction
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.config import engine, SessionLocal, METRICS_ROLLUP_INTERVAL_SECONDS, METRICS_ROLLUP_LOOKBACK_HOURS
+
+logger = logging.getLogger(__name__)
+
+# only one worker refreshes / backfills at a time
+ROLLUP_LOCK_KEY = 72_114_001
+BACKFILL_LOCK_KEY = 72_114_002
+
+DELETE_HOURLY_SQL = text("DELETE FROM metrics_hourly WHERE bucket_start >= :since AND bucket_start < :until")
+DELETE_TICKETS_SQL = text("DELETE FROM metrics_hourly_tickets WHERE bucket_start >= :since AND bucket_start < :until")
+
+INSERT_HOURLY_SQL = text("""
+INSERT INTO metrics_hourly (bucket_start, conversations, conversations_escalated, tickets,
+                            guardrail_events, scored_answers, confidence_sum, updated_at)
+SELECT bucket_start, sum(conversations), sum(conversations_escalated), sum(tickets),
+       sum(guardrail_events), sum(scored_answers), sum(confidence_sum), now()
+FROM (
+    SELECT date_trunc('hour', c.created_at) AS bucket_start,
+           count(*) AS conversations,
+           count(*) FILTER (WHERE EXISTS (SELECT 1 FROM tickets t WHERE t.conversation_id = c.id)) AS conversations_escalated,
+           0 AS tickets, 0 AS guardrail_events, 0 AS scored_answers, 0.0 AS confidence_sum
+    FROM conversations c
+    WHERE c.created_at >= :since AND c.created_at < :until
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc('hour', created_at), 0, 0, count(*), 0, 0, 0.0
+    FROM tickets
+    WHERE created_at >= :since AND created_at < :until
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc('hour', created_at), 0, 0, 0, count(*), 0, 0.0
+    FROM guardrail_events
+    WHERE created_at >= :since AND created_at < :until
+    GROUP BY 1
+    UNION ALL
+    SELECT date_trunc('hour', created_at), 0, 0, 0, 0, count(*), sum(confidence)
+    FROM messages
+    WHERE role = 'assistant' AND confidence IS NOT NULL
+      AND created_at >= :since AND created_at < :until
+    GROUP BY 1
+) parts
+GROUP BY bucket_start
+""")
+
+INSERT_TICKETS_SQL = text("""
+INSERT INTO metrics_hourly_tickets (bucket_start, tier, severity, tickets)
+SELECT date_trunc('hour', created_at), tier, severity, count(*)
+FROM tickets
+WHERE created_at >= :since AND created_at < :until
+GROUP BY 1, 2, 3
+""")
+
+# older conversations escalated after `since`: recount their hour
+UPDATE_LATE_ESCALATIONS_SQL = text("""
+UPDATE metrics_hourly m
+SET conversations_escalated = (
+        SELECT count(*) FROM conversations c
+        WHERE c.created_at >= m.bucket_start
+          AND c.created_at < m.bucket_start + interval '1 hour'
+          AND EXISTS (SELECT 1 FROM tickets t WHERE t.conversation_id = c.id)
+    ),
+    updated_at = now()
+WHERE m.bucket_start IN (
+    SELECT DISTINCT date_trunc('hour', c.created_at)
+    FROM tickets t JOIN conversations c ON c.id = t.conversation_id
+    WHERE t.created_at >= :since AND c.created_at < :since
+)
+""")
+
+
+def floor_hour(moment: datetime) -> datetime:
+    # naive datetimes (e.g. ?start=2026-01-01T00:00) are taken as UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def refresh_rollups(db: Session, since: datetime = None, until: datetime = None) -> bool:
+    """Recompute the rollup rows for [since, until) in one transaction.
+
+    Returns False when another worker is already refreshing.
+    """
+    now = datetime.now(timezone.utc)
+    since = floor_hour(since or now - timedelta(hours=METRICS_ROLLUP_LOOKBACK_HOURS))
+    until = floor_hour(until) if until else floor_hour(now) + timedelta(hours=1)
+    params = {"since": since, "until": until}
+
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY}).scalar():
+        db.rollback()
+        return False
+
+    # hour buckets are UTC whatever the server's TimeZone is
+    db.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    db.execute(DELETE_HOURLY_SQL, params)
+    db.execute(DELETE_TICKETS_SQL, params)
+    db.execute(INSERT_HOURLY_SQL, params)
+    db.execute(INSERT_TICKETS_SQL, params)
+    db.execute(UPDATE_LATE_ESCALATIONS_SQL, params)
+    db.commit()
+    return True
+
+
+def first_event(db: Session):
+    return db.execute(text("""
+        SELECT min(created_at) FROM (
+            SELECT min(created_at) AS created_at FROM conversations
+            UNION ALL SELECT min(created_at) FROM tickets
+            UNION ALL SELECT min(created_at) FROM guardrail_events
+            UNION ALL SELECT min(created_at) FROM messages
+        ) firsts
+    """)).scalar()
+
+
+def backfill_until(db: Session):
+    """End of the history the rollups are missing, or None if they have it all.
+
+    The first event's hour always has a bucket once it has been rolled up; an
+    empty table, one only the trailing refresh has filled or an interrupted
+    backfill all start later than that.
+    """
+    first = first_event(db)
+    if first is None:
+        return None
+    earliest = db.execute(text("SELECT min(bucket_start) FROM metrics_hourly")).scalar()
+    if earliest is None:
+        return datetime.now(timezone.utc)
+    return earliest if earliest > floor_hour(first) else None
+
+
+def backfill_rollups(db: Session, until: datetime = None):
+    # newest day first, one day per transaction: an interrupted backfill
+    # leaves the rollups starting later than the data and the next one
+    # resumes from there
+    first = first_event(db)
+    if first is None:
+        logger.info("No data to roll up")
+        return
+
+    start = floor_hour(first).replace(hour=0)
+    day = floor_hour(until or datetime.now(timezone.utc)).replace(hour=0)
+    while day >= start:
+        while not refresh_rollups(db, since=day, until=day + timedelta(days=1)):
+            # wait for the in-app refresher to release the lock
+            db.execute(text("SELECT pg_sleep(1)"))
+            db.rollback()
+        logger.info(f"Rolled up {day.date()}")
+        day -= timedelta(days=1)
+
+
+def backfill_if_needed() -> bool:
+    """Backfill the rollups when they start later than the data.
+
+    Runs on one dedicated connection holding a session-level advisory lock,
+    so when several workers start together only one of them backfills.
+    Returns whether this call backfilled.
+    """
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": BACKFILL_LOCK_KEY}).scalar():
+            conn.rollback()
+            return False
+        conn.commit()
+        try:
+            with Session(bind=conn) as db:
+                # checked under the lock: a worker that finished a backfill
+                # just before leaves nothing to do
+                until = backfill_until(db)
+                db.rollback()
+                if until is None:
+                    return False
+                logger.info(f"Metrics rollups start at {until.isoformat()}, later than the data; backfilling")
+                backfill_rollups(db, until=until)
+                return True
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": BACKFILL_LOCK_KEY})
+            conn.commit()
+
+
+# ================== IN-APP REFRESHER =================
+
+class RollupRefresher:
+    def __init__(self, interval_seconds: int = METRICS_ROLLUP_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.last_refresh = None
+        self._task = None
+
+    def _refresh_once(self):
+        with SessionLocal() as db:
+            if refresh_rollups(db):
+                self.last_refresh = datetime.now(timezone.utc)
+
+    async def _run(self):
+        try:
+            await asyncio.to_thread(backfill_if_needed)
+        except Exception as e:
+            logger.error(f"Metrics rollup backfill failed: {e}")
+        while True:
+            try:
+                await asyncio.to_thread(self._refresh_once)
+            except Exception as e:
+                logger.error(f"Metrics rollup refresh failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rollup_refresher = RollupRefresher()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Refresh the metrics rollup tables")
+    parser.add_argument("--backfill", action="store_true", help="rebuild every hour since the first event")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.backfill:
+            backfill_rollups(db)
+        elif refresh_rollups(db):
+            print("Metrics rollups refreshed")
+        else:
+            print("Another refresh is running")
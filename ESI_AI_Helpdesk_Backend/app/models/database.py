@@ -1,10 +1,11 @@
 # we going to use local system postgresql and pgvector for kbs embedding storage and retrieval.
 
-from sqlalchemy import (Column, Integer, String, Text, Float, Boolean, ForeignKey, Index, func,)
-from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP
+from sqlalchemy import (Column, Integer, String, Text, Float, Boolean, ForeignKey, Index, Sequence, Computed, func,)
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP, TSVECTOR
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 from app.utils.config import Base
+from app.llm_services.llm_config import EMBEDDING_DIM
 import uuid
 
 class User(Base):
@@ -47,6 +48,8 @@ class UserSession(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False, index=True)
     access_token = Column(Text, nullable=False)
+    # sha256 of access_token — requests are authenticated by this indexed column
+    token_hash = Column(String(64), nullable=True, index=True)
     refresh_token = Column(Text, nullable=True)
     ip_address = Column(String(50))
     user_agent = Column(Text)
@@ -66,7 +69,7 @@ class Conversation(Base):
     session_id = Column(UUID(as_uuid=True), ForeignKey("user_sessions.id", ondelete="CASCADE"),nullable=False, index=True)
     user_role = Column(String(50), nullable=False)
     context = Column(JSONB, server_default="{}")
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(),nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(),nullable=False, index=True)
 
     # Relationships
     session = relationship("UserSession", back_populates="conversations")
@@ -78,8 +81,7 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="CASCADE"),nullable=False,
-        index=True)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id", ondelete="CASCADE"),nullable=False)
     role = Column(String(20), nullable=False)
     content = Column(Text, nullable=False)
     kb_references = Column(JSONB, server_default="[]")
@@ -87,27 +89,60 @@ class Message(Base):
     tier = Column(String(20), nullable=True)
     severity = Column(String(20), nullable=True)
     guardrail_blocked = Column(Boolean, server_default="false")
-    created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False, index=True)
 
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
     guardrail_events = relationship("GuardrailEvent", back_populates="message")
 
+    # latest messages of a conversation (conversation_memory.py); also
+    # serves the conversation_id foreign key lookups
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
+
+KB_SEARCH_VECTOR_SQL = "to_tsvector('english', coalesce(title, '') || ' ' || content)"
+
 class KBDocument(Base):
     __tablename__ = "kb_documents"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(500), nullable=False)
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(1536), nullable=False)
+    embedding = Column(Vector(EMBEDDING_DIM), nullable=False)
     doc_metadata = Column(JSONB, server_default="{}")
     chunk_index = Column(String(10), nullable=True)
     original_doc_id = Column(UUID(as_uuid=True), nullable=True)
+    # sha256 of the chunk text — lets ingestion skip re-embedding unchanged chunks
+    content_hash = Column(String(64), nullable=True, index=True)
+    # full-text side of hybrid retrieval (retriever.py), maintained by Postgres
+    search_vector = Column(TSVECTOR, Computed(KB_SEARCH_VECTOR_SQL, persisted=True))
     created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False)
     updated_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),onupdate=func.now())
     created_by = Column(String(255), nullable=True)
     updated_by = Column(String(255), nullable=True)
 
+    __table_args__ = (
+        Index("ix_kb_documents_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+class KBSource(Base):
+    __tablename__ = "kb_sources"
+
+    # one row per ingested markdown file, keyed by the front-matter id
+    kb_id = Column(String(255), primary_key=True)
+    source_file = Column(String(500), nullable=False)
+    file_hash = Column(String(64), nullable=False)
+    chunk_count = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),onupdate=func.now())
+    updated_by = Column(String(255), nullable=True)
+
+
+# ticket numbers (TICK-00001, ...) come from this sequence, see utils/ticket_ids.py
+ticket_id_seq = Sequence("ticket_id_seq", metadata=Base.metadata)
+
 
 class Ticket(Base):
     __tablename__ = "tickets"
@@ -132,6 +167,16 @@ class Ticket(Base):
     conversation = relationship("Conversation", back_populates="tickets")
     user = relationship("User", back_populates="tickets")
 
+    # keyset pagination for GET /tickets: the (created_at, id) sort key, plus
+    # a status prefix for the work queues (OPEN is a small slice of the
+    # table). Tier / severity filters are applied while walking one of these
+    # in order; every extra index would be written on each ticket insert
+    # and status / tier / severity update.
+    __table_args__ = (
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_status_created_at_id", "status", "created_at", "id"),
+    )
+
 
 class GuardrailEvent(Base):
     __tablename__ = "guardrail_events"
@@ -141,9 +186,45 @@ class GuardrailEvent(Base):
     message_id = Column(UUID(as_uuid=True),ForeignKey("messages.id", ondelete="SET NULL"),nullable=True)
     severity = Column(String(20), nullable=False)
     user_message = Column(Text, nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True),server_default=func.now(),nullable=False, index=True)
 
     
     #relationships
     conversation = relationship("Conversation", back_populates="guardrail_events")
-    message = relationship("Message", back_populates="guardrail_events")
\ No newline at end of file
+    message = relationship("Message", back_populates="guardrail_events")
+
+class QueryEmbeddingCache(Base):
+    __tablename__ = "query_embedding_cache"
+
+    # sha256 of embedding model + normalized question text
+    cache_key = Column(String(64), primary_key=True)
+    model = Column(String(255), nullable=False)
+    query_text = Column(Text, nullable=False)
+    embedding = Column(Vector(EMBEDDING_DIM), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+# ===== metrics rollups (maintained by app/metrics_rollup.py) =====
+
+class MetricsHourly(Base):
+    __tablename__ = "metrics_hourly"
+
+    # UTC hour; every counter is additive so any range / day is a SUM over hours
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)
+    conversations = Column(Integer, nullable=False, server_default="0")
+    # conversations started in this hour that got at least one ticket
+    conversations_escalated = Column(Integer, nullable=False, server_default="0")
+    tickets = Column(Integer, nullable=False, server_default="0")
+    guardrail_events = Column(Integer, nullable=False, server_default="0")
+    scored_answers = Column(Integer, nullable=False, server_default="0")
+    confidence_sum = Column(Float, nullable=False, server_default="0")
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+
+class MetricsHourlyTickets(Base):
+    __tablename__ = "metrics_hourly_tickets"
+
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)
+    tier = Column(String(20), primary_key=True)
+    severity = Column(String(20), primary_key=True)
+    tickets = Column(Integer, nullable=False, server_default="0")
@@ -152,34 +152,101 @@ MEDIUM_TERMS = {
 }
 
 
-def matches(pattern: str, text: str) -> bool:
-    """
-    Converts a phrase like 'drop database' into a regex that allows
-    filler words (the, a, an, my, this, all, entire, whole) between terms.
-    
-    'drop database'  → matches: 'drop database', 'drop the database',
-                                'drop my database', 'drop this database'
+# filler words allowed between the words of a term:
+# 'drop database' also matches 'drop the database', 'drop my database', ...
+FILLER = r'(?:\s+(?:the|a|an|my|this|that|all|entire|whole|our|your|its|their|this|every|any)\s+|\s+)'
+
+SEVERITY_LEVELS = [
+    ("CRITICAL", CRITICAL_TERMS),
+    ("HIGH", HIGH_TERMS),
+    ("MEDIUM", MEDIUM_TERMS),
+]
+
+WORD_CHAR = re.compile(r"\w")
+
+
+class GuardrailEngine:
+    """All guardrail terms compiled once at startup.
+
+    One trie-shaped regex over every term finds the positions where some
+    term starts in a single scan of the message; only at those positions are
+    the terms tried individually, most severe first. Same matching rules as
+    before (whole words, FILLER between the words of a term) without
+    building and recompiling one regex per term per call.
     """
-    words = pattern.split()
-    if len(words) == 1:
-        return bool(re.search(rf'\b{re.escape(words[0])}\b', text))
-    
-    # Allow 0–2 filler words between each term
-    filler = r'(?:\s+(?:the|a|an|my|this|that|all|entire|whole|our|your|its|their|this|every|any)\s+|\s+)'
-    regex = filler.join(rf'\b{re.escape(w)}\b' for w in words)
-    return bool(re.search(regex, text, re.IGNORECASE))
+
+    def __init__(self, levels):
+        # terms ordered by severity: a lower index is more severe
+        self.terms = []
+        seen = set()
+        for severity, terms in levels:
+            for term in sorted(terms):
+                term = " ".join(term.lower().split())
+                if term not in seen:
+                    seen.add(term)
+                    self.terms.append((severity, term))
+
+        self.locator = re.compile(self._trie_pattern())
+
+        # anchored per-term patterns, grouped by first character
+        self.by_first_char = {}
+        for i, (_, term) in enumerate(self.terms):
+            self.by_first_char.setdefault(term[0], []).append(
+                (i, re.compile(FILLER.join(map(re.escape, term.split())) + r"\b")))
+
+    def _trie_pattern(self) -> str:
+        trie = {}
+        for _, term in self.terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        def build(node) -> str:
+            branches = [
+                (FILLER if ch == " " else re.escape(ch)) + build(child)
+                for ch, child in sorted(node.items()) if ch
+            ]
+            if "" in node:
+                branches.append(r"\b")
+            return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+        # no leading \b: a pattern starting with literals lets re skip ahead
+        # on the first character; the word boundary is checked in scan()
+        return build(trie)
+
+    def scan(self, message: str):
+        """Return (severity, term) of the most severe match, or None."""
+        msg = message.lower()
+        search = self.locator.search
+        best = len(self.terms)
+        pos = 0
+        while True:
+            m = search(msg, pos)
+            if m is None:
+                break
+            start = m.start()
+            if start == 0 or not WORD_CHAR.match(msg, start - 1):
+                for i, pattern in self.by_first_char[msg[start]]:
+                    if i >= best:
+                        break
+                    if pattern.match(msg, start):
+                        best = i
+                        break
+                if best < len(self.terms) and self.terms[best][0] == "CRITICAL":
+                    break
+            pos = start + 1
+
+        return self.terms[best] if best < len(self.terms) else None
+
+
+guardrail_engine = GuardrailEngine(SEVERITY_LEVELS)
+
 
 def check_guardrail(message: str) -> GuardrailStatus:
-    msg = message.lower()
-    for term in CRITICAL_TERMS:
-        if matches(term, msg):
-            return GuardrailStatus(blocked=True, reason=f"Restricted: '{term}'", severity="CRITICAL")
-    for term in HIGH_TERMS:
-        if matches(term, msg):
-            return GuardrailStatus(blocked=True, reason=f"Restricted: '{term}'", severity="HIGH")
-    for term in MEDIUM_TERMS:
-        if matches(term, msg):
-            return GuardrailStatus(blocked=True, reason=f"Restricted: '{term}'", severity="MEDIUM")
+    match = guardrail_engine.scan(message)
+    if match:
+        severity, term = match
+        return GuardrailStatus(blocked=True, reason=f"Restricted: '{term}'", severity=severity)
 
     return GuardrailStatus(blocked=False, reason=None, severity="LOW")
-
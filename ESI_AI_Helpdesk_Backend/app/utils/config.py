@@ -1,9 +1,11 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine import URL
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from pgvector.asyncpg import register_vector
 
 load_dotenv()
 
@@ -52,3 +54,69 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async database configuration (used by the chat hot path so slow LLM /
+# embedding calls never hold a threadpool worker)
+def _to_async_url(url: str):
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+    # asyncpg does not understand libpq's sslmode, it takes ssl instead
+    if "sslmode" in async_url.query:
+        sslmode = async_url.query["sslmode"]
+        async_url = async_url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    return async_url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+
+# register the pgvector codec on every new asyncpg connection
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector(dbapi_connection, connection_record):
+    dbapi_connection.run_async(register_vector)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Authenticated session cache (see session_cache.py). Entries are per
+# worker; logout / deactivation clear them in the worker that handled the
+# request and the TTL bounds how long other workers can lag behind.
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAX_SIZE = int(os.getenv("SESSION_CACHE_MAX_SIZE", "10000"))
+
+# Chat turn persistence (see turn_writer.py)
+#   "sync"    - one transaction per turn, committed before the response (default)
+#   "relaxed" - same, with synchronous_commit off: no wait for the WAL fsync,
+#               a crash can lose the last few hundred ms of turns
+#   "async"   - write-behind: turns go to a bounded in-process queue and are
+#               committed in batches by a background task; drained on shutdown
+CHAT_DURABILITY_MODE = os.getenv("CHAT_DURABILITY_MODE", "sync")
+CHAT_WRITE_QUEUE_SIZE = int(os.getenv("CHAT_WRITE_QUEUE_SIZE", "1000"))
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "50"))
+CHAT_WRITE_DRAIN_TIMEOUT_SECONDS = float(os.getenv("CHAT_WRITE_DRAIN_TIMEOUT_SECONDS", "30"))
+
+# Turns that are always escalated to Tier 3 (critical severity, repeated
+# failure, restricted requests; see escalate_classifier.forced_tier) skip KB
+# retrieval and the LLM and get a templated reply with their ticket. Set to
+# false to still generate a KB answer before creating the ticket.
+CHAT_FAST_ESCALATION = os.getenv("CHAT_FAST_ESCALATION", "true").lower() == "true"
+
+# Metrics rollups (see metrics_rollup.py). The in-app refresher recomputes
+# the trailing METRICS_ROLLUP_LOOKBACK_HOURS every METRICS_ROLLUP_INTERVAL_SECONDS;
+# set the interval to 0 to run "python -m app.metrics_rollup" from cron instead.
+METRICS_ROLLUP_INTERVAL_SECONDS = int(os.getenv("METRICS_ROLLUP_INTERVAL_SECONDS", "60"))
+METRICS_ROLLUP_LOOKBACK_HOURS = int(os.getenv("METRICS_ROLLUP_LOOKBACK_HOURS", "3"))
@@ -3,29 +3,63 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer
 from jose import JWTError
-from requests import Session
-from app.models.database import UserSession
-from app.utils.config import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.database import UserSession, User, Role
+from app.utils.config import get_async_db
 from app.utils.jwt_security import decode_token
+from app.utils.session_cache import Principal, session_cache, hash_token
 
 security = HTTPBearer()
 
-def get_current_user(
+
+async def load_principal(db: AsyncSession, token_hash: str, claims: dict):
+    # one indexed query resolves session, user and role together
+    row = (await db.execute(
+        select(UserSession.id, User.id, User.email, User.full_name, Role.name, Role.level)
+        .join(User, User.id == UserSession.user_id)
+        .join(Role, Role.id == User.role_id)
+        .where(
+            UserSession.token_hash == token_hash,
+            UserSession.is_active == True,
+            User.is_active == True
+        )
+    )).first()
+
+    if not row:
+        return None
+
+    session_id, user_id, email, full_name, role_name, role_level = row
+    return Principal(
+        session_id=str(session_id),
+        user_id=str(user_id),
+        email=email,
+        full_name=full_name,
+        role_name=role_name,
+        role_level=role_level,
+        claims=claims
+    )
+
+
+# async so that authenticating a request never waits on a threadpool slot
+async def get_current_user(
     credentials=Depends(security),
-    db: Session = Depends(get_db)
-):
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     token = credentials.credentials
     payload = decode_token(token)
+    token_hash = hash_token(token)
+
+    principal = session_cache.get(token_hash)
+    if principal is None:
+        principal = await load_principal(db, token_hash, payload)
 
-    session = db.query(UserSession).filter(
-        UserSession.access_token == token,
-        UserSession.is_active == True
-    ).first()
+        if not principal:
+            raise HTTPException(status_code=401, detail="Session invalid")
 
-    if not session:
-        raise HTTPException(status_code=401, detail="Session invalid")
+        session_cache.put(token_hash, principal, token_expires_at=payload.get("exp"))
 
-    return payload
+    return principal
 
 
 
@@ -0,0 +1,109 @@
+# prometheus.py
+#
+# Prometheus metrics of the helpdesk (prometheus_client), rendered in the
+# text exposition format by GET /metrics/prometheus.
+#
+# With one worker process the values live in this process. With several
+# (gunicorn / uvicorn --workers), set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory, wiped before the server starts: every worker then writes its
+# counters / histograms there and a scrape of any worker returns the totals
+# of all of them.
+
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# *_created samples only add series nobody graphs
+disable_created_metrics()
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the helpdesk metrics only, not the client library's process / platform collectors
+REGISTRY = CollectorRegistry()
+
+
+class SampleCollector:
+    """Values owned elsewhere (cache stats, queue depth), read at scrape time.
+
+    read() returns (labels dict, value) samples. These are always the
+    values of the worker answering the scrape.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames, read):
+        self.name = name
+        self.documentation = documentation
+        self.family = {"counter": CounterMetricFamily, "gauge": GaugeMetricFamily}[kind]
+        self.labelnames = list(labelnames)
+        self.read = read
+
+    def collect(self):
+        family = self.family(self.name, self.documentation, labels=self.labelnames)
+        for labels, value in self.read():
+            family.add_metric([str(labels[name]) for name in self.labelnames], value)
+        yield family
+
+
+class Exposition:
+    # generate_latest() only needs collect()
+    def __init__(self, collectors):
+        self.collectors = collectors
+
+    def collect(self):
+        for collector in self.collectors:
+            yield from collector.collect()
+
+
+def render_metrics(*sample_collectors) -> bytes:
+    # multi-process: the counters / histograms of every worker, merged from
+    # PROMETHEUS_MULTIPROC_DIR; otherwise this process's registry
+    source = multiprocess.MultiProcessCollector(None) if MULTIPROCESS else REGISTRY
+    return generate_latest(Exposition((source,) + sample_collectors))
+
+
+# ================== HELPDESK METRICS =================
+
+CHAT_STAGE_SECONDS = Histogram(
+    "helpdesk_chat_stage_seconds",
+    "Time spent per stage of a chat turn",
+    ["stage"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+
+CHAT_TURNS = Counter(
+    "helpdesk_chat_turns_total",
+    "Chat turns by outcome",
+    ["outcome"], registry=REGISTRY)
+
+LLM_TOKENS = Counter(
+    "helpdesk_llm_tokens_total",
+    "LLM tokens reported by the provider",
+    ["kind"], registry=REGISTRY)
+
+ESCALATIONS = Counter(
+    "helpdesk_escalations_total",
+    "Chat turns escalated to a support ticket",
+    ["tier", "severity"], registry=REGISTRY)
+
+GUARDRAIL_BLOCKS = Counter(
+    "helpdesk_guardrail_blocks_total",
+    "Chat messages blocked by the guardrail",
+    ["severity"], registry=REGISTRY)
+
+PROMPT_TOKENS = Histogram(
+    "helpdesk_prompt_tokens",
+    "Tokens per LLM prompt (whole prompt, the KB context and the conversation history parts)",
+    ["part"], buckets=TOKEN_BUCKETS, registry=REGISTRY)
+
+SPECULATIVE_RETRIEVALS = Counter(
+    "helpdesk_speculative_retrievals_total",
+    "KB retrievals started before the guardrail / escalation decision, by outcome (used / cancelled)",
+    ["outcome"], registry=REGISTRY)
@@ -0,0 +1,111 @@
+# session_cache.py
+#
+# Cache of authenticated sessions. get_current_user resolves a bearer token
+# to a Principal (session + user + role) with one indexed query on
+# user_sessions.token_hash and keeps it for SESSION_CACHE_TTL_SECONDS, so
+# repeated requests with the same token need no identity queries at all.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from app.utils.config import SESSION_CACHE_TTL_SECONDS, SESSION_CACHE_MAX_SIZE
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Resolved identity of an authenticated request.
+
+    Also readable like the JWT payload dict it replaces
+    (principal["sub"], principal.get("role_level")).
+    """
+    session_id: str
+    user_id: str
+    email: str
+    full_name: str
+    role_name: str
+    role_level: int
+    claims: dict = field(default_factory=dict, compare=False)
+
+    def __getitem__(self, key):
+        return self.as_claims()[key]
+
+    def get(self, key, default=None):
+        return self.as_claims().get(key, default)
+
+    def as_claims(self) -> dict:
+        # role / level come from the database, not the (possibly stale) token
+        return {**self.claims, "sub": self.user_id, "role": self.role_name, "role_level": self.role_level}
+
+
+class SessionCache:
+    def __init__(self, ttl_seconds: int = SESSION_CACHE_TTL_SECONDS, max_size: int = SESSION_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token_hash -> (expires_at, Principal)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, token_hash: str):
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[token_hash]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(token_hash)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, token_hash: str, principal: Principal, token_expires_at: float = None):
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            # never serve a principal past its token's own expiry
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token_hash] = (time.monotonic() + ttl, principal)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _invalidate(self, predicate) -> int:
+        with self._lock:
+            stale = [key for key, (_, principal) in self._entries.items() if predicate(key, principal)]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def invalidate_token(self, token_hash: str) -> int:
+        return self._invalidate(lambda key, _: key == token_hash)
+
+    def invalidate_session(self, session_id) -> int:
+        return self._invalidate(lambda _, principal: principal.session_id == str(session_id))
+
+    def invalidate_user(self, user_id) -> int:
+        return self._invalidate(lambda _, principal: principal.user_id == str(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+session_cache = SessionCache()
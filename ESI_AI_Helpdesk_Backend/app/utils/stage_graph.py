@@ -0,0 +1,50 @@
+# stage_graph.py
+#
+# Runs the independent stages of a chat turn concurrently. Each stage is a
+# coroutine started as a task as soon as its inputs are known; a stage that
+# needs another one awaits its result. Speculative stages (KB retrieval
+# started before the guardrail verdict) are cancelled once their result is
+# no longer wanted, and leaving the graph cancels whatever is still pending,
+# so no stage outlives the turn that started it (early return or error).
+
+import asyncio
+
+
+class StageGraph:
+    def __init__(self):
+        self._tasks = {}
+
+    def start(self, name: str, coro):
+        # the task copies the current context, so stages started while a
+        # StageTimer is active are recorded on it
+        if name in self._tasks:
+            coro.close()
+            raise ValueError(f"Stage {name} already started")
+        task = self._tasks[name] = asyncio.create_task(coro, name=f"stage:{name}")
+        return task
+
+    async def result(self, name: str):
+        return await self._tasks[name]
+
+    def cancel(self, name: str) -> bool:
+        task = self._tasks.get(name)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def close(self):
+        pending = [task for task in self._tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # mark failures of stages nobody awaited as retrieved
+        for task in self._tasks.values():
+            if not task.cancelled():
+                task.exception()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,79 @@
+# stage_timer.py
+#
+# Wall-clock time per stage of a chat turn (context, history, guardrail,
+# classifier, embedding, vector_search, generation, db_commit). Every stage
+# is observed in the helpdesk_chat_stage_seconds histogram (GET /metrics/prometheus);
+# while a StageTimer is active the durations are also collected for the
+# current turn, which /api/chat returns in a Server-Timing header for load
+# tests (benchmarks/load_harness.py) and the browser dev tools.
+#
+# Independent stages run concurrently (see app/utils/stage_graph.py), so
+# the stage durations can add up to more than the turn itself; the "total"
+# entry is the turn's wall-clock time, i.e. its critical path.
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.utils.prometheus import CHAT_STAGE_SECONDS
+
+_active_timer = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    def __init__(self):
+        self.durations = {}
+        self.started = time.perf_counter()
+
+    def activate(self):
+        # returns a token for deactivate(); the timer only sees stages run
+        # in this task (and tasks it creates afterwards)
+        return _active_timer.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _active_timer.reset(token)
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def finish(self):
+        # records the turn's wall-clock time as the "total" stage
+        seconds = time.perf_counter() - self.started
+        CHAT_STAGE_SECONDS.labels(stage="total").observe(seconds)
+        self.add("total", seconds)
+
+    def server_timing(self) -> str:
+        # e.g. "guardrail;dur=0.41, vector_search;dur=38.20" (milliseconds)
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items())
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        CHAT_STAGE_SECONDS.labels(stage=name).observe(seconds)
+        timer = _active_timer.get()
+        if timer is not None:
+            timer.add(name, seconds)
+
+
+async def timed(name: str, coro):
+    # stage() around a coroutine, for stages started as tasks
+    with stage(name):
+        return await coro
+
+
+def parse_server_timing(header: str) -> dict:
+    # inverse of server_timing(): {stage: seconds}
+    durations = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                durations[name] = float(value) / 1000
+    return durations
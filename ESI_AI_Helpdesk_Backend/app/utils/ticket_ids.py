@@ -0,0 +1,28 @@
+# ticket_ids.py
+#
+# Ticket id allocation. Numbers come from the ticket_id_seq Postgres
+# sequence: nextval() is atomic across connections and workers, so two
+# concurrent escalations can never mint the same TICK-xxxxx id, and it is
+# O(1) instead of looking up the latest ticket. Numbers used by a rolled
+# back transaction are not reused, so gaps are expected.
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.database import ticket_id_seq
+
+TICKET_ID_PREFIX = "TICK-"
+
+
+def format_ticket_id(number: int) -> str:
+    return f"{TICKET_ID_PREFIX}{number:05d}"
+
+
+async def allocate_ticket_id(db: AsyncSession) -> str:
+    number = (await db.execute(select(ticket_id_seq.next_value()))).scalar_one()
+    return format_ticket_id(number)
+
+
+def allocate_ticket_id_sync(db: Session) -> str:
+    number = db.execute(select(ticket_id_seq.next_value())).scalar_one()
+    return format_ticket_id(number)
@@ -0,0 +1,172 @@
+# turn_writer.py
+#
+# Write-behind persistence for chat turns. A turn's rows (the conversation
+# on a session's first turn, user message, guardrail event, ticket,
+# assistant message) are collected in a PendingTurn and written in one
+# transaction instead of one commit per row,
+# together with any UPDATE statements of the turn (the conversation summary).
+# In "async" mode the turn is handed to a bounded queue and a background
+# task commits queued turns in batches off the request path; the queue is
+# drained when the app shuts down (SIGTERM runs the lifespan shutdown).
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.stage_timer import stage
+from app.utils.config import (
+    AsyncSessionLocal,
+    CHAT_DURABILITY_MODE,
+    CHAT_WRITE_QUEUE_SIZE,
+    CHAT_WRITE_BATCH_SIZE,
+    CHAT_WRITE_DRAIN_TIMEOUT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ("sync", "relaxed", "async")
+
+
+class PendingTurn:
+    def __init__(self):
+        self.rows = []
+        self.statements = []
+        self.submitted = False
+
+    def add(self, row):
+        # rows are stamped when they happen, not when a batch is committed,
+        # so message order survives write-behind and batching
+        if hasattr(type(row), "created_at") and row.created_at is None:
+            row.created_at = datetime.now(timezone.utc)
+        self.rows.append(row)
+        return row
+
+    def add_if_new(self, row):
+        # a row created for this turn and not stored yet (the conversation of
+        # a session's first turn) is written with the turn; rows loaded from
+        # the database are left alone. The unit of work inserts parents first.
+        if inspect(row).transient:
+            self.add(row)
+        return row
+
+    def execute(self, statement):
+        # Core statements, not ORM objects: the rows may be written by the
+        # background writer's session, not the one that loaded them
+        self.statements.append(statement)
+
+
+async def write_rows(db: AsyncSession, rows: list, statements: list = (), synchronous_commit: bool = True):
+    if not synchronous_commit:
+        await db.execute(text("SET LOCAL synchronous_commit = off"))
+    db.add_all(rows)
+    for statement in statements:
+        await db.execute(statement)
+    with stage("db_commit"):
+        await db.commit()
+
+
+class TurnWriter:
+    def __init__(self, mode: str = CHAT_DURABILITY_MODE, queue_size: int = CHAT_WRITE_QUEUE_SIZE,
+                 batch_size: int = CHAT_WRITE_BATCH_SIZE):
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unsupported chat durability mode: {mode}")
+        self.mode = mode
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue = None
+        self._task = None
+        self._stats = {"turns": 0, "queued": 0, "inline": 0, "batches": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def persist(self, db: AsyncSession, turn: PendingTurn):
+        """Persist a turn according to the durability mode.
+
+        db is the request's session, used for inline writes.
+        """
+        if turn.submitted or not (turn.rows or turn.statements):
+            return
+        turn.submitted = True
+        self._stats["turns"] += 1
+
+        if self.mode == "async" and self.running:
+            try:
+                self._queue.put_nowait(turn)
+                self._stats["queued"] += 1
+                return
+            except asyncio.QueueFull:
+                # backpressure: write this turn inline rather than drop it
+                pass
+
+        self._stats["inline"] += 1
+        await write_rows(db, turn.rows, turn.statements, synchronous_commit=self.mode == "sync")
+
+    # ---------- background writer ----------
+
+    async def start(self):
+        if self.mode != "async" or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Chat turn writer started (queue={self.queue_size}, batch={self.batch_size})")
+
+    async def stop(self, timeout: float = CHAT_WRITE_DRAIN_TIMEOUT_SECONDS):
+        # drain everything already queued, then stop the worker
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Chat turn writer drain timed out, {self._queue.qsize()} turns not written")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Chat turn writer stopped")
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: list):
+        try:
+            async with AsyncSessionLocal() as db:
+                await write_rows(db, [row for turn in batch for row in turn.rows],
+                                 [statement for turn in batch for statement in turn.statements])
+            self._stats["batches"] += 1
+            return
+        except Exception as e:
+            logger.error(f"Chat turn batch of {len(batch)} failed ({e}); retrying turn by turn")
+
+        # one bad turn must not take the rest of the batch with it
+        for turn in batch:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await write_rows(db, turn.rows, turn.statements)
+            except Exception as e:
+                self._stats["failed"] += 1
+                logger.error(f"Chat turn could not be persisted: {e}")
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "mode": self.mode,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+        }
+
+
+turn_writer = TurnWriter()
@@ -0,0 +1,157 @@
+# ann_recall.py
+#
+# Recall vs latency of pgvector ANN indexes compared with an exact scan.
+# Builds a synthetic clustered corpus in a scratch table (ann_benchmark),
+# computes the exact top-k for each query with numpy, then measures recall@k
+# and query latency for an exact sequential scan, HNSW at several ef_search
+# values and IVFFlat at several probes values.
+#
+#   python -m benchmarks.ann_recall --rows 50000 --queries 200 --k 5
+#
+# Needs DATABASE_URL pointing at a Postgres with the vector extension.
+
+import argparse
+import io
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+from pgvector.psycopg2 import register_vector
+
+TABLE = "ann_benchmark"
+
+
+def synthetic_corpus(rows, dim, clusters, seed):
+    # KB chunks cluster by topic, so a uniform random corpus would flatter IVFFlat
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, centers, rng
+
+
+def synthetic_queries(centers, count, rng):
+    dim = centers.shape[1]
+    labels = rng.integers(0, len(centers), size=count)
+    queries = centers[labels] + 0.45 * rng.normal(size=(count, dim)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def load_corpus(conn, vectors):
+    dim = vectors.shape[1]
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, embedding vector({dim}))")
+        buffer = io.StringIO()
+        for i, vector in enumerate(vectors):
+            buffer.write(f"{i}\t[{','.join(f'{x:.6f}' for x in vector)}]\n")
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {TABLE} (id, embedding) FROM STDIN", buffer)
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def build_index(conn, kind, rows):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {TABLE}_hnsw")
+        cur.execute(f"DROP INDEX IF EXISTS {TABLE}_ivfflat")
+        started = time.perf_counter()
+        if kind == "hnsw":
+            cur.execute(f"CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw (embedding vector_cosine_ops)")
+        else:
+            lists = max(rows // 1000, 1) if rows <= 1_000_000 else int(math.sqrt(rows))
+            cur.execute(f"CREATE INDEX {TABLE}_ivfflat ON {TABLE} USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})")
+    conn.commit()
+    return time.perf_counter() - started
+
+
+def run_queries(conn, queries, k, settings):
+    latencies, results = [], []
+    with conn.cursor() as cur:
+        for query in queries:
+            cur.execute("BEGIN")
+            for name, value in settings.items():
+                cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+            started = time.perf_counter()
+            cur.execute(
+                f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s LIMIT %s",
+                (query, k),
+            )
+            ids = [row[0] for row in cur.fetchall()]
+            latencies.append(time.perf_counter() - started)
+            cur.execute("COMMIT")
+            results.append(ids)
+    return results, latencies
+
+
+def recall_at_k(results, exact):
+    hits = sum(len(set(found) & set(truth)) for found, truth in zip(results, exact))
+    return hits / sum(len(truth) for truth in exact)
+
+
+def report(label, results, latencies, exact):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))]
+    print(
+        f"{label:<24} recall@k={recall_at_k(results, exact):.4f} "
+        f"p50={statistics.median(latencies) * 1000:8.2f}ms p95={p95 * 1000:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pgvector ANN recall/latency benchmark")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef-search", default="10,20,40,64,100,200")
+    parser.add_argument("--probes", default="1,5,10,20,50")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-table", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    # explicit BEGIN/COMMIT around each query keeps set_config(..., true) scoped to it
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    register_vector(conn)
+
+    vectors, centers, rng = synthetic_corpus(args.rows, args.dim, args.clusters, args.seed)
+    queries = synthetic_queries(centers, args.queries, rng)
+    exact = [[int(i) for i in np.argsort(-(vectors @ q))[:args.k]] for q in queries]
+
+    print(f"loading {args.rows} x {args.dim} vectors ...")
+    load_corpus(conn, vectors)
+
+    results, latencies = run_queries(conn, queries, args.k, {"enable_indexscan": "off"})
+    report("exact (seq scan)", results, latencies, exact)
+
+    build_seconds = build_index(conn, "hnsw", args.rows)
+    print(f"hnsw build {build_seconds:.1f}s")
+    for ef in args.ef_search.split(","):
+        results, latencies = run_queries(conn, queries, args.k, {"hnsw.ef_search": ef})
+        report(f"hnsw ef_search={ef}", results, latencies, exact)
+
+    build_seconds = build_index(conn, "ivfflat", args.rows)
+    print(f"ivfflat build {build_seconds:.1f}s")
+    for probes in args.probes.split(","):
+        results, latencies = run_queries(conn, queries, args.k, {"ivfflat.probes": probes})
+        report(f"ivfflat probes={probes}", results, latencies, exact)
+
+    if not args.keep_table:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
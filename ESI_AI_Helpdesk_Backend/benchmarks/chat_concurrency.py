@@ -0,0 +1,129 @@
+# chat_concurrency.py
+#
+# Load benchmark for the /api/chat endpoint. Fires chat requests at a fixed
+# concurrency while a probe keeps hitting /health, so it shows both chat
+# throughput and how much unrelated endpoints queue behind slow LLM calls.
+#
+# Run it once against a server started from the old (sync) code and once
+# against the current (async) code with the same arguments, e.g.
+#
+#   python -m benchmarks.chat_concurrency --base-url http://127.0.0.1:8000 \
+#       --email Trainee@esi.com --password Trainee@123 --concurrency 32 --requests 200
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "I keep getting redirected to the login page after logging in. What should I do?",
+    "How do I reset my MFA device?",
+    "My lab VM is frozen, how do I recover it?",
+    "Which environment should I use for the red team range?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, latencies):
+    if not latencies:
+        return f"{name:<8} no samples"
+    return (
+        f"{name:<8} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:8.1f}ms "
+        f"p95={percentile(latencies, 95) * 1000:8.1f}ms "
+        f"max={max(latencies) * 1000:8.1f}ms "
+        f"mean={statistics.mean(latencies) * 1000:8.1f}ms"
+    )
+
+
+async def login(client, email, password):
+    resp = await client.post("/auth/login", json={"email": email, "password": password})
+    resp.raise_for_status()
+    body = resp.json()
+    return body["access_token"], body["session_id"]
+
+
+async def chat_worker(client, headers, session_id, queue, latencies, errors):
+    while True:
+        try:
+            question = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        started = time.perf_counter()
+        try:
+            resp = await client.post(
+                "/api/chat",
+                headers=headers,
+                json={"sessionId": session_id, "message": question},
+            )
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - started)
+
+
+async def health_probe(client, stop, latencies, interval):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/health")
+        except httpx.HTTPError:
+            pass
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token, session_id = await login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)])
+
+        chat_latencies, health_latencies, errors = [], [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(health_probe(client, stop, health_latencies, args.probe_interval))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            chat_worker(client, headers, session_id, queue, chat_latencies, errors)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await probe
+
+    print(f"base_url={args.base_url} concurrency={args.concurrency} requests={args.requests}")
+    print(f"elapsed={elapsed:.2f}s throughput={len(chat_latencies) / elapsed:.2f} req/s errors={len(errors)}")
+    print(summarize("chat", chat_latencies))
+    print(summarize("health", health_latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /api/chat throughput benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
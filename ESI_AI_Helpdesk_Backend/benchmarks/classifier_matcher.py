@@ -0,0 +1,125 @@
+# classifier_matcher.py
+#
+# Micro-benchmark of the escalation keyword checks for one chat turn:
+# the previous per-phrase scans ("any(p in msg for p in LIST)" chains in
+# classify_tier / classify_severity plus the frustration scan in chat.py)
+# vs the single-pass compiled KeywordMatcher. Also checks that both give
+# the same tier, severity and frustration decision for every message.
+#
+#   python -m benchmarks.classifier_matcher --messages 2000
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from app.apis.pydantic_models import TierLevel, SeverityLevel
+from app.llm_services import escalate_classifier as ec
+
+WORDS = (
+    "my lab vm is not starting after the reset and i can not log in to the portal "
+    "please help the session keeps dropping every few minutes since this morning"
+).split()
+
+
+# ===== previous implementation =====
+
+def legacy_severity(msg):
+    if any(k in msg for k in ec.CRITICAL_KEYWORDS):
+        return SeverityLevel.CRITICAL
+    elif any(k in msg for k in ec.HIGH_KEYWORDS):
+        return SeverityLevel.HIGH
+    elif any(k in msg for k in ec.MEDIUM_KEYWORDS):
+        return SeverityLevel.MEDIUM
+    return SeverityLevel.LOW
+
+
+def legacy_tier(msg, severity, kb_coverage, repeated_failure):
+    if severity == SeverityLevel.CRITICAL or repeated_failure:
+        return TierLevel.TIER_3
+    if any(p in msg for p in ec.FORCE_TIER3_PATTERNS):
+        return TierLevel.TIER_3
+    if any(p in msg for p in ec.FORCE_TIER3_HIGH_SEVERITY):
+        return TierLevel.TIER_3
+    if any(p in msg for p in ec.FORCE_TIER2_PATTERNS):
+        return TierLevel.TIER_2
+    if not kb_coverage:
+        return TierLevel.TIER_3 if severity in [SeverityLevel.CRITICAL, SeverityLevel.HIGH] else TierLevel.TIER_2
+    if any(k in msg for k in ec.TIER_4_KEYWORDS):
+        return TierLevel.TIER_4
+    if any(k in msg for k in ec.TIER_3_KEYWORDS):
+        return TierLevel.TIER_3
+    if any(k in msg for k in ec.TIER_2_KEYWORDS):
+        return TierLevel.TIER_2
+    if any(k in msg for k in ec.TIER_1_KEYWORDS):
+        return TierLevel.TIER_1
+    return TierLevel.TIER_0
+
+
+def legacy_turn(message, kb_coverage=True):
+    msg = message.lower()
+    score = sum(w for p, w in ec.FRUSTRATION_WEIGHTS.items() if p in msg)
+    repeated_failure = score >= 2
+    severity = legacy_severity(msg)
+    return legacy_tier(msg, severity, kb_coverage, repeated_failure), severity, score
+
+
+def matcher_turn(message, kb_coverage=True):
+    hits = ec.match_keywords(message)
+    repeated_failure = ec.is_repeated_failure(hits)
+    severity = ec.classify_severity(message, hits=hits)
+    tier = ec.classify_tier(message, severity, kb_coverage, repeated_failure=repeated_failure, hits=hits)
+    return tier, severity, ec.frustration_score(hits)
+
+
+# ===== message corpus =====
+
+def build_messages(count, seed):
+    rng = random.Random(seed)
+    phrases = [p for phrases in ec.KEYWORD_CATEGORIES.values() for p in phrases]
+    paragraphs = [
+        p.strip() for md in sorted(Path("kbs").glob("*.md"))
+        for p in md.read_text(encoding="utf-8").split("\n\n") if p.strip()
+    ]
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(WORDS) for _ in range(rng.randint(5, 30))]
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(phrases).upper() if rng.random() < 0.2 else rng.choice(phrases))
+        if paragraphs and rng.random() < 0.2:
+            parts.append(rng.choice(paragraphs))
+        messages.append(" ".join(parts))
+    return messages
+
+
+def timed(fn, messages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - started) / (repeat * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="escalation keyword matcher micro-benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages, args.seed)
+
+    mismatches = [m for m in messages if legacy_turn(m) != matcher_turn(m)
+                  or legacy_turn(m, False) != matcher_turn(m, False)]
+    print(f"{len(messages)} messages, {len(mismatches)} decision mismatches")
+    for message in mismatches[:5]:
+        print("  mismatch:", message[:120])
+
+    legacy = timed(legacy_turn, messages, args.repeat)
+    compiled = timed(matcher_turn, messages, args.repeat)
+    print(f"per-phrase scans   {legacy * 1e6:8.2f} us/message")
+    print(f"compiled matcher   {compiled * 1e6:8.2f} us/message ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# guardrail_engine.py
+#
+# Benchmark of check_guardrail over a corpus of benign and malicious
+# messages: the previous implementation (one regex string built per term per
+# call, relying on re's small cache) vs the precompiled GuardrailEngine.
+# Also checks that both block the same messages at the same severity.
+#
+#   python -m benchmarks.guardrail_engine --messages 2000
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from app.utils import Guardrail
+from app.utils.Guardrail import check_guardrail
+
+BENIGN = [
+    "my lab vm will not start after i reset my password",
+    "the portal logs me out after a few minutes, is my session expiring?",
+    "how do i reset mfa on my new phone",
+    "dns lookups fail inside the range environment",
+    "the container for my exercise is stuck on starting",
+    "where can i find the instructions for today's lab",
+    "i get a 503 error when i open the trainee dashboard",
+    "can you explain how snapshots and restore work",
+]
+
+FILLERS = ["", "the", "my", "all", "this", "our", "every"]
+
+
+# ===== previous implementation =====
+
+def legacy_matches(pattern, text):
+    words = pattern.split()
+    if len(words) == 1:
+        return bool(re.search(rf'\b{re.escape(words[0])}\b', text))
+    filler = r'(?:\s+(?:the|a|an|my|this|that|all|entire|whole|our|your|its|their|this|every|any)\s+|\s+)'
+    regex = filler.join(rf'\b{re.escape(w)}\b' for w in words)
+    return bool(re.search(regex, text, re.IGNORECASE))
+
+
+def legacy_check(message):
+    msg = message.lower()
+    for severity, terms in Guardrail.SEVERITY_LEVELS:
+        for term in terms:
+            if legacy_matches(term, msg):
+                return severity
+    return "LOW"
+
+
+# ===== corpus =====
+
+def malicious_message(rng):
+    severity, terms = rng.choice(Guardrail.SEVERITY_LEVELS)
+    words = rng.choice(sorted(terms)).split()
+    phrase = words[0]
+    for word in words[1:]:
+        filler = rng.choice(FILLERS)
+        phrase += f" {filler} {word}" if filler else f" {word}"
+    if rng.random() < 0.3:
+        phrase = phrase.upper()
+    sentence = rng.choice(BENIGN).split()
+    sentence.insert(rng.randint(0, len(sentence)), phrase)
+    return " ".join(sentence)
+
+
+def build_corpus(count, malicious_ratio, seed):
+    rng = random.Random(seed)
+    paragraphs = [
+        p.strip() for md in sorted(Path("kbs").glob("*.md"))
+        for p in md.read_text(encoding="utf-8").split("\n\n") if p.strip()
+    ]
+    messages = []
+    for _ in range(count):
+        if rng.random() < malicious_ratio:
+            messages.append(malicious_message(rng))
+        elif paragraphs and rng.random() < 0.3:
+            messages.append(rng.choice(paragraphs))
+        else:
+            messages.append(rng.choice(BENIGN))
+    return messages
+
+
+def timed(fn, messages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - started) / (repeat * len(messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="guardrail engine benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--malicious-ratio", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    messages = build_corpus(args.messages, args.malicious_ratio, args.seed)
+
+    mismatches = [m for m in messages if legacy_check(m) != check_guardrail(m).severity]
+    blocked = sum(check_guardrail(m).blocked for m in messages)
+    print(f"{len(messages)} messages, {blocked} blocked, {len(mismatches)} severity mismatches")
+    for message in mismatches[:5]:
+        print("  mismatch:", message[:120])
+
+    for label, corpus in (
+        ("all", messages),
+        ("benign", [m for m in messages if not check_guardrail(m).blocked]),
+        ("blocked", [m for m in messages if check_guardrail(m).blocked]),
+    ):
+        if not corpus:
+            continue
+        legacy = timed(legacy_check, corpus, args.repeat)
+        engine = timed(check_guardrail, corpus, args.repeat)
+        print(f"{label:<8} per-term regex {legacy * 1e6:9.2f} us/message   "
+              f"engine {engine * 1e6:8.2f} us/message ({legacy / engine:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
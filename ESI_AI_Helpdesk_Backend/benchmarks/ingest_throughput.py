@@ -0,0 +1,150 @@
+# ingest_throughput.py
+#
+# Chunks/second of KB ingestion on a large synthetic KB directory.
+# Uses a simulated embedding provider (fixed latency per request plus a
+# per-text cost, optional injected 429s) so the numbers reflect the
+# pipeline rather than the network.
+#
+#   python -m benchmarks.ingest_throughput --files 300
+#   python -m benchmarks.ingest_throughput --files 300 --scratch-database
+#
+# --scratch-database runs load_kbs end to end against DATABASE_URL. load_kbs
+# treats articles missing from the directory as removed, so only point it at
+# a throwaway database.
+#
+# Compares the old flow (one embed_documents call per file, serially)
+# with embedding_pipeline.embed_texts (cross-file batches, bounded
+# concurrency, retry/backoff).
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.kb_loader import make_splitter, parse_markdown
+from app.llm_services.embedding_pipeline import embed_texts
+from app.llm_services.llm_config import EMBEDDING_DIM
+
+WORDS = (
+    "lab vm container network dns login session token mfa reset policy range "
+    "environment snapshot restore credentials browser cookie portal instructor "
+    "trainee operator escalate ticket startup script mount image kernel clock"
+).split()
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class SimulatedEmbeddings:
+    def __init__(self, request_latency, per_text_latency, dim, rate_limit_probability):
+        self.request_latency = request_latency
+        self.per_text_latency = per_text_latency
+        self.dim = dim
+        self.rate_limit_probability = rate_limit_probability
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.request_latency + self.per_text_latency * len(texts))
+        if random.random() < self.rate_limit_probability:
+            raise RateLimited("rate limit exceeded")
+        return [[float(len(text) % 7)] * self.dim for text in texts]
+
+
+def write_synthetic_kbs(directory: Path, files: int, paragraphs: int, seed: int):
+    rng = random.Random(seed)
+    for n in range(files):
+        body = "\n\n".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+            for _ in range(paragraphs)
+        )
+        (directory / f"{n:05d}-synthetic.md").write_text(
+            f"---\nid: kb-synthetic-{n:05d}\ntitle: Synthetic article {n}\nversion: 1.0\n"
+            f"tags: [synthetic]\n---\n\n{body}\n",
+            encoding="utf-8",
+        )
+
+
+def split_all(directory: Path):
+    splitter = make_splitter()
+    per_file = []
+    for md_file in sorted(directory.glob("*.md")):
+        _, body = parse_markdown(md_file)
+        per_file.append(splitter.split_text(body))
+    return per_file
+
+
+def bench_serial(embedder, per_file):
+    started = time.perf_counter()
+    for chunks in per_file:
+        embedder.embed_documents(chunks)
+    return time.perf_counter() - started
+
+
+def bench_pipeline(embedder, per_file, args):
+    texts = [chunk for chunks in per_file for chunk in chunks]
+    started = time.perf_counter()
+    embed_texts(embedder, texts, batch_size=args.batch_size, max_concurrency=args.concurrency)
+    return time.perf_counter() - started
+
+
+def bench_database(embedder, directory):
+    from app.kb_loader import load_kbs
+    from app.utils.config import SessionLocal
+
+    timings = []
+    with SessionLocal() as db:
+        for label in ("cold", "unchanged"):
+            started = time.perf_counter()
+            report = load_kbs(db, created_by="benchmark", kb_dir=str(directory), embedder=embedder)
+            timings.append((label, time.perf_counter() - started, report))
+        # empty directory: removes every article again
+        load_kbs(db, created_by="benchmark", kb_dir=str(directory / "empty"), embedder=embedder)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KB ingestion throughput benchmark")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--request-latency", type=float, default=0.15)
+    parser.add_argument("--per-text-latency", type=float, default=0.001)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="must match kb_documents.embedding")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scratch-database", action="store_true",
+                        help="also run load_kbs end to end against DATABASE_URL (wipes its KB)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        (directory / "empty").mkdir()
+        write_synthetic_kbs(directory, args.files, args.paragraphs, args.seed)
+        per_file = split_all(directory)
+        total_chunks = sum(len(chunks) for chunks in per_file)
+        print(f"{args.files} files, {total_chunks} chunks")
+
+        if args.rate_limit_probability == 0:
+            embedder = SimulatedEmbeddings(args.request_latency, args.per_text_latency, args.dim, 0.0)
+            seconds = bench_serial(embedder, per_file)
+            print(f"serial per-file   {seconds:7.2f}s {total_chunks / seconds:9.1f} chunks/s requests={embedder.requests}")
+
+        embedder = SimulatedEmbeddings(args.request_latency, args.per_text_latency, args.dim, args.rate_limit_probability)
+        seconds = bench_pipeline(embedder, per_file, args)
+        print(f"batched pipeline  {seconds:7.2f}s {total_chunks / seconds:9.1f} chunks/s requests={embedder.requests}")
+
+        if args.scratch_database:
+            embedder = SimulatedEmbeddings(args.request_latency, args.per_text_latency, args.dim, 0.0)
+            for label, seconds, report in bench_database(embedder, directory):
+                print(f"load_kbs {label:<9} {seconds:7.2f}s {total_chunks / seconds:9.1f} chunks/s {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# load_harness.py
+#
+# Mixed-traffic load test for the API: /auth/login, /api/chat, /tickets and
+# /metrics/* at a fixed concurrency. Reports throughput and p50/p95/p99
+# latency per endpoint, plus a per-stage breakdown of chat turns (context,
+# history, classifier, guardrail, embedding, vector_search, generation, db_commit)
+# read from the Server-Timing header /api/chat returns. Context and KB
+# retrieval overlap, so the report also compares the serial sum of the
+# stages with the turn's wall-clock "total" (its critical path).
+#
+# Runs offline: the app is served in process with the deterministic fake
+# providers (LLM_PROVIDER=fake, EMBEDDING_PROVIDER=fake, see
+# app/llm_services/fake_models.py) against DATABASE_URL, so only a local
+# Postgres + pgvector is needed. FAKE_LLM_* / FAKE_EMBEDDING_* set the
+# simulated provider latencies.
+#
+#   python -m benchmarks.load_harness --email Trainee@esi.com --password Trainee@123 \
+#       --staff-email admin@esi.com --staff-password Admin@123 --concurrency 32 --requests 2000
+#
+# --load-kb first re-embeds kbs/ with the fake embedder (replace_existing),
+# which overwrites the stored KB embeddings: use a scratch database.
+# --base-url targets an already running server instead (start it with the
+# fake providers for offline numbers).
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.utils.stage_timer import parse_server_timing
+from benchmarks.chat_concurrency import DEFAULT_QUESTIONS, percentile
+
+QUESTIONS = DEFAULT_QUESTIONS + [
+    "My container will not start after the lab reset.",
+    "DNS resolution fails inside the range network.",
+    "I was logged out and my session token expired, how do I sign in again?",
+    "The portal says my account is locked after several attempts, this is still not working.",
+]
+
+DEFAULT_MIX = "chat=70,tickets=10,metrics_summary=8,metrics_trends=7,login=5"
+
+STAGES = ["context", "history", "classifier", "guardrail", "embedding", "vector_search", "generation", "db_commit"]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.stages = {}
+
+    def record(self, endpoint, seconds, ok):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def record_stages(self, header):
+        for name, seconds in parse_server_timing(header).items():
+            self.stages.setdefault(name, []).append(seconds)
+
+    def report(self, elapsed) -> dict:
+        def summary(values):
+            return {
+                "n": len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+                "mean_ms": sum(values) / len(values) * 1000,
+            }
+
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = dict(summary(values), errors=self.errors.get(endpoint, 0),
+                                       throughput_rps=len(values) / elapsed)
+        stages = {name: summary(values) for name, values in self.stages.items()}
+        return {"elapsed_seconds": elapsed, "endpoints": endpoints, "chat_stages": stages,
+                "chat_critical_path": self.critical_path()}
+
+    def critical_path(self):
+        # mean per turn of the stage durations added up vs the wall-clock total
+        totals = self.stages.get("total")
+        if not totals:
+            return None
+        serial = sum(sum(values) for name, values in self.stages.items() if name != "total") / len(totals)
+        critical = sum(totals) / len(totals)
+        return {"serial_mean_ms": serial * 1000, "critical_path_mean_ms": critical * 1000,
+                "overlap_saved_ms": (serial - critical) * 1000}
+
+
+def use_fake_providers():
+    # has to run before the app (and its module-level llm / embedder) is
+    # imported; explicit LLM_PROVIDER / EMBEDDING_PROVIDER settings win
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "fake")
+
+
+@asynccontextmanager
+async def in_process_client(timeout, limits):
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://harness",
+                                     timeout=timeout, limits=limits) as client:
+            yield client
+
+
+def load_kb():
+    from app.kb_loader import load_kbs
+    from app.utils.config import SessionLocal
+
+    with SessionLocal() as db:
+        load_kbs(db, created_by="load-harness", replace_existing=True)
+
+
+async def login(client, recorder, email, password):
+    started = time.perf_counter()
+    resp = await client.post("/auth/login", json={"email": email, "password": password})
+    recorder.record("login", time.perf_counter() - started, resp.status_code == 200)
+    resp.raise_for_status()
+    body = resp.json()
+    return {"Authorization": f"Bearer {body['access_token']}"}, body["session_id"]
+
+
+async def worker(n, client, args, recorder, weights, deadline, budget):
+    rng = random.Random(args.seed + n)
+    headers, session_id = await login(client, recorder, args.email, args.password)
+    staff_headers = headers
+    if args.staff_email:
+        staff_headers, _ = await login(client, recorder, args.staff_email, args.staff_password)
+
+    endpoints, endpoint_weights = list(weights), list(weights.values())
+
+    while time.perf_counter() < deadline and budget[0] > 0:
+        budget[0] -= 1
+        endpoint = rng.choices(endpoints, weights=endpoint_weights)[0]
+        started = time.perf_counter()
+        try:
+            if endpoint == "chat":
+                resp = await client.post("/api/chat", headers=headers,
+                                         json={"sessionId": session_id, "message": rng.choice(QUESTIONS)})
+                if resp.status_code == 200:
+                    recorder.record_stages(resp.headers.get("server-timing"))
+            elif endpoint == "tickets":
+                resp = await client.get("/tickets/", headers=staff_headers, params={"limit": 20})
+            elif endpoint == "metrics_summary":
+                resp = await client.get("/metrics/summary", headers=staff_headers)
+            elif endpoint == "metrics_trends":
+                resp = await client.get("/metrics/trends", headers=staff_headers)
+            elif endpoint == "login":
+                resp = await client.post("/auth/login", json={"email": args.email, "password": args.password})
+            else:
+                raise SystemExit(f"Unknown endpoint in --mix: {endpoint}")
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(endpoint, time.perf_counter() - started, ok)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 4, max_keepalive_connections=args.concurrency + 4)
+    if args.base_url:
+        client_cm = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+    else:
+        client_cm = in_process_client(args.timeout, limits)
+
+    recorder = Recorder()
+    weights = parse_mix(args.mix)
+    async with client_cm as client:
+        # total request budget shared by all workers
+        budget = [args.requests]
+        deadline = time.perf_counter() + args.duration if args.duration else float("inf")
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(n, client, args, recorder, weights, deadline, budget)
+            for n in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    return recorder.report(elapsed)
+
+
+def print_report(report, args):
+    print(f"concurrency={args.concurrency} elapsed={report['elapsed_seconds']:.2f}s")
+    print(f"{'endpoint':<16} {'n':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, s in report["endpoints"].items():
+        print(f"{endpoint:<16} {s['n']:>6} {s['errors']:>5} {s['throughput_rps']:>8.1f} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}")
+
+    stages = {name: s for name, s in report["chat_stages"].items() if name != "total"}
+    if stages:
+        total = sum(s["mean_ms"] * s["n"] for s in stages.values())
+        print(f"\nchat stages      {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'share':>7}")
+        for name in STAGES + sorted(set(stages) - set(STAGES)):
+            if name in stages:
+                s = stages[name]
+                print(f"{name:<16} {s['n']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+                      f"{s['mean_ms'] * s['n'] / total:>7.1%}")
+
+    path = report["chat_critical_path"]
+    if path:
+        print(f"\nchat turn mean: stages added up {path['serial_mean_ms']:.1f} ms, "
+              f"critical path {path['critical_path_mean_ms']:.1f} ms "
+              f"({path['overlap_saved_ms']:.1f} ms saved by running stages concurrently)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-endpoint load harness with offline fake providers")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--staff-email", help="support engineer / admin account for /tickets and /metrics")
+    parser.add_argument("--staff-password")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="total requests across all workers")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 = no limit)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. chat=70,tickets=10")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--load-kb", action="store_true",
+                        help="re-embed kbs/ with the fake embedder first (overwrites KB embeddings)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    use_fake_providers()
+    if args.load_kb:
+        load_kb()
+
+    report = asyncio.run(run(args))
+    print_report(report, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
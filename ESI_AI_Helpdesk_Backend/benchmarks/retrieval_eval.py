@@ -0,0 +1,266 @@
+# retrieval_eval.py
+#
+# KB retrieval quality and cost on a labeled question set
+# (benchmarks/data/kb_questions.json: question -> relevant kb_ids, an empty
+# list marks an out-of-scope question that should retrieve nothing).
+# Reports recall@k, hit rate and MRR on the in-scope questions, the
+# out-of-scope detection rate (no chunk above MIN_SIMILARITY_THRESHOLD, the
+# case /api/chat answers with OUT_OF_SCOPE_REPLY), embedding / search
+# latency and the context / prompt tokens each query would cost.
+#
+#   python -m benchmarks.retrieval_eval --k 5 --report eval.json
+#
+# Backends:
+#   memory    (default) offline: kbs/ is split with kb_loader's splitter
+#             settings, embedded with --embedder and searched exactly in
+#             memory, with the similarity threshold of retriever.py. With
+#             the default "fake" embedder no database or network is needed.
+#   postgres  retriever.retrieve_kb against DATABASE_URL: vector only vs
+#             hybrid full-text + vector at several fusion weights
+#             (--weights). The KB must be loaded (python -m app.init_db,
+#             then /api/kb/create or load_kbs) with the same embedder.
+#
+# --embedder takes an EMBEDDING_PROVIDER value and is applied before the
+# app modules are imported. --report writes the metrics, the settings they
+# were measured with and the per-question results as sorted JSON, so
+# reports from two commits can be diffed directly.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from benchmarks.chat_concurrency import percentile
+
+DEFAULT_DATASET = Path(__file__).parent / "data" / "kb_questions.json"
+
+
+def load_dataset(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def use_embedder(name):
+    # has to run before app.llm_services is imported (config is read at import)
+    if name:
+        os.environ["EMBEDDING_PROVIDER"] = name
+    if name == "fake":
+        # the load-test latency would only be noise here
+        os.environ.setdefault("FAKE_EMBEDDING_LATENCY_MS", "0")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+class MemoryIndex:
+    """Exact vector search over kbs/ chunked and embedded in process."""
+
+    def __init__(self, embedder, kb_dir):
+        import numpy as np
+        from langchain_core.documents import Document
+        from app.kb_loader import make_splitter, parse_markdown, chunk_metadata
+        from app.llm_services.embedding_pipeline import embed_texts
+        from app.llm_services.retriever import MIN_SIMILARITY_THRESHOLD
+
+        self.np = np
+        self.embedder = embedder
+        self.min_similarity = MIN_SIMILARITY_THRESHOLD
+
+        splitter = make_splitter()
+        self.documents = []
+        for md_file in sorted(Path(kb_dir).glob("*.md")):
+            metadata, body = parse_markdown(md_file)
+            doc_metadata = chunk_metadata(metadata, md_file)
+            for i, chunk in enumerate(splitter.split_text(body)):
+                self.documents.append(Document(page_content=chunk,
+                                               metadata={**doc_metadata, "chunk_index": str(i)}))
+
+        started = time.perf_counter()
+        vectors = np.array(embed_texts(embedder, [d.page_content for d in self.documents]), dtype=np.float32)
+        self.index_seconds = time.perf_counter() - started
+        self.matrix = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def search(self, query_embedding, k):
+        # same shape as retriever._to_documents: top k by cosine, then the threshold
+        query = self.np.asarray(query_embedding, dtype=self.np.float32)
+        scores = self.matrix @ (query / self.np.linalg.norm(query))
+        documents = []
+        for i in self.np.argsort(-scores)[:k]:
+            similarity = float(scores[i])
+            if similarity < self.min_similarity:
+                continue
+            documents.append({"doc": self.documents[i], "id": str(i), "score": similarity,
+                              "similarity": similarity})
+        return documents
+
+
+def memory_retriever(index, k):
+    def retrieve(question):
+        started = time.perf_counter()
+        embedding = index.embedder.embed_query(question)
+        embedded = time.perf_counter()
+        documents = index.search(embedding, k)
+        return documents, embedded - started, time.perf_counter() - embedded
+    return retrieve
+
+
+def postgres_retriever(k, mode, vector_weight):
+    from app.llm_services import retriever
+    from app.llm_services.providers import providers
+
+    def retrieve(question):
+        # uncached embedding call, so its latency is the provider's
+        started = time.perf_counter()
+        embedding = providers.embedder.embed_query(question)
+        embedded = time.perf_counter()
+        documents = retriever.retrieve_kb(question, k=k, mode=mode, vector_weight=vector_weight,
+                                          query_embedding=embedding)
+        return documents, embedded - started, time.perf_counter() - embedded
+    return retrieve
+
+
+def evaluate(dataset, retrieve):
+    from app.llm_services.context_builder import build_context, token_counter
+    from app.llm_services.llm import build_prompt
+
+    recalls, hits, reciprocal_ranks = [], [], []
+    oos_detected, false_oos = [], []
+    embed_latencies, search_latencies, returned = [], [], []
+    context_tokens, prompt_tokens = [], []
+    questions = []
+
+    for item in dataset:
+        relevant = set(item["kb_ids"])
+        documents, embed_seconds, search_seconds = retrieve(item["question"])
+        embed_latencies.append(embed_seconds)
+        search_latencies.append(search_seconds)
+        returned.append(len(documents))
+
+        kb_ids = [d["doc"].metadata.get("kb_id") for d in documents]
+        result = {"question": item["question"], "expected": sorted(relevant), "retrieved": kb_ids,
+                  "top_similarity": round(documents[0]["similarity"], 4) if documents else None}
+
+        if not relevant:
+            oos_detected.append(1.0 if not documents else 0.0)
+            result["out_of_scope_detected"] = not documents
+        else:
+            false_oos.append(1.0 if not documents else 0.0)
+            recalls.append(len(relevant & set(kb_ids)) / len(relevant))
+            hits.append(1.0 if relevant & set(kb_ids) else 0.0)
+            first = next((rank for rank, kb_id in enumerate(kb_ids, 1) if kb_id in relevant), None)
+            reciprocal_ranks.append(1.0 / first if first else 0.0)
+            result["first_relevant_rank"] = first
+
+        if documents:
+            # what the turn would send to the LLM (out-of-scope turns send nothing)
+            docs = [d["doc"] for d in documents]
+            _, stats = build_context(docs)
+            context_tokens.append(stats.context_tokens)
+            prompt_tokens.append(token_counter.count(build_prompt(item["question"], docs)))
+            result["prompt_tokens"] = prompt_tokens[-1]
+        questions.append(result)
+
+    def mean(values):
+        return statistics.mean(values) if values else 0.0
+
+    metrics = {
+        "in_scope_questions": len(recalls),
+        "out_of_scope_questions": len(oos_detected),
+        "recall": mean(recalls),
+        "hit_rate": mean(hits),
+        "mrr": mean(reciprocal_ranks),
+        "out_of_scope_detection": mean(oos_detected),
+        "false_out_of_scope": mean(false_oos),
+        "mean_returned": mean(returned),
+        "embed_p50_ms": percentile(embed_latencies, 50) * 1000,
+        "embed_p95_ms": percentile(embed_latencies, 95) * 1000,
+        "search_p50_ms": percentile(search_latencies, 50) * 1000,
+        "search_p95_ms": percentile(search_latencies, 95) * 1000,
+        "context_tokens_mean": mean(context_tokens),
+        "prompt_tokens_mean": mean(prompt_tokens),
+        "prompt_tokens_p95": percentile(prompt_tokens, 95),
+    }
+    return {"metrics": {name: round(value, 4) for name, value in metrics.items()}, "questions": questions}
+
+
+def settings(args, dataset):
+    from app.kb_loader import CHUNK_SIZE, CHUNK_OVERLAP
+    from app.llm_services import llm_config
+    from app.llm_services.retriever import MIN_SIMILARITY_THRESHOLD
+
+    return {
+        "commit": git_commit(),
+        "backend": args.backend,
+        "embedding_provider": llm_config.EMBEDDING_PROVIDER,
+        "k": args.k,
+        "dataset": Path(args.dataset).name,
+        "questions": len(dataset),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "min_similarity": MIN_SIMILARITY_THRESHOLD,
+        "hybrid_rrf_k": llm_config.HYBRID_RRF_K,
+        "hybrid_candidates": llm_config.HYBRID_CANDIDATES,
+        "hybrid_lexical_min_similarity": llm_config.HYBRID_LEXICAL_MIN_SIMILARITY,
+        "context_token_budget": llm_config.CONTEXT_TOKEN_BUDGET,
+    }
+
+
+def print_results(runs):
+    print(f"{'run':<14} {'recall@k':>9} {'hit@k':>7} {'mrr':>6} {'oos':>6} {'false oos':>9} "
+          f"{'embed p50':>9} {'search p50':>10} {'search p95':>10} {'prompt tok':>10} {'docs':>5}")
+    for label, run in runs.items():
+        m = run["metrics"]
+        print(f"{label:<14} {m['recall']:>9.3f} {m['hit_rate']:>7.3f} {m['mrr']:>6.3f} "
+              f"{m['out_of_scope_detection']:>6.3f} {m['false_out_of_scope']:>9.3f} "
+              f"{m['embed_p50_ms']:>9.1f} {m['search_p50_ms']:>10.2f} {m['search_p95_ms']:>10.2f} "
+              f"{m['prompt_tokens_mean']:>10.0f} {m['mean_returned']:>5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KB retrieval quality / latency / token evaluation")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET))
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--embedder", help="EMBEDDING_PROVIDER to use (memory backend default: fake)")
+    parser.add_argument("--kb-dir", default="kbs", help="articles indexed by the memory backend")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--weights", default="0.7,0.5,0.3", help="hybrid vector weights (postgres backend)")
+    parser.add_argument("--report", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    use_embedder(args.embedder or ("fake" if args.backend == "memory" else None))
+    dataset = load_dataset(args.dataset)
+
+    runs = {}
+    if args.backend == "memory":
+        from app.llm_services.providers import providers
+        index = MemoryIndex(providers.embedder, args.kb_dir)
+        print(f"indexed {len(index.documents)} chunks in {index.index_seconds:.2f}s")
+        runs["vector"] = evaluate(dataset, memory_retriever(index, args.k))
+    else:
+        for mode, weight in [("vector", None)] + [("hybrid", float(w)) for w in args.weights.split(",")]:
+            label = mode if weight is None else f"hybrid w={weight:g}"
+            runs[label] = evaluate(dataset, postgres_retriever(args.k, mode, weight))
+
+    report = {"settings": settings(args, dataset), "runs": runs}
+    in_scope = sum(1 for item in dataset if item["kb_ids"])
+    print(f"{len(dataset)} questions ({in_scope} in scope), k={args.k}, "
+          f"embeddings={report['settings']['embedding_provider']}")
+    print_results(runs)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# seed_tickets.py
+#
+# Fills the tickets table with synthetic rows for the pagination benchmark
+# (benchmarks/tickets_pagination.py). Rows are generated server side with
+# generate_series, spread over the last --days days and across every
+# status / tier / severity so each filter combination has data.
+#
+#   python -m benchmarks.seed_tickets --tickets 1000000
+#   python -m benchmarks.seed_tickets --cleanup
+#
+# Seeded tickets have ids starting with BENCH- and belong to a throwaway
+# user / conversation (see ticket_id_stress.create_fixture). --cleanup removes
+# them again. Run python -m app.init_db and seed_roles first.
+
+import argparse
+import time
+
+from sqlalchemy import text
+
+from app.models.database import Ticket
+from app.utils.config import SessionLocal
+from benchmarks.ticket_id_stress import create_fixture, remove_fixture
+
+ID_PREFIX = "BENCH-"
+
+STATUSES = ["OPEN", "IN_PROGRESS", "RESOLVED", "CLOSED"]
+TIERS = ["TIER_1", "TIER_2", "TIER_3", "TIER_4"]
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
+SEED_SQL = text("""
+    INSERT INTO tickets (id, conversation_id, user_id, subject, description, tier, severity,
+                         status, user_role, created_at, updated_at, created_by, updated_by)
+    SELECT :prefix || lpad(n::text, 9, '0'), :conversation_id, :user_id,
+           'Synthetic ticket ' || n, 'pagination benchmark ticket',
+           (:tiers)[1 + n % 4], (:severities)[1 + (n / 4) % 4], (:statuses)[1 + (n / 16) % 4],
+           :role_name, ts, ts, 'seed-tickets', 'seed-tickets'
+    FROM (
+        SELECT n, now() - random() * make_interval(days => :days) AS ts
+        FROM generate_series(:first, :last) AS n
+    ) s
+""")
+
+
+def seed(count, days, batch_size):
+    user_id, conversation_id, role_name = create_fixture()
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        for first in range(1, count + 1, batch_size):
+            last = min(first + batch_size - 1, count)
+            db.execute(SEED_SQL, {
+                "prefix": ID_PREFIX, "conversation_id": conversation_id, "user_id": user_id,
+                "tiers": TIERS, "severities": SEVERITIES, "statuses": STATUSES,
+                "role_name": role_name, "days": days, "first": first, "last": last,
+            })
+            db.commit()
+            print(f"  {last}/{count} tickets")
+        db.execute(text("ANALYZE tickets"))
+        db.commit()
+    print(f"Seeded {count} tickets in {time.perf_counter() - started:.1f}s")
+
+
+def cleanup():
+    with SessionLocal() as db:
+        user_ids = [row[0] for row in db.query(Ticket.user_id)
+                    .filter(Ticket.id.startswith(ID_PREFIX)).distinct()]
+    for user_id in user_ids:
+        remove_fixture(user_id)
+    print(f"Removed seeded tickets of {len(user_ids)} fixture user(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic tickets for the pagination benchmark")
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--cleanup", action="store_true", help="remove previously seeded tickets")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        seed(args.tickets, args.days, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# ticket_id_stress.py
+#
+# Concurrency stress test for ticket id allocation. Many threads, each with
+# its own DB session, create tickets the way an escalating chat turn does
+# (allocate id, insert, commit) and the run asserts every id is unique.
+# --legacy uses the previous "latest ticket + 1" allocation to show the
+# duplicate ids it mints under the same load.
+#
+#   python -m benchmarks.ticket_id_stress --threads 32 --tickets 50
+#
+# Creates a throwaway user / session / conversation and removes them (with
+# their tickets) afterwards. Run python -m app.init_db and seed_roles first.
+
+import argparse
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models.database import Conversation, Role, Ticket, User, UserSession
+from app.utils.config import SessionLocal
+from app.utils.ticket_ids import allocate_ticket_id_sync, format_ticket_id
+
+
+def legacy_ticket_id(db) -> str:
+    last_ticket = db.query(Ticket).order_by(Ticket.created_at.desc()).first()
+    if last_ticket and last_ticket.id.startswith("TICK-"):
+        return format_ticket_id(int(last_ticket.id.split("-")[1]) + 1)
+    return format_ticket_id(1)
+
+
+def create_fixture():
+    with SessionLocal() as db:
+        role = db.query(Role).order_by(Role.level).first()
+        if role is None:
+            raise SystemExit("No roles found, run python -m app.seed_roles first")
+        user = User(email=f"ticket-stress-{uuid.uuid4()}@example.invalid", full_name="Ticket Stress",
+                    password_hash="!", role_id=role.id)
+        db.add(user)
+        db.flush()
+        session = UserSession(user_id=user.id, access_token=str(uuid.uuid4()),
+                              expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        db.add(session)
+        db.flush()
+        conversation = Conversation(session_id=session.id, user_role=role.name)
+        db.add(conversation)
+        db.commit()
+        return user.id, conversation.id, role.name
+
+
+def remove_fixture(user_id):
+    with SessionLocal() as db:
+        db.query(Ticket).filter(Ticket.user_id == user_id).delete()
+        db.delete(db.get(User, user_id))
+        db.commit()
+
+
+def create_tickets(count, user_id, conversation_id, role_name, legacy):
+    created, collisions = [], 0
+    with SessionLocal() as db:
+        for n in range(count):
+            ticket_id = legacy_ticket_id(db) if legacy else allocate_ticket_id_sync(db)
+            db.add(Ticket(id=ticket_id, conversation_id=conversation_id, user_id=user_id,
+                          subject=f"stress {n}", description="ticket id stress test",
+                          tier="TIER_2", severity="LOW", user_role=role_name,
+                          created_by="ticket-stress", updated_by="ticket-stress"))
+            try:
+                db.commit()
+                created.append(ticket_id)
+            except IntegrityError:
+                # duplicate primary key: another thread minted the same id
+                db.rollback()
+                collisions += 1
+    return created, collisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ticket id allocation stress test")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--tickets", type=int, default=25, help="tickets per thread")
+    parser.add_argument("--legacy", action="store_true", help="use the old latest+1 allocation")
+    args = parser.parse_args()
+
+    user_id, conversation_id, role_name = create_fixture()
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(
+                lambda _: create_tickets(args.tickets, user_id, conversation_id, role_name, args.legacy),
+                range(args.threads)))
+        seconds = time.perf_counter() - started
+
+        ids = [ticket_id for created, _ in results for ticket_id in created]
+        collisions = sum(c for _, c in results)
+        duplicates = [i for i, n in Counter(ids).items() if n > 1]
+        attempted = args.threads * args.tickets
+
+        print(f"{'legacy' if args.legacy else 'sequence'}: {attempted} attempted, {len(ids)} created, "
+              f"{collisions} failed on duplicate id, {len(ids) / seconds:.0f} tickets/s")
+
+        assert not duplicates, f"duplicate ticket ids: {duplicates[:10]}"
+        if not args.legacy:
+            assert collisions == 0 and len(ids) == attempted, "sequence allocation lost tickets"
+            print("OK: every ticket got a unique id")
+    finally:
+        remove_fixture(user_id)
+
+
+if __name__ == "__main__":
+    main()
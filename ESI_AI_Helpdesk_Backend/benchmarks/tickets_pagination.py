@@ -0,0 +1,113 @@
+# tickets_pagination.py
+#
+# GET /tickets latency at page 1 and a deep page, OFFSET pagination (the
+# old listing, extended with OFFSET) vs the keyset cursor used by the API,
+# for several filter combinations. Keyset pages should cost the same at any
+# depth; OFFSET pages grow with the number of skipped rows.
+#
+#   python -m benchmarks.seed_tickets --tickets 1000000
+#   python -m benchmarks.tickets_pagination --page 10000 --explain
+#
+# Runs the same query functions as the endpoint against DATABASE_URL.
+# --explain also prints, per filter, the index the planner walks for a deep
+# keyset page and how many rows / buffers it touched, which shows whether
+# the (created_at, id) and (status, created_at, id) indexes still cover a
+# filter combination without an index of its own.
+
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import tuple_
+
+from app.apis.tickets import decode_cursor, encode_cursor, filtered_tickets, ticket_page
+from app.models.database import Ticket
+from app.utils.config import SessionLocal
+
+FILTERS = [
+    {},
+    {"status": "OPEN"},
+    {"tier": "TIER_3"},
+    {"status": "OPEN", "severity": "HIGH"},
+    {"status": "OPEN", "tier": "TIER_2", "severity": "CRITICAL"},
+]
+
+
+def offset_page(db, filters, page, limit):
+    return (filtered_tickets(db, **filters)
+            .order_by(Ticket.created_at.desc(), Ticket.id.desc())
+            .offset((page - 1) * limit).limit(limit).all())
+
+
+def cursor_for_page(db, filters, page, limit):
+    # cursor a client holds after walking page - 1 pages (looked up once, untimed)
+    if page == 1:
+        return None
+    last = (filtered_tickets(db, **filters)
+            .order_by(Ticket.created_at.desc(), Ticket.id.desc())
+            .offset((page - 1) * limit - 1).limit(1).first())
+    return encode_cursor(last) if last else False
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain_keyset(db, filters, cursor, limit):
+    # the query ticket_page runs, with EXPLAIN ANALYZE
+    query = filtered_tickets(db, **filters)
+    if cursor:
+        created_at, ticket_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Ticket.created_at, Ticket.id) < tuple_(created_at, ticket_id))
+    query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1)
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}",
+                                           compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(plan_nodes(plan[0]["Plan"]))
+    indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n}) or ["seq scan"]
+    rows_removed = sum(n.get("Rows Removed by Filter", 0) for n in nodes)
+    buffers = plan[0]["Plan"].get("Shared Hit Blocks", 0) + plan[0]["Plan"].get("Shared Read Blocks", 0)
+    return f"{', '.join(indexes)}; rows filtered out {rows_removed}, buffers {buffers}"
+
+
+def timed_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticket list pagination benchmark")
+    parser.add_argument("--page", type=int, default=10_000, help="deep page number")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--explain", action="store_true", help="print the plan of each keyset page")
+    args = parser.parse_args()
+
+    print(f"{'filters':<48} {'page':>6} {'offset ms':>10} {'keyset ms':>10}")
+    with SessionLocal() as db:
+        for filters in FILTERS:
+            label = ", ".join(f"{k}={v}" for k, v in filters.items()) or "(none)"
+            for page in (1, args.page):
+                cursor = cursor_for_page(db, filters, page, args.limit)
+                if cursor is False:
+                    print(f"{label:<48} {page:>6} {'fewer rows than the page':>21}")
+                    continue
+                offset_ms = timed_ms(lambda: offset_page(db, filters, page, args.limit), args.repeat)
+                keyset_ms = timed_ms(lambda: ticket_page(db, cursor=cursor, limit=args.limit, **filters),
+                                     args.repeat)
+                print(f"{label:<48} {page:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+                if args.explain:
+                    print(f"{'':<48}   keyset plan: {explain_keyset(db, filters, cursor, args.limit)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.llm_services import answer_cache as answer_cache_module
+from app.llm_services.answer_cache import AnswerCache, kb_fingerprint
+
+
+def retrieved(*chunks):
+    # retrieve_kb result rows: (kb_id, version, chunk id)
+    return [{"doc": Document(page_content="...", metadata={"kb_id": kb_id, "version": version}), "id": chunk_id}
+            for kb_id, version, chunk_id in chunks]
+
+
+VPN = retrieved(("KB-VPN", 1, "c1"), ("KB-VPN", 1, "c2"))
+MFA = retrieved(("KB-MFA", 2, "c9"))
+
+
+@pytest.fixture
+def cache():
+    return AnswerCache(threshold=0.95, ttl_seconds=60, max_entries=10, enabled=True)
+
+
+def test_fingerprint_ignores_retrieval_order():
+    assert kb_fingerprint(VPN) == kb_fingerprint(list(reversed(VPN)))
+    assert kb_fingerprint(VPN) != kb_fingerprint(retrieved(("KB-VPN", 2, "c1"), ("KB-VPN", 1, "c2")))
+
+
+def test_similar_question_with_the_same_chunks_hits(cache):
+    cache.store([1.0, 0.0], "trainee", VPN, "Reconnect the VPN.", 0.9, 1.5)
+
+    hit = cache.lookup([0.99, 0.05], "trainee", VPN)
+    assert hit.answer == "Reconnect the VPN."
+    assert hit.confidence == 0.9
+    assert 0.95 <= hit.similarity <= 1.0
+    assert cache.stats()["saved_llm_seconds"] == 1.5
+
+
+def test_miss_below_threshold_other_role_or_other_chunks(cache):
+    cache.store([1.0, 0.0], "trainee", VPN, "Reconnect the VPN.", 0.9, 1.5)
+
+    assert cache.lookup([0.0, 1.0], "trainee", VPN) is None
+    assert cache.lookup([1.0, 0.0], "instructor", VPN) is None
+    assert cache.lookup([1.0, 0.0], "trainee", MFA) is None
+    assert cache.lookup([1.0, 0.0], "trainee", []) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_concurrent_hits_do_not_share_their_similarity(cache):
+    cache.store([1.0, 0.0], "trainee", VPN, "Reconnect the VPN.", 0.9, 1.5)
+
+    exact = cache.lookup([1.0, 0.0], "trainee", VPN)
+    close = cache.lookup([0.97, 0.2], "trainee", VPN)
+    assert exact.similarity == pytest.approx(1.0)
+    assert close.similarity < exact.similarity
+
+
+def test_expired_answers_are_dropped(cache, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    cache.store([1.0, 0.0], "trainee", VPN, "Reconnect the VPN.", 0.9, 1.5)
+
+    now[0] += 61
+    assert cache.lookup([1.0, 0.0], "trainee", VPN) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_kb_drops_only_answers_built_on_that_article(cache):
+    cache.store([1.0, 0.0], "trainee", VPN, "Reconnect the VPN.", 0.9, 1.5)
+    cache.store([1.0, 0.0], "trainee", MFA, "Open a ticket.", 0.8, 1.0)
+
+    cache.invalidate_kb(["KB-VPN"])
+    assert cache.lookup([1.0, 0.0], "trainee", VPN) is None
+    assert cache.lookup([1.0, 0.0], "trainee", MFA).answer == "Open a ticket."
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.lookup([1.0, 0.0], "trainee", MFA) is None
+
+
+def test_least_recently_used_buckets_are_evicted():
+    cache = AnswerCache(threshold=0.95, ttl_seconds=60, max_entries=2, enabled=True)
+    cache.store([1.0, 0.0], "trainee", VPN, "vpn", 0.9, 1.0)
+    cache.store([1.0, 0.0], "trainee", MFA, "mfa", 0.9, 1.0)
+    cache.lookup([1.0, 0.0], "trainee", VPN)  # VPN is now the most recent bucket
+    cache.store([1.0, 0.0], "instructor", MFA, "mfa for instructors", 0.9, 1.0)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup([1.0, 0.0], "trainee", MFA) is None
+    assert cache.lookup([1.0, 0.0], "trainee", VPN).answer == "vpn"
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(enabled=False)
+    cache.store([1.0, 0.0], "trainee", VPN, "vpn", 0.9, 1.0)
+    assert cache.lookup([1.0, 0.0], "trainee", VPN) is None
+    assert cache.stats()["entries"] == 0
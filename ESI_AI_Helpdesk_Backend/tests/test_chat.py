@@ -0,0 +1,340 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import Response
+from langchain_core.documents import Document
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.apis import chat as chat_module
+from app.apis.api_schema import ChatRequest
+from app.llm_services import conversation_memory as memory_module
+from app.llm_services.answer_cache import AnswerCache
+from app.models.database import Conversation, Message, Ticket
+from app.utils.session_cache import Principal
+from app.utils.stage_graph import StageGraph
+from app.utils.turn_writer import TurnWriter
+
+PRINCIPAL = Principal(session_id="session-1", user_id=str(uuid.uuid4()), email="trainee@example.com",
+                      full_name="Test Trainee", role_name="trainee", role_level=20)
+
+
+class FakeSession:
+    """Stands in for the request / stream / history AsyncSessions."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        limit = getattr(statement, "_limit", None)
+        history = list(reversed(self.backend.history))[:limit]
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(first=lambda: self.backend.conversation),
+                               scalar=lambda: None, all=lambda: history)
+
+    def add_all(self, rows):
+        self.backend.written.extend(rows)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class ChatBackend:
+    """Stubs every I/O dependency of a chat turn and records what it is asked."""
+
+    def __init__(self):
+        self.conversation = None
+        self.history = []
+        self.written = []
+        self.retrieval_queries = []
+        self.llm_histories = []
+        self.graphs = []
+        self.documents = [{"doc": Document(page_content="Reconnect the VPN client.",
+                                           metadata={"kb_id": "KB-VPN", "title": "VPN"}),
+                           "id": "c1", "similarity": 0.5, "score": 0.5}]
+        self.tokens = ["Reconnect ", "the VPN."]
+        self.stream_hold = None
+        # set to an asyncio.Event to hold retrievals until it is set
+        self.retrieval_gate = None
+        self.retrievals_finished = 0
+
+    def stored_conversation(self, *exchanges):
+        # an existing conversation with (user, assistant) turns in its history
+        self.conversation = Conversation(id=uuid.uuid4(), session_id=uuid.uuid4(), user_role="trainee",
+                                         context={})
+        make_transient_to_detached(self.conversation)
+        start = datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+        for i, (question, answer) in enumerate(exchanges):
+            self.history.append(SimpleNamespace(role="user", content=question,
+                                                created_at=start + timedelta(minutes=2 * i)))
+            self.history.append(SimpleNamespace(role="assistant", content=answer,
+                                                created_at=start + timedelta(minutes=2 * i + 1)))
+
+    def session(self):
+        return FakeSession(self)
+
+    def rows(self, kind):
+        return [row for row in self.written if isinstance(row, kind)]
+
+    async def embed(self, question):
+        return [1.0, 0.0]
+
+    async def retrieve(self, question, query_embedding=None):
+        self.retrieval_queries.append(question)
+        if self.retrieval_gate is not None:
+            await self.retrieval_gate.wait()
+        self.retrievals_finished += 1
+        return self.documents
+
+    async def generate(self, question, docs, user_role="trainee", history=""):
+        self.llm_histories.append(history)
+        return "".join(self.tokens)
+
+    async def stream(self, question, docs, user_role="trainee", history=""):
+        self.llm_histories.append(history)
+        for token in self.tokens:
+            yield token
+            if self.stream_hold is not None:
+                await self.stream_hold.wait()
+
+    async def ticket_id(self, db):
+        return "TICK-00042"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = ChatBackend()
+
+    class RecordingGraph(StageGraph):
+        def __init__(self):
+            super().__init__()
+            backend.graphs.append(self)
+
+    monkeypatch.setattr(chat_module, "AsyncSessionLocal", backend.session)
+    monkeypatch.setattr(memory_module, "AsyncSessionLocal", backend.session)
+    monkeypatch.setattr(chat_module, "StageGraph", RecordingGraph)
+    monkeypatch.setattr(chat_module, "aembed_question", backend.embed)
+    monkeypatch.setattr(chat_module, "aretrieve_kb", backend.retrieve)
+    monkeypatch.setattr(chat_module, "agenerate_answer", backend.generate)
+    monkeypatch.setattr(chat_module, "astream_answer", backend.stream)
+    monkeypatch.setattr(chat_module, "allocate_ticket_id", backend.ticket_id)
+    monkeypatch.setattr(chat_module, "answer_cache", AnswerCache(enabled=False))
+    monkeypatch.setattr(chat_module, "turn_writer", TurnWriter(mode="sync"))
+    return backend
+
+
+def send_chat(backend, message):
+    request = ChatRequest(sessionId=PRINCIPAL.session_id, message=message)
+    return asyncio.run(chat_module.chat(request, Response(), current_user=PRINCIPAL, db=backend.session()))
+
+
+async def open_stream(backend, message):
+    request = ChatRequest(sessionId=PRINCIPAL.session_id, message=message)
+    return await chat_module.chat_stream(request, current_user=PRINCIPAL, db=backend.session())
+
+
+async def serve(response, disconnect_after_token=False):
+    # drives the StreamingResponse like an ASGI server; returns the SSE events sent
+    sent = []
+    token_sent = asyncio.Event()
+
+    async def send(message):
+        body = message.get("body", b"").decode()
+        sent.append(body)
+        if "event: token" in body:
+            token_sent.set()
+
+    async def receive():
+        if disconnect_after_token:
+            await token_sent.wait()
+            return {"type": "http.disconnect"}
+        await asyncio.Event().wait()
+
+    await response({"type": "http", "asgi": {"spec_version": "2.3"}}, receive, send)
+    events = []
+    for block in "".join(sent).split("\n\n"):
+        if block:
+            event, data = block.split("\n", 1)
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def graph_tasks(backend):
+    return [task for graph in backend.graphs for task in graph._tasks.values()]
+
+
+def test_stream_sends_tokens_then_the_stored_turn(backend):
+    backend.stored_conversation()
+
+    async def scenario():
+        return await serve(await open_stream(backend, "How do I reset my VPN password?"))
+
+    events = asyncio.run(scenario())
+
+    assert [name for name, _ in events] == ["token", "token", "final"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "Reconnect the VPN."
+    assert events[-1][1]["answer"] == "Reconnect the VPN."
+    assert [row.role for row in backend.rows(Message)] == ["user", "assistant"]
+    assert all(task.done() for task in graph_tasks(backend))
+
+
+def test_client_disconnect_stops_the_stream_and_its_stages(backend):
+    backend.stored_conversation()
+
+    async def scenario():
+        backend.stream_hold = asyncio.Event()  # the LLM stalls after its first token
+        events = await serve(await open_stream(backend, "How do I reset my VPN password?"),
+                             disconnect_after_token=True)
+        return events, graph_tasks(backend)
+
+    events, tasks = asyncio.run(scenario())
+
+    assert [name for name, _ in events] == ["token"]
+    assert tasks and all(task.done() for task in tasks)
+    # nothing is stored for an abandoned turn
+    assert backend.written == []
+
+
+def test_stream_that_is_never_read_cancels_the_speculative_stages(backend, monkeypatch):
+    backend.stored_conversation()
+
+    async def stalled_retrieval(question, query_embedding=None):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(chat_module, "aretrieve_kb", stalled_retrieval)
+
+    async def scenario():
+        response = await open_stream(backend, "How do I reset my VPN password?")
+        retrieval = backend.graphs[0]._tasks["retrieval"]
+        assert not retrieval.done()
+        # what the server runs after the response, whether or not the body was sent
+        await response.background()
+        return retrieval
+
+    assert asyncio.run(scenario()).cancelled()
+
+
+@pytest.mark.parametrize("endpoint", ["chat", "stream"])
+def test_a_turn_scans_the_message_for_keywords_once(backend, monkeypatch, endpoint):
+    from app.llm_services import escalate_classifier
+
+    scans = []
+    matcher = escalate_classifier.keyword_matcher
+
+    class CountingMatcher:
+        def match(self, message):
+            scans.append(message)
+            return matcher.match(message)
+
+    monkeypatch.setattr(escalate_classifier, "keyword_matcher", CountingMatcher())
+    backend.stored_conversation()
+
+    if endpoint == "chat":
+        send_chat(backend, "How do I reset my VPN password?")
+    else:
+        async def scenario():
+            return await serve(await open_stream(backend, "How do I reset my VPN password?"))
+        asyncio.run(scenario())
+
+    assert scans == ["How do I reset my VPN password?"]
+
+
+CRITICAL_MESSAGE = "Full outage, security breach on the lab"
+
+
+def test_critical_turn_is_escalated_without_retrieval_or_llm(backend):
+    backend.stored_conversation()
+    backend.retrieval_gate = asyncio.Event()  # a retrieval that takes a while
+
+    response = send_chat(backend, CRITICAL_MESSAGE)
+
+    assert response.answer == chat_module.FORCED_ESCALATION_REPLY
+    assert response.ticket_id == "TICK-00042" and response.needsEscalation
+    assert response.tier.value == "TIER_3" and response.severity.value == "CRITICAL"
+    assert response.kbReferences == []
+    # the speculative retrieval was cancelled, and no answer was generated
+    assert backend.retrievals_finished == 0 and backend.graphs[0]._tasks["retrieval"].cancelled()
+    assert backend.llm_histories == []
+    [ticket] = backend.rows(Ticket)
+    assert (ticket.id, ticket.tier, ticket.severity) == ("TICK-00042", "TIER_3", "CRITICAL")
+    assert [m.content for m in backend.rows(Message)] == [CRITICAL_MESSAGE, "Escalated ticket created: TICK-00042"]
+
+
+def test_critical_turn_streams_the_templated_reply(backend):
+    backend.stored_conversation()
+    backend.retrieval_gate = asyncio.Event()
+
+    async def scenario():
+        return await serve(await open_stream(backend, CRITICAL_MESSAGE))
+
+    events = asyncio.run(scenario())
+
+    assert [name for name, _ in events] == ["token", "final"]
+    assert events[-1][1]["ticket_id"] == "TICK-00042"
+    assert backend.retrievals_finished == 0 and backend.llm_histories == []
+
+
+def test_fast_escalation_off_answers_before_escalating(backend, monkeypatch):
+    monkeypatch.setattr(chat_module, "CHAT_FAST_ESCALATION", False)
+    backend.stored_conversation()
+
+    response = send_chat(backend, CRITICAL_MESSAGE)
+
+    # the previous flow: retrieval and a KB answer, then the Tier 3 ticket
+    assert response.answer == "Reconnect the VPN."
+    assert response.kbReferences[0].id == "KB-VPN"
+    assert response.ticket_id == "TICK-00042" and response.tier.value == "TIER_3"
+    assert backend.retrieval_queries == [CRITICAL_MESSAGE] and len(backend.llm_histories) == 1
+    assert len(backend.rows(Ticket)) == 1
+
+
+def test_still_not_working_is_answered_from_the_history_and_escalated(backend):
+    backend.stored_conversation(("My lab VM will not boot after the update", "Reset the VM from the lab console."))
+
+    response = send_chat(backend, "still not working")
+
+    # retrieved and answered with the earlier turn ...
+    assert backend.retrieval_queries == ["My lab VM will not boot after the update\nstill not working"]
+    [history] = backend.llm_histories
+    assert "User: My lab VM will not boot after the update" in history
+    assert response.answer == "Reconnect the VPN."
+    # ... and still escalated for the repeated failure
+    assert response.tier.value == "TIER_3" and response.ticket_id == "TICK-00042"
+    assert len(backend.rows(Ticket)) == 1
+
+
+def test_still_not_working_without_history_takes_the_fast_path(backend):
+    backend.retrieval_gate = asyncio.Event()  # new conversation: nothing to refer back to
+
+    response = send_chat(backend, "still not working")
+
+    assert response.answer == chat_module.FORCED_ESCALATION_REPLY
+    assert response.ticket_id == "TICK-00042"
+    assert backend.retrievals_finished == 0 and backend.llm_histories == []
+    assert backend.graphs[0]._tasks["retrieval"].cancelled()
+    # the new conversation is written with the turn
+    assert len(backend.rows(Conversation)) == 1
+
+
+def test_still_not_working_streams_the_history_answer(backend):
+    backend.stored_conversation(("My lab VM will not boot after the update", "Reset the VM from the lab console."))
+
+    async def scenario():
+        return await serve(await open_stream(backend, "I already tried that, still not working"))
+
+    events = asyncio.run(scenario())
+
+    assert [name for name, _ in events] == ["token", "token", "final"]
+    assert events[-1][1]["ticket_id"] == "TICK-00042"
+    assert "User: My lab VM will not boot after the update" in backend.llm_histories[0]
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+from langchain_core.documents import Document
+
+from app.llm_services.context_builder import (
+    ContextStats,
+    TokenCounter,
+    build_context,
+    join_overlapping,
+    merge_chunks
+)
+
+
+class WordCounter(TokenCounter):
+    # one token per word, so budgets are easy to reason about
+    def __init__(self):
+        super().__init__("unused")
+        self.calls = 0
+
+    def count(self, text: str) -> int:
+        self.calls += 1
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+def chunk(text, kb_id="KB-VPN", position=0, version=1):
+    return Document(page_content=text, metadata={"kb_id": kb_id, "version": version, "chunk_index": str(position)})
+
+
+def test_join_overlapping_drops_the_repeated_text():
+    assert join_overlapping("open the VPN client and", "client and sign in") == "open the VPN client and sign in"
+    assert join_overlapping("first part", "second part") == "first part\nsecond part"
+
+
+def test_adjacent_chunks_of_one_article_are_merged():
+    stats = ContextStats(budget=100)
+    blocks = merge_chunks([chunk("then sign in and reconnect", position=1), chunk("restart it", position=5),
+                           chunk("open the app then sign in", position=0)], stats)
+
+    # a merged block ranks as its best chunk; position 5 is not adjacent
+    assert [b["text"] for b in blocks] == ["open the app then sign in and reconnect", "restart it"]
+    assert [b["rank"] for b in blocks] == [0, 1]
+    assert stats.chunks_merged == 1
+
+
+def test_duplicates_are_dropped_and_blocks_keep_the_rank_order():
+    stats = ContextStats(budget=100)
+    docs = [chunk("reset MFA", kb_id="KB-MFA"), chunk("connect the VPN"),
+            chunk("reset   MFA", kb_id="KB-MFA", position=3)]
+    blocks = merge_chunks(docs, stats)
+
+    assert [b["kb_id"] for b in blocks] == ["KB-MFA", "KB-VPN"]
+    assert stats.chunks_duplicate == 1
+
+
+def test_context_stays_within_the_budget():
+    counter = WordCounter()
+    docs = [chunk("one two three four five six", kb_id="KB-A"), chunk("seven eight nine", kb_id="KB-B"),
+            chunk("ten eleven", kb_id="KB-C")]
+
+    context, stats = build_context(docs, budget=14, counter=counter)
+
+    # "[KB-A | v1]" adds 3 words: KB-B (6 tokens) overflows the 5 left, KB-C (5) still fits
+    assert context == "[KB-A | v1]\none two three four five six\n\n[KB-C | v1]\nten eleven"
+    assert stats.blocks_used == 2 and stats.blocks_dropped == 1
+    assert stats.context_tokens <= 14
+    assert counter.count(context) <= 14
+
+
+def test_only_one_block_is_truncated(monkeypatch):
+    monkeypatch.setattr("app.llm_services.context_builder.CONTEXT_MIN_TRUNCATED_TOKENS", 4)
+    docs = [chunk(" ".join(["word"] * 20), kb_id="KB-A"), chunk(" ".join(["more"] * 20), kb_id="KB-B")]
+
+    context, stats = build_context(docs, budget=10, counter=WordCounter())
+
+    assert stats.truncated and stats.blocks_used == 1 and stats.blocks_dropped == 1
+    assert context == "[KB-A | v1]\n" + " ".join(["word"] * 7)
+
+
+def test_unknown_encoding_falls_back_to_the_estimate():
+    counter = TokenCounter("no_such_encoding")
+    assert counter.warm_up() is False
+    assert counter.count("x" * 40) == 10
+    assert counter.truncate("x" * 40, 2) == "x" * 8
+
+
+def test_warm_up_loads_the_encoding_once_across_threads(monkeypatch):
+    import tiktoken
+
+    loads = []
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: loads.append(name) or "encoding")
+    counter = TokenCounter("cl100k_base")
+
+    threads = [threading.Thread(target=counter.warm_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["cl100k_base"]
+    assert asyncio.run(asyncio.to_thread(counter.warm_up)) is True
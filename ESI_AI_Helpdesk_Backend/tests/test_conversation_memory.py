@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.llm_services import conversation_memory as memory_module
+from app.llm_services.conversation_memory import ConversationMemory, is_follow_up, summary_line, trim_summary
+from app.utils.turn_writer import PendingTurn
+
+
+class WordCounter:
+    # one token per word
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(memory_module, "token_counter", WordCounter())
+
+
+@pytest.mark.parametrize("question", [
+    "still not working",
+    "I already tried that",
+    "What about the VPN?",
+    "and on my phone?",
+    "does it need admin rights?",
+    "Which one?",
+    "how do I undo that?",
+])
+def test_follow_ups(question):
+    assert is_follow_up(question)
+
+
+@pytest.mark.parametrize("question", [
+    # short, but they name their own subject: plain retrieval and the answer cache
+    "How do I reset my password?",
+    "VPN setup",
+    "Outlook crashes",
+    "I need a laptop that runs Linux",
+    # a reference word in a long question does not make it a follow-up
+    "Is this laptop model covered by the hardware warranty for contractors who joined this year?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+def test_retrieval_query_adds_the_latest_user_messages(monkeypatch):
+    monkeypatch.setattr(memory_module, "HISTORY_QUERY_TOKENS", 6)
+    memory = ConversationMemory(recent=[
+        ("user", "printer on floor two"),
+        ("assistant", "Restart the print spooler."),
+        ("user", "VPN drops every hour"),
+        ("assistant", "Update the VPN client."),
+    ])
+
+    # "printer on floor two" no longer fits next to the newer message
+    assert memory.retrieval_query("still broken") == "VPN drops every hour\nstill broken"
+    assert ConversationMemory().retrieval_query("still broken") == "still broken"
+
+
+def test_retrieval_query_truncates_a_long_last_message(monkeypatch):
+    monkeypatch.setattr(memory_module, "HISTORY_QUERY_TOKENS", 3)
+    memory = ConversationMemory(recent=[("user", "Outlook asks for my password again and again")])
+
+    assert memory.retrieval_query("why?") == "Outlook asks for\nwhy?"
+
+
+def test_trim_summary_drops_the_oldest_lines():
+    lines = ["- User asked: one two", "- Assistant: three four", "- User asked: five six"]
+
+    assert trim_summary(lines, max_tokens=9) == lines[1:]
+    assert trim_summary(lines, max_tokens=14) == lines
+    assert trim_summary(lines, max_tokens=2) == []
+
+
+def test_summary_line_keeps_the_question_and_the_first_sentence():
+    assert summary_line("user", "How   do I\nconnect?") == "- User asked: How do I connect?"
+    assert summary_line("assistant", "Open the client. Then sign in.") == "- Assistant: Open the client."
+    long_reply = " ".join(["word"] * 30) + "."
+    assert summary_line("assistant", long_reply) == "- Assistant: " + " ".join(["word"] * 25) + " ..."
+
+
+def test_fold_moves_the_overflow_into_the_summary():
+    start = datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+    memory = ConversationMemory(
+        conversation_id=uuid.uuid4(),
+        context={"summary": "- User asked: printer offline", "channel": "web"},
+        overflow=[("user", "VPN drops", start), ("assistant", "Update the client. It fixes it.",
+                                                    start + timedelta(seconds=5))])
+    turn = PendingTurn()
+
+    memory.fold(turn)
+
+    assert memory.summary.splitlines() == ["- User asked: printer offline", "- User asked: VPN drops",
+                                           "- Assistant: Update the client."]
+    assert memory.context["summarized_until"] == (start + timedelta(seconds=5)).isoformat()
+    assert memory.context["channel"] == "web"
+    assert memory.overflow == []
+    assert len(turn.statements) == 1
+    params = turn.statements[0].compile().params
+    assert params["context"] == memory.context
+
+
+def test_fold_without_overflow_writes_nothing():
+    memory = ConversationMemory(conversation_id=uuid.uuid4(), context={"summary": "- User asked: VPN"})
+    turn = PendingTurn()
+
+    memory.fold(turn)
+
+    assert turn.statements == []
+    assert memory.summary == "- User asked: VPN"
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.llm_services import embedding_cache
+from app.llm_services.embedding_cache import CachedQueryEmbedder, normalize_query
+
+
+class CountingEmbedder:
+    model = "counting"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(embedding_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_normalize_query_folds_case_whitespace_and_trailing_punctuation():
+    assert normalize_query("  MFA   not working?! ") == "mfa not working"
+    assert normalize_query("mfa not working") == "mfa not working"
+    # punctuation inside the question is kept
+    assert normalize_query("What is 2.5?") == "what is 2.5"
+
+
+def test_repeated_query_is_served_from_memory():
+    embedder = CountingEmbedder()
+    cache = CachedQueryEmbedder(embedder, max_size=10, ttl_seconds=60)
+
+    first = cache.embed_query("MFA not working?")
+    second = cache.embed_query("mfa  not working")
+
+    assert first == second
+    assert embedder.calls == ["MFA not working?"]
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    embedder = CountingEmbedder()
+    cache = CachedQueryEmbedder(embedder, max_size=2, ttl_seconds=60)
+
+    cache.embed_query("a question")
+    cache.embed_query("b question")
+    cache.embed_query("a question")  # a is now the most recent
+    cache.embed_query("c question")  # evicts b
+
+    assert cache.stats()["size"] == 2
+    cache.embed_query("a question")
+    assert embedder.calls.count("a question") == 1
+    cache.embed_query("b question")
+    assert embedder.calls.count("b question") == 2
+
+
+def test_expired_entry_is_embedded_again(clock):
+    embedder = CountingEmbedder()
+    cache = CachedQueryEmbedder(embedder, max_size=10, ttl_seconds=60)
+
+    cache.embed_query("vpn drops")
+    clock.now += 59
+    cache.embed_query("vpn drops")
+    assert len(embedder.calls) == 1
+
+    clock.now += 2
+    cache.embed_query("vpn drops")
+    assert len(embedder.calls) == 2
+
+
+def test_clear_invalidates_every_entry():
+    embedder = CountingEmbedder()
+    cache = CachedQueryEmbedder(embedder, max_size=10, ttl_seconds=60)
+
+    cache.embed_query("reset password")
+    cache.clear()
+    assert cache.stats()["size"] == 0
+
+    cache.embed_query("reset password")
+    assert len(embedder.calls) == 2
+
+
+def test_cache_key_depends_on_the_model():
+    other = CountingEmbedder()
+    other.model = "other"
+    first = CachedQueryEmbedder(CountingEmbedder())
+    second = CachedQueryEmbedder(other)
+
+    assert first.cache_key("vpn") == first.cache_key(" VPN? ")
+    assert first.cache_key("vpn") != second.cache_key("vpn")
+
+
+def test_async_path_shares_the_memory_tier():
+    embedder = CountingEmbedder()
+    cache = CachedQueryEmbedder(embedder, max_size=10, ttl_seconds=60)
+
+    cache.embed_query("lab vm is slow")
+    assert asyncio.run(cache.aembed_query("Lab VM is slow.")) == cache.embed_query("lab vm is slow")
+    assert len(embedder.calls) == 1
+
+
+def test_unknown_persistence_is_rejected():
+    with pytest.raises(ValueError):
+        CachedQueryEmbedder(CountingEmbedder(), persist="redis")
+
+
+def test_embedder_can_be_resolved_per_call():
+    embedders = [CountingEmbedder()]
+    cache = CachedQueryEmbedder(lambda: embedders[-1], max_size=10, ttl_seconds=60)
+
+    cache.embed_query("reset mfa")
+    # e.g. the provider registry was closed and rebuilt its clients
+    embedders.append(CountingEmbedder())
+    cache.embed_query("vpn drops")
+
+    assert [e.calls for e in embedders] == [["reset mfa"], ["vpn drops"]]
+    assert cache.model == "CountingEmbedder:counting"
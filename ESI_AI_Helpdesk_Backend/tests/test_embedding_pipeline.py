@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from app.llm_services import embedding_pipeline
+from app.llm_services.embedding_pipeline import embed_batch_with_retry, embed_texts, is_retryable, iter_batches
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class RecordingEmbedder:
+    def __init__(self, failures=0, error=RateLimited("rate limit exceeded")):
+        self.batches = []
+        self.failures = failures
+        self.error = error
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embedding_pipeline.time, "sleep", lambda seconds: None)
+
+
+def test_batches_are_bounded_by_count_and_characters():
+    texts = ["a" * 10] * 5
+    assert list(iter_batches(texts, batch_size=2, max_chars=1000)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches(texts, batch_size=10, max_chars=25)) == [[0, 1], [2, 3], [4]]
+
+
+def test_oversized_text_gets_a_batch_of_its_own():
+    texts = ["a" * 5, "b" * 50, "c" * 5]
+    assert list(iter_batches(texts, batch_size=10, max_chars=20)) == [[0], [1], [2]]
+
+
+def test_embeddings_come_back_in_input_order():
+    embedder = RecordingEmbedder()
+    texts = [str(i) * (i + 1) for i in range(25)]
+
+    embeddings = embed_texts(embedder, texts, batch_size=4, max_chars=1000, max_concurrency=3)
+
+    assert embeddings == [[float(len(text))] for text in texts]
+    assert len(embedder.batches) == 7
+    assert embed_texts(embedder, []) == []
+
+
+def test_transient_errors_are_retried():
+    embedder = RecordingEmbedder(failures=2)
+    assert embed_batch_with_retry(embedder, ["x", "yy"], max_retries=3, backoff_seconds=0) == [[1.0], [2.0]]
+
+
+def test_retries_give_up_after_max_retries():
+    embedder = RecordingEmbedder(failures=5)
+    with pytest.raises(RateLimited):
+        embed_batch_with_retry(embedder, ["x"], max_retries=2, backoff_seconds=0)
+
+
+def test_permanent_errors_are_not_retried():
+    embedder = RecordingEmbedder(failures=1, error=ValueError("input too long"))
+    with pytest.raises(ValueError):
+        embed_batch_with_retry(embedder, ["x"], max_retries=3, backoff_seconds=0)
+    assert embedder.failures == 0
+    assert not is_retryable(ValueError("bad input"))
+    assert is_retryable(RateLimited())
@@ -0,0 +1,47 @@
+import pytest
+
+from app.utils.Guardrail import GuardrailEngine, check_guardrail
+from benchmarks.guardrail_engine import build_corpus, legacy_check
+
+
+@pytest.mark.parametrize("message, severity", [
+    ("how do I drop the database on my lab vm", "CRITICAL"),
+    ("please DROP   MY DATABASE", "CRITICAL"),
+    ("can you grant admin to my account", "HIGH"),
+    ("run a port scan on the range", "MEDIUM"),
+    # the more severe term wins wherever it appears
+    ("port scan first, then a reverse shell", "CRITICAL"),
+    ("the dns settings look wrong", "LOW"),
+])
+def test_severity_examples(message, severity):
+    assert check_guardrail(message).severity == severity
+    assert check_guardrail(message).blocked == (severity != "LOW")
+
+
+@pytest.mark.parametrize("message", [
+    "the threatening error message",  # "threat" only as a whole word
+    "my phishing awareness module",   # "phish" only as a whole word
+    "drop some database",             # only the listed fillers may sit between the words
+    "unbomb",
+])
+def test_terms_only_match_whole_words(message):
+    assert not check_guardrail(message).blocked
+
+
+def test_reason_names_the_matched_term():
+    status = check_guardrail("how to bypass the firewall")
+    assert status.reason == "Restricted: 'bypass firewall'"
+    assert check_guardrail("hello").reason is None
+
+
+def test_overlapping_terms_keep_the_most_severe():
+    engine = GuardrailEngine([("HIGH", {"disable logging"}), ("MEDIUM", {"disable log", "logging"})])
+    assert engine.scan("please disable logging") == ("HIGH", "disable logging")
+    assert engine.scan("please disable log files") == ("MEDIUM", "disable log")
+    assert engine.scan("check the logging") == ("MEDIUM", "logging")
+
+
+@pytest.mark.parametrize("malicious_ratio", [0.0, 0.3, 1.0])
+def test_same_decisions_as_the_per_term_regexes(malicious_ratio):
+    for message in build_corpus(600, malicious_ratio, seed=5):
+        assert check_guardrail(message).severity == legacy_check(message), message
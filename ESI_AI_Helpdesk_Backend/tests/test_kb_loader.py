@@ -0,0 +1,187 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import kb_loader
+from app.llm_services.answer_cache import AnswerCache
+from app.models.database import KBDocument, KBSource
+
+
+class FakeKBSession:
+    """In-memory kb_documents / kb_sources for the statements kb_loader sends."""
+
+    def __init__(self):
+        self.sources = {}
+        self.documents = []
+        self.deleted = []
+
+    def get(self, model, key):
+        assert model is KBSource
+        return self.sources.get(key)
+
+    def add(self, row):
+        self.sources[row.kb_id] = row
+
+    def delete(self, row):
+        self.documents.remove(row)
+        self.deleted.append(row)
+
+    def commit(self):
+        pass
+
+    @staticmethod
+    def kb_id_param(statement):
+        # the kb_id compared against doc_metadata['kb_id'] / kb_sources.kb_id
+        return [value for value in statement.compile().params.values() if value != "kb_id"][0]
+
+    def execute(self, statement):
+        if statement.is_delete:
+            kb_id = self.kb_id_param(statement)
+            if statement.table.name == "kb_sources":
+                self.sources.pop(kb_id, None)
+                return SimpleNamespace(rowcount=1)
+            gone = [row for row in self.documents if row.doc_metadata["kb_id"] == kb_id]
+            for row in gone:
+                self.documents.remove(row)
+            return SimpleNamespace(rowcount=len(gone))
+
+        entity = statement.column_descriptions[0]
+        if entity["entity"] is KBDocument and entity["name"] == "KBDocument":
+            kb_id = self.kb_id_param(statement)
+            rows = [row for row in self.documents if row.doc_metadata["kb_id"] == kb_id]
+        elif entity["entity"] is KBSource:
+            rows = list(self.sources)
+        else:
+            rows = sorted({row.doc_metadata["kb_id"] for row in self.documents})
+        return SimpleNamespace(scalars=lambda: iter(rows))
+
+
+class ParagraphSplitter:
+    def split_text(self, body):
+        return [part.strip() for part in body.split("\n\n") if part.strip()]
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    db = FakeKBSession()
+    embedded = []
+
+    def embed_texts(embedder, texts):
+        embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def write_kb_documents(session, rows):
+        session.documents.extend(KBDocument(**row) for row in rows)
+
+    monkeypatch.setattr(kb_loader, "make_splitter", ParagraphSplitter)
+    monkeypatch.setattr(kb_loader, "embed_texts", embed_texts)
+    monkeypatch.setattr(kb_loader, "write_kb_documents", write_kb_documents)
+    monkeypatch.setattr(kb_loader, "answer_cache", AnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10,
+                                                               enabled=True))
+    return SimpleNamespace(db=db, dir=tmp_path, embedded=embedded)
+
+
+def write_article(directory, kb_id, *paragraphs, title="VPN access"):
+    path = directory / f"{kb_id}.md"
+    path.write_text(f"---\nid: {kb_id}\ntitle: {title}\nversion: 1\n---\n\n" + "\n\n".join(paragraphs),
+                    encoding="utf-8")
+    return path
+
+
+def load(kb):
+    kb.embedded.clear()
+    return kb_loader.load_kbs(kb.db, created_by="tester", kb_dir=str(kb.dir), embedder=object())
+
+
+def chunks(kb, kb_id):
+    rows = [row for row in kb.db.documents if row.doc_metadata["kb_id"] == kb_id]
+    return {row.chunk_index: row.content for row in rows}
+
+
+def test_first_load_embeds_every_chunk(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.", "Sign in with SSO.")
+
+    report = load(kb)
+
+    assert report["files_added"] == 1 and report["chunks_added"] == 2
+    assert kb.embedded == ["Install the client.", "Sign in with SSO."]
+    assert chunks(kb, "KB-VPN") == {"0": "Install the client.", "1": "Sign in with SSO."}
+    assert kb.db.sources["KB-VPN"].chunk_count == 2
+
+
+def test_unchanged_file_is_skipped_by_its_hash(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.", "Sign in with SSO.")
+    load(kb)
+
+    report = load(kb)
+
+    assert report["files_skipped"] == 1 and report["chunks_skipped"] == 2
+    assert report["chunks_added"] == 0 and kb.embedded == []
+
+
+def test_changed_file_embeds_only_new_chunks(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.", "Sign in with SSO.", "Call the help desk.")
+    load(kb)
+    kept = next(row for row in kb.db.documents if row.content == "Sign in with SSO.")
+
+    # a paragraph added in front, one edited, one removed
+    write_article(kb.dir, "KB-VPN", "Check your network.", "Sign in with SSO.", "Install the 2.0 client.")
+    report = load(kb)
+
+    assert kb.embedded == ["Check your network.", "Install the 2.0 client."]
+    assert report["files_updated"] == 1
+    assert report["chunks_added"] == 2 and report["chunks_skipped"] == 1 and report["chunks_removed"] == 2
+    assert chunks(kb, "KB-VPN") == {"0": "Check your network.", "1": "Sign in with SSO.",
+                                    "2": "Install the 2.0 client."}
+    # the unchanged chunk keeps its row (and embedding), only its position moves
+    assert kept in kb.db.documents and kept.chunk_index == "1"
+    assert {row.content for row in kb.db.deleted} == {"Install the client.", "Call the help desk."}
+
+
+def test_force_re_embeds_unchanged_files(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.")
+    load(kb)
+
+    kb.embedded.clear()
+    report = kb_loader.load_kbs(kb.db, created_by="tester", replace_existing=True, kb_dir=str(kb.dir),
+                                embedder=object())
+
+    assert kb.embedded == ["Install the client."]
+    assert report["chunks_removed"] == 1 and report["chunks_added"] == 1
+    assert chunks(kb, "KB-VPN") == {"0": "Install the client."}
+
+
+def test_removed_file_drops_its_chunks_and_source(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.")
+    mfa = write_article(kb.dir, "KB-MFA", "Enroll a second factor.", title="MFA")
+    load(kb)
+
+    mfa.unlink()
+    report = load(kb)
+
+    assert report["files_removed"] == 1 and report["chunks_removed"] == 1
+    assert chunks(kb, "KB-MFA") == {} and "KB-MFA" not in kb.db.sources
+    assert chunks(kb, "KB-VPN") == {"0": "Install the client."}
+
+
+def retrieved(kb_id):
+    return [{"doc": SimpleNamespace(metadata={"kb_id": kb_id, "version": 1}), "id": f"{kb_id}-c0"}]
+
+
+def test_answers_built_on_changed_or_removed_articles_are_invalidated(kb):
+    write_article(kb.dir, "KB-VPN", "Install the client.")
+    mfa = write_article(kb.dir, "KB-MFA", "Enroll a second factor.", title="MFA")
+    write_article(kb.dir, "KB-DNS", "Flush the resolver cache.", title="DNS")
+    load(kb)
+
+    cache = kb_loader.answer_cache
+    for kb_id, embedding in (("KB-VPN", [1.0, 0.0]), ("KB-MFA", [0.0, 1.0]), ("KB-DNS", [0.7, 0.7])):
+        cache.store(embedding, "trainee", retrieved(kb_id), f"{kb_id} answer", 0.9, 1.0)
+
+    write_article(kb.dir, "KB-VPN", "Install the 2.0 client.")
+    mfa.unlink()
+    load(kb)
+
+    assert cache.lookup([1.0, 0.0], "trainee", retrieved("KB-VPN")) is None
+    assert cache.lookup([0.0, 1.0], "trainee", retrieved("KB-MFA")) is None
+    assert cache.lookup([0.7, 0.7], "trainee", retrieved("KB-DNS")).answer == "KB-DNS answer"
@@ -0,0 +1,85 @@
+import json
+import struct
+import uuid
+
+from app.kb_writer import COPY_COLUMNS, COPY_HEADER, COPY_TRAILER, CopyStream, encode_row
+
+
+def decode_rows(payload: bytes):
+    # minimal reader for the PGCOPY binary format
+    assert payload.startswith(COPY_HEADER)
+    assert payload.endswith(COPY_TRAILER)
+    offset, rows = len(COPY_HEADER), []
+    while True:
+        (count,) = struct.unpack_from(">h", payload, offset)
+        offset += 2
+        if count == -1:
+            break
+        fields = []
+        for _ in range(count):
+            (length,) = struct.unpack_from(">i", payload, offset)
+            offset += 4
+            if length == -1:
+                fields.append(None)
+                continue
+            fields.append(payload[offset:offset + length])
+            offset += length
+        rows.append(dict(zip(COPY_COLUMNS, fields)))
+    assert offset == len(payload)
+    return rows
+
+
+def row(**values):
+    return {"title": "VPN", "content": "Reconnect the VPN.", "embedding": [0.5, -1.0, 2.25], **values}
+
+
+def read_all(stream, size):
+    chunks = []
+    while True:
+        data = stream.read(size)
+        if not data:
+            return b"".join(chunks)
+        chunks.append(data)
+
+
+def test_row_fields_use_the_postgres_binary_formats():
+    doc_id, original_id = uuid.uuid4(), uuid.uuid4()
+    encoded = encode_row(row(id=doc_id, original_doc_id=str(original_id), chunk_index=3,
+                             doc_metadata={"kb_id": "KB-VPN", "tags": ["vpn"]}, created_by="admin"))
+    (fields,) = decode_rows(COPY_HEADER + encoded + COPY_TRAILER)
+
+    assert uuid.UUID(bytes=fields["id"]) == doc_id
+    assert uuid.UUID(bytes=fields["original_doc_id"]) == original_id
+    assert fields["title"] == b"VPN"
+    assert fields["chunk_index"] == b"3"
+    assert fields["created_by"] == b"admin"
+    assert fields["updated_by"] is None
+    assert fields["content_hash"] is None
+
+    # jsonb: version 1, then the json text
+    assert fields["doc_metadata"][:1] == b"\x01"
+    assert json.loads(fields["doc_metadata"][1:]) == {"kb_id": "KB-VPN", "tags": ["vpn"]}
+
+    # pgvector: dim, unused, big-endian float4s
+    dim, unused = struct.unpack_from(">HH", fields["embedding"])
+    assert (dim, unused) == (3, 0)
+    assert struct.unpack_from(">3f", fields["embedding"], 4) == (0.5, -1.0, 2.25)
+
+
+def test_missing_id_and_metadata_get_defaults():
+    (fields,) = decode_rows(COPY_HEADER + encode_row(row()) + COPY_TRAILER)
+    assert uuid.UUID(bytes=fields["id"]).version == 4
+    assert json.loads(fields["doc_metadata"][1:]) == {}
+
+
+def test_copy_stream_is_the_same_for_any_read_size():
+    rows = [row(id=uuid.uuid4(), content="chunk %d " % i * 20) for i in range(50)]
+    whole = CopyStream(rows).read()
+
+    assert read_all(CopyStream(rows), 7) == whole
+    assert read_all(CopyStream(rows), 1 << 20) == whole
+    assert [r["content"].decode() for r in decode_rows(whole)] == [r["content"] for r in rows]
+
+
+def test_empty_copy_is_header_and_trailer():
+    assert CopyStream([]).read() == COPY_HEADER + COPY_TRAILER
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from app.apis.pydantic_models import SeverityLevel, TierLevel
+from app.llm_services import escalate_classifier as ec
+from app.llm_services.escalate_classifier import KeywordMatcher, match_keywords
+from benchmarks.classifier_matcher import build_messages, legacy_turn, matcher_turn
+
+
+def naive_match(categories, message):
+    # the per-phrase scans the matcher replaced
+    msg = message.lower()
+    hits = {}
+    for category, phrases in categories.items():
+        for phrase in phrases:
+            if phrase.lower() in msg:
+                hits.setdefault(category, set()).add(phrase.lower())
+    return hits
+
+
+def test_overlapping_and_prefix_phrases_all_match():
+    categories = {"a": ["disable log", "disable logging"], "b": ["log", "logging issue"], "c": ["ging"]}
+    matcher = KeywordMatcher(categories)
+    message = "Please DISABLE LOGGING issue now"
+
+    assert matcher.match(message) == naive_match(categories, message)
+    assert matcher.match(message)["a"] == {"disable log", "disable logging"}
+    assert matcher.match("nothing relevant") == {}
+
+
+def test_phrase_in_several_categories_reports_each():
+    hits = match_keywords("kernel panic with a stack trace")
+    assert {"kernel panic", "stack trace"} <= hits["force_tier2"]
+    assert {"kernel panic", "stack trace"} <= hits["force_tier3_high"]
+
+
+def test_matches_the_per_phrase_scans_on_random_messages():
+    rng = random.Random(3)
+    phrases = [p for phrases in ec.KEYWORD_CATEGORIES.values() for p in phrases]
+    for _ in range(500):
+        parts = [rng.choice(phrases) if rng.random() < 0.3 else rng.choice(["the", "vm", "is", "down", "x"])
+                 for _ in range(rng.randint(1, 12))]
+        # glue some phrases together so matches overlap
+        message = ("" if rng.random() < 0.3 else " ").join(parts)
+        if rng.random() < 0.2:
+            message = message.upper()
+        assert match_keywords(message) == naive_match(ec.KEYWORD_CATEGORIES, message), message
+
+
+@pytest.mark.parametrize("kb_coverage", [True, False])
+def test_tier_severity_and_frustration_decisions_are_unchanged(kb_coverage):
+    for message in build_messages(1000, seed=11):
+        assert matcher_turn(message, kb_coverage) == legacy_turn(message, kb_coverage), message
+
+
+@pytest.mark.parametrize("message, tier, severity", [
+    ("My VM shows a kernel panic", TierLevel.TIER_3, SeverityLevel.LOW),
+    ("How do I reset MFA on my new phone?", TierLevel.TIER_2, SeverityLevel.LOW),
+    ("Production down, full outage", TierLevel.TIER_3, SeverityLevel.CRITICAL),
+    ("I already tried that and it is still not working", TierLevel.TIER_3, SeverityLevel.LOW),
+    ("general inquiry about the labs", TierLevel.TIER_1, SeverityLevel.LOW),
+])
+def test_classification_examples(message, tier, severity):
+    hits = match_keywords(message)
+    repeated = ec.is_repeated_failure(hits)
+    assert ec.classify_severity(message, hits=hits) == severity
+    assert ec.classify_tier(message, severity, True, repeated_failure=repeated, hits=hits) == tier
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+
+from app.llm_services.llm_factory import PooledChatAnthropic
+
+
+def model(**clients):
+    return PooledChatAnthropic(anthropic_api_key="test", anthropic_api_url="https://api.anthropic.com",
+                               model="claude-3-sonnet-20240229", max_retries=0, **clients)
+
+
+def test_anthropic_requests_go_through_the_shared_clients():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-3-sonnet-20240229",
+            "content": [{"type": "text", "text": "Reconnect the VPN."}], "stop_reason": "end_turn",
+            "usage": {"input_tokens": 3, "output_tokens": 4}})
+
+    transport = httpx.MockTransport(handler)
+    llm = model(http_client=httpx.Client(transport=transport),
+                http_async_client=httpx.AsyncClient(transport=transport))
+
+    assert llm.invoke("hi").content == "Reconnect the VPN."
+    assert asyncio.run(llm.ainvoke("hi")).content == "Reconnect the VPN."
+    assert [str(r.url) for r in requests] == ["https://api.anthropic.com/v1/messages"] * 2
+
+
+def test_anthropic_without_shared_clients_keeps_its_own_pool():
+    llm = model()
+    assert llm._client._client is not None
+    assert llm._client is llm._client
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from app import metrics_rollup
+from app.metrics_rollup import backfill_rollups, backfill_until, floor_hour
+
+
+class ScalarSession:
+    """Answers the rollup's min() queries: the first event, then the earliest bucket."""
+
+    def __init__(self, first_event, earliest_bucket):
+        self.values = {"firsts": first_event, "metrics_hourly": earliest_bucket}
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        value = next(v for table, v in self.values.items() if table in sql)
+        return type("Result", (), {"scalar": lambda self: value})()
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_floor_hour_is_utc():
+    assert floor_hour(datetime(2026, 3, 1, 10, 45)) == utc(2026, 3, 1, 10)
+    assert floor_hour(datetime(2026, 3, 1, 10, 45, tzinfo=timezone(timedelta(hours=2)))) == utc(2026, 3, 1, 8)
+
+
+def test_backfill_until():
+    first = utc(2026, 1, 5, 9, 30)
+    # no data: nothing to do
+    assert backfill_until(ScalarSession(None, None)) is None
+    # empty rollups: everything up to now
+    assert backfill_until(ScalarSession(first, None)) > first
+    # only the trailing window (or an interrupted backfill): up to its first bucket
+    assert backfill_until(ScalarSession(first, utc(2026, 3, 1, 7))) == utc(2026, 3, 1, 7)
+    # complete
+    assert backfill_until(ScalarSession(first, utc(2026, 1, 5, 9))) is None
+
+
+def test_backfill_walks_days_newest_first(monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(metrics_rollup, "first_event", lambda db: utc(2026, 1, 5, 9, 30))
+    monkeypatch.setattr(metrics_rollup, "refresh_rollups",
+                        lambda db, since, until: refreshed.append((since, until)) or True)
+
+    backfill_rollups(db=None, until=utc(2026, 1, 8, 7))
+
+    assert [since.day for since, _ in refreshed] == [8, 7, 6, 5]
+    assert all(until - since == timedelta(days=1) for since, until in refreshed)
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.llm_services import providers as providers_module
+from app.llm_services.onnx_embeddings import OnnxEmbeddings
+from app.llm_services.providers import ProviderRegistry
+
+PAD_ID = 0
+
+
+class StubTokenizer:
+    """One id per word (its length), padded to the longest text of the batch."""
+
+    def encode_batch(self, texts):
+        ids = [[len(word) for word in text.split()] for text in texts]
+        width = max(len(row) for row in ids)
+        return [SimpleNamespace(ids=row + [PAD_ID] * (width - len(row)),
+                                attention_mask=[1] * len(row) + [0] * (width - len(row)),
+                                type_ids=[0] * width)
+                for row in ids]
+
+
+class StubSession:
+    """last_hidden_state: token id k -> [k, 1, 0]; padding -> a vector that would skew any unmasked mean."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, output_names, feeds):
+        ids = feeds["input_ids"]
+        self.batches.append(feeds["attention_mask"].sum(axis=1).tolist())
+        hidden = np.stack([ids, np.ones_like(ids), np.zeros_like(ids)], axis=-1).astype(np.float32)
+        hidden[ids == PAD_ID] = [1000.0, -1000.0, 500.0]
+        return [hidden]
+
+
+def stub_model(**options):
+    model = OnnxEmbeddings(model_dir="models/stub", **options)
+    model._session = StubSession()
+    model._tokenizer = StubTokenizer()
+    model._input_names = ("input_ids", "attention_mask", "token_type_ids")
+    return model
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+
+def test_mean_pooling_ignores_padding():
+    model = stub_model(batch_size=8)
+
+    short, long = model.embed_documents(["abc", "a abcde fg"])
+
+    # "abc" is padded to three tokens in this batch; only its one real token counts
+    np.testing.assert_allclose(short, unit([3, 1, 0]), rtol=1e-6)
+    np.testing.assert_allclose(long, unit([(1 + 5 + 2) / 3, 1, 0]), rtol=1e-6)
+
+
+def test_cls_pooling_takes_the_first_token():
+    model = stub_model(pooling="cls")
+
+    np.testing.assert_allclose(model.embed_query("abcd ab"), unit([4, 1, 0]), rtol=1e-6)
+
+
+def test_vectors_are_unit_norm():
+    model = stub_model()
+
+    for vector in model.embed_documents(["a", "abcdefgh ijk", "lorem ipsum dolor sit amet"]):
+        assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_order_is_kept_across_length_sorted_batches():
+    texts = ["a", "abc de fgh ij", "ab", "abcd efg", "abcdef g h i j k"]
+    batched = stub_model(batch_size=2)
+    single = stub_model(batch_size=1)
+
+    embeddings = batched.embed_documents(texts)
+
+    assert embeddings == [single.embed_documents([text])[0] for text in texts]
+    # longest texts first (by characters), two per batch; the tokens counted per row
+    assert batched._session.batches == [[6, 4], [2, 1], [1]]
+
+
+def test_prefixes_and_empty_input():
+    model = stub_model(query_prefix="query: ", document_prefix="passage: ")
+
+    assert model.embed_documents([]) == []
+    # the prefix is one more 6-letter token in front of the text
+    np.testing.assert_allclose(model.embed_query("abc"), unit([(6 + 3) / 2, 1, 0]), rtol=1e-6)
+
+
+def test_unknown_pooling_is_rejected():
+    with pytest.raises(ValueError):
+        OnnxEmbeddings(pooling="max")
+
+
+def test_warm_up_reports_the_dimension_checked_at_startup(monkeypatch):
+    model = stub_model()
+    assert model.warm_up() == 3
+
+    monkeypatch.setattr(providers_module, "get_llm", lambda *clients: object())
+    monkeypatch.setattr(providers_module, "get_embedder", lambda *clients: stub_model())
+    monkeypatch.setattr(providers_module, "EMBEDDING_DIM", 384)
+    registry = ProviderRegistry()
+
+    async def start():
+        try:
+            await registry.start()
+        finally:
+            await registry.aclose()
+
+    with pytest.raises(RuntimeError, match="returns 3 dimensions but EMBEDDING_DIM is 384"):
+        asyncio.run(start())
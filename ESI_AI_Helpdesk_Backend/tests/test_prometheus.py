@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.utils.prometheus import CHAT_STAGE_SECONDS, CHAT_TURNS, SampleCollector, render_metrics
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def families(payload: bytes) -> dict:
+    return {family.name: family for family in text_string_to_metric_families(payload.decode("utf-8"))}
+
+
+def sample(family, name, **labels):
+    return next(s.value for s in family.samples if s.name == name and s.labels == labels)
+
+
+def test_counters_and_histograms_parse_as_exposition_format():
+    before = families(render_metrics())
+    turns_before = next((s.value for s in before["helpdesk_chat_turns"].samples
+                         if s.labels == {"outcome": "answered"}), 0.0)
+
+    CHAT_TURNS.labels(outcome="answered").inc()
+    CHAT_STAGE_SECONDS.labels(stage="unit_test").observe(0.003)
+    CHAT_STAGE_SECONDS.labels(stage="unit_test").observe(42.0)
+
+    parsed = families(render_metrics())
+    assert parsed["helpdesk_chat_turns"].type == "counter"
+    assert sample(parsed["helpdesk_chat_turns"], "helpdesk_chat_turns_total", outcome="answered") == turns_before + 1
+
+    stage = parsed["helpdesk_chat_stage_seconds"]
+    assert stage.type == "histogram"
+    # buckets are cumulative and end with +Inf == count
+    assert sample(stage, "helpdesk_chat_stage_seconds_bucket", stage="unit_test", le="0.0025") == 0
+    assert sample(stage, "helpdesk_chat_stage_seconds_bucket", stage="unit_test", le="0.005") == 1
+    assert sample(stage, "helpdesk_chat_stage_seconds_bucket", stage="unit_test", le="30.0") == 1
+    assert sample(stage, "helpdesk_chat_stage_seconds_bucket", stage="unit_test", le="+Inf") == 2
+    assert sample(stage, "helpdesk_chat_stage_seconds_count", stage="unit_test") == 2
+    assert sample(stage, "helpdesk_chat_stage_seconds_sum", stage="unit_test") == 42.003
+
+
+def test_scrape_time_samples_are_escaped():
+    collector = SampleCollector("helpdesk_test_requests", "Lookups", "counter", ["cache", "result"],
+                                lambda: [({"cache": 'quote " and \\ back\nslash', "result": "hit"}, 3)])
+    gauge = SampleCollector("helpdesk_test_depth", "Depth", "gauge", [], lambda: [({}, 7)])
+
+    parsed = families(render_metrics(collector, gauge))
+    assert sample(parsed["helpdesk_test_requests"], "helpdesk_test_requests_total",
+                  cache='quote " and \\ back\nslash', result="hit") == 3
+    assert parsed["helpdesk_test_depth"].type == "gauge"
+    assert sample(parsed["helpdesk_test_depth"], "helpdesk_test_depth") == 7
+
+
+def test_multiprocess_scrape_sums_every_worker(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(BACKEND)}
+    worker = ("from app.utils.prometheus import CHAT_TURNS\n"
+              "CHAT_TURNS.labels(outcome='answered').inc({})")
+    for amount in (2, 3):
+        subprocess.run([sys.executable, "-c", worker.format(amount)], env=env, check=True, cwd=BACKEND)
+
+    scrape = ("import sys\nfrom app.utils.prometheus import render_metrics\n"
+              "sys.stdout.write(render_metrics().decode())")
+    output = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, cwd=BACKEND,
+                            capture_output=True).stdout
+    parsed = families(output)
+    assert sample(parsed["helpdesk_chat_turns"], "helpdesk_chat_turns_total", outcome="answered") == 5
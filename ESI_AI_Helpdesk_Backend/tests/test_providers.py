@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.llm_services import providers as providers_module
+from app.llm_services.providers import ProviderRegistry
+
+
+class Embedder:
+    model = "stub"
+
+    def __init__(self, dimension=1536):
+        self.dimension = dimension
+
+    def warm_up(self):
+        return self.dimension
+
+
+def test_retriever_import_builds_no_client(monkeypatch):
+    # the module-level query embedder resolves the registry's client per call
+    from app.llm_services import retriever
+
+    registry = ProviderRegistry()
+    monkeypatch.setattr(retriever, "providers", registry)
+    assert registry._embedder is None
+    assert retriever.embedder.embedder is registry.embedder
+
+
+def test_start_builds_the_clients_and_aclose_resets_them(monkeypatch):
+    built = []
+    monkeypatch.setattr(providers_module, "get_llm", lambda *clients: built.append(("llm", clients)) or object())
+    monkeypatch.setattr(providers_module, "get_embedder",
+                        lambda *clients: built.append(("embedder", clients)) or Embedder())
+    monkeypatch.setattr(providers_module, "EMBEDDING_DIM", 1536)
+    registry = ProviderRegistry()
+
+    async def restart():
+        await registry.start()
+        first_llm, (http_client, http_async_client) = registry.llm, built[0][1]
+        await registry.aclose()
+        assert registry._llm is None and registry._embedder is None
+        assert http_client.is_closed and http_async_client.is_closed
+
+        await registry.start()
+        assert registry.llm is not first_llm
+        assert not any(client.is_closed for client in built[-1][1])
+        await registry.aclose()
+
+    asyncio.run(restart())
+    assert [kind for kind, _ in built] == ["llm", "embedder", "llm", "embedder"]
+
+
+def test_start_rejects_an_embedding_dimension_mismatch(monkeypatch):
+    monkeypatch.setattr(providers_module, "get_llm", lambda *clients: object())
+    monkeypatch.setattr(providers_module, "get_embedder", lambda *clients: Embedder(dimension=384))
+    monkeypatch.setattr(providers_module, "EMBEDDING_DIM", 1536)
+    registry = ProviderRegistry()
+
+    async def start():
+        try:
+            await registry.start()
+        finally:
+            await registry.aclose()
+
+    with pytest.raises(RuntimeError, match="384 dimensions"):
+        asyncio.run(start())
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from app.utils import session_cache as session_cache_module
+from app.utils.session_cache import Principal, SessionCache, hash_token
+
+
+def principal(session_id="s1", user_id="u1", role_level=1):
+    return Principal(session_id=session_id, user_id=user_id, email=f"{user_id}@esi.com", full_name="Trainee",
+                     role_name="trainee", role_level=role_level, claims={"sub": "stale", "exp": 123})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_principal_reads_like_the_jwt_payload():
+    p = principal(role_level=3)
+    assert p["sub"] == "u1"
+    assert p.get("role_level") == 3
+    assert p.get("exp") == 123
+    assert p.get("missing", "x") == "x"
+
+
+def test_hit_until_ttl_then_miss(clock):
+    cache = SessionCache(ttl_seconds=30, max_size=10)
+    cache.put(hash_token("t1"), principal())
+
+    clock[0] += 29
+    assert cache.get(hash_token("t1")).user_id == "u1"
+    clock[0] += 2
+    assert cache.get(hash_token("t1")) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_ttl_never_outlives_the_token():
+    cache = SessionCache(ttl_seconds=300, max_size=10)
+    cache.put("expired", principal(), token_expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+    cache.put("fresh", principal(), token_expires_at=time.time() + 60)
+    assert cache.get("fresh") is not None
+
+
+def test_least_recently_used_token_is_evicted():
+    cache = SessionCache(ttl_seconds=300, max_size=2)
+    cache.put("a", principal("s1"))
+    cache.put("b", principal("s2"))
+    cache.get("a")
+    cache.put("c", principal("s3"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_invalidation_by_token_session_and_user():
+    cache = SessionCache(ttl_seconds=300, max_size=10)
+    cache.put("a", principal("s1", "u1"))
+    cache.put("b", principal("s2", "u1"))
+    cache.put("c", principal("s3", "u2"))
+    cache.put("d", principal("s4", "u3"))
+
+    assert cache.invalidate_token("a") == 1
+    assert cache.invalidate_session("s3") == 1
+    assert cache.invalidate_user("u1") == 1
+    assert [key for key in "abcd" if cache.get(key)] == ["d"]
+    assert cache.stats()["invalidations"] == 3
+
+    cache.clear()
+    assert cache.get("d") is None
@@ -0,0 +1,95 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.utils.stage_graph import StageGraph
+
+
+async def value_after(value, seconds=0):
+    await asyncio.sleep(seconds)
+    return value
+
+
+async def fail(message):
+    raise RuntimeError(message)
+
+
+def test_stages_run_concurrently_and_can_await_each_other():
+    async def scenario():
+        async with StageGraph() as graph:
+            graph.start("context", value_after("conversation", 0.2))
+
+            async def memory():
+                return f"memory of {await graph.result('context')}"
+
+            graph.start("memory", memory())
+            graph.start("retrieval", value_after("documents", 0.2))
+            started = asyncio.get_running_loop().time()
+            results = await asyncio.gather(graph.result("memory"), graph.result("retrieval"))
+            return results, asyncio.get_running_loop().time() - started
+
+    (memory, documents), elapsed = asyncio.run(scenario())
+    assert memory == "memory of conversation" and documents == "documents"
+    assert elapsed < 0.35  # not 0.2 + 0.2
+
+
+def test_cancel_stops_a_speculative_stage():
+    async def scenario():
+        async with StageGraph() as graph:
+            task = graph.start("retrieval", value_after("documents", 10))
+            await asyncio.sleep(0)
+            assert graph.cancel("retrieval") is True
+            with pytest.raises(asyncio.CancelledError):
+                await graph.result("retrieval")
+            # unknown and finished stages are not cancelled
+            graph.start("context", value_after("conversation"))
+            await graph.result("context")
+            assert graph.cancel("context") is False
+            assert graph.cancel("missing") is False
+            return task
+
+    assert asyncio.run(scenario()).cancelled()
+
+
+def test_leaving_the_graph_cancels_pending_stages():
+    async def scenario():
+        tasks = []
+        with pytest.raises(ValueError):
+            async with StageGraph() as graph:
+                tasks.append(graph.start("retrieval", value_after("documents", 10)))
+                tasks.append(graph.start("memory", value_after("memory", 10)))
+                raise ValueError("guardrail blocked the turn")
+        return tasks
+
+    assert all(task.cancelled() for task in asyncio.run(scenario()))
+
+
+def test_a_stage_name_starts_once():
+    async def scenario():
+        async with StageGraph() as graph:
+            graph.start("retrieval", value_after("documents"))
+            duplicate = value_after("again")
+            with pytest.raises(ValueError, match="already started"):
+                graph.start("retrieval", duplicate)
+            # the rejected coroutine is closed, not left un-awaited
+            assert duplicate.cr_frame is None
+            return await graph.result("retrieval")
+
+    assert asyncio.run(scenario()) == "documents"
+
+
+def test_failures_nobody_awaited_are_retrieved():
+    errors = []
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        async with StageGraph() as graph:
+            graph.start("retrieval", fail("embedding API down"))
+            await asyncio.sleep(0.01)
+        # no "Task exception was never retrieved" once the task is collected
+        del graph
+        gc.collect()
+
+    asyncio.run(scenario())
+    assert errors == []
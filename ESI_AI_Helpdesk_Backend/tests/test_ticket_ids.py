@@ -0,0 +1,77 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.utils.ticket_ids import allocate_ticket_id, allocate_ticket_id_sync, format_ticket_id
+
+
+class StubSequence:
+    """ticket_id_seq: nextval() hands out each number once, whoever asks."""
+
+    def __init__(self, start=1):
+        self._numbers = itertools.count(start)
+        self._lock = threading.Lock()
+        self.statements = []
+
+    def nextval(self, statement):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.statements.append(sql)
+        assert "nextval('ticket_id_seq')" in sql
+        with self._lock:
+            return next(self._numbers)
+
+
+class AsyncSequenceSession:
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    async def execute(self, statement):
+        # another request runs between sending the query and reading the row
+        await asyncio.sleep(0)
+        number = self.sequence.nextval(statement)
+        await asyncio.sleep(0)
+        return SimpleNamespace(scalar_one=lambda: number)
+
+
+class SyncSequenceSession:
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def execute(self, statement):
+        number = self.sequence.nextval(statement)
+        return SimpleNamespace(scalar_one=lambda: number)
+
+
+@pytest.mark.parametrize("number, ticket_id", [(1, "TICK-00001"), (4821, "TICK-04821"), (123456, "TICK-123456")])
+def test_ticket_id_format(number, ticket_id):
+    assert format_ticket_id(number) == ticket_id
+
+
+def test_concurrent_escalations_get_distinct_ids():
+    sequence = StubSequence(start=41)
+
+    async def escalate_all():
+        # one session per request, as in the chat endpoint
+        return await asyncio.gather(*(allocate_ticket_id(AsyncSequenceSession(sequence)) for _ in range(50)))
+
+    ids = asyncio.run(escalate_all())
+
+    assert len(set(ids)) == 50
+    assert sorted(ids) == [format_ticket_id(n) for n in range(41, 91)]
+    # one round trip per ticket, no read of the latest ticket
+    assert len(sequence.statements) == 50
+
+
+def test_sync_allocation_across_threads_is_unique():
+    sequence = StubSequence()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda _: allocate_ticket_id_sync(SyncSequenceSession(sequence)), range(200)))
+
+    assert len(set(ids)) == 200
+    assert all(ticket_id.startswith("TICK-") for ticket_id in ids)
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.apis.tickets import decode_cursor, encode_cursor, ticket_page
+
+
+def ticket(n):
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=n)
+    return SimpleNamespace(id=f"TICK-{n:05d}", created_at=created_at)
+
+
+class TicketQuery:
+    """Just enough of a Query for ticket_page: newest first, keyset filter, limit."""
+
+    def __init__(self, tickets):
+        self.tickets = sorted(tickets, key=lambda t: (t.created_at, t.id), reverse=True)
+        self.after = None
+        self.limit_value = None
+
+    def filter(self, criterion):
+        created_at, ticket_id = (c.value for c in criterion.right.clauses)
+        self.after = (created_at, ticket_id)
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def limit(self, limit):
+        self.limit_value = limit
+        return self
+
+    def all(self):
+        rows = [t for t in self.tickets if self.after is None or (t.created_at, t.id) < self.after]
+        return rows[:self.limit_value]
+
+
+@pytest.fixture
+def tickets(monkeypatch):
+    rows = [ticket(n) for n in range(45)]
+    monkeypatch.setattr("app.apis.tickets.filtered_tickets", lambda db, *filters: TicketQuery(rows))
+    return rows
+
+
+def test_cursor_round_trip():
+    row = ticket(7)
+    assert decode_cursor(encode_cursor(row)) == (row.created_at, row.id)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "e30=", "eyJ0IjogIm5vdCBhIGRhdGUiLCAiaWQiOiAxfQ=="])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_walk_every_ticket_once(tickets):
+    seen, cursor = [], None
+    while True:
+        page, cursor = ticket_page(db=None, cursor=cursor, limit=20)
+        seen.extend(t.id for t in page)
+        if cursor is None:
+            break
+
+    assert [len(seen), len(set(seen))] == [45, 45]
+    assert seen == [t.id for t in sorted(tickets, key=lambda t: t.created_at, reverse=True)]
+
+
+def test_last_full_page_has_no_next_cursor(tickets):
+    page, cursor = ticket_page(db=None, limit=45)
+    assert len(page) == 45 and cursor is None
@@ -0,0 +1,170 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.models.database import Conversation, Message
+from app.utils import turn_writer as turn_writer_module
+from app.utils.turn_writer import PendingTurn, TurnWriter
+
+
+class RecordingSession:
+    """Stands in for an AsyncSession; records what a write would send."""
+
+    def __init__(self, log, fail=lambda rows: False):
+        self.log = log
+        self.fail = fail
+        self.rows = []
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def add_all(self, rows):
+        self.rows.extend(rows)
+
+    async def execute(self, statement):
+        self.statements.append(str(statement))
+
+    async def commit(self):
+        if self.fail(self.rows):
+            raise RuntimeError("constraint violation")
+        self.log.append((list(self.rows), list(self.statements)))
+
+
+def message(conversation_id, content="hi"):
+    return Message(conversation_id=conversation_id, role="user", content=content)
+
+
+def stored_conversation():
+    conversation = Conversation(id=uuid.uuid4(), session_id=uuid.uuid4(), user_role="trainee")
+    make_transient_to_detached(conversation)
+    return conversation
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_rows_are_stamped_when_added():
+    turn = PendingTurn()
+    stamped = turn.add(message(uuid.uuid4()))
+    assert stamped.created_at is not None
+
+    earlier = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    kept = turn.add(Message(conversation_id=uuid.uuid4(), role="user", content="x", created_at=earlier))
+    assert kept.created_at == earlier
+
+
+def test_only_new_conversations_are_written_with_the_turn():
+    new = Conversation(id=uuid.uuid4(), session_id=uuid.uuid4(), user_role="trainee")
+    turn = PendingTurn()
+    turn.add_if_new(new)
+    turn.add_if_new(stored_conversation())
+    assert turn.rows == [new]
+
+
+@pytest.mark.parametrize("mode, synchronous", [("sync", True), ("relaxed", False)])
+def test_inline_modes_write_the_turn_in_one_commit(mode, synchronous):
+    log = []
+    db = RecordingSession(log)
+    conversation = Conversation(id=uuid.uuid4(), session_id=uuid.uuid4(), user_role="trainee")
+    turn = PendingTurn()
+    turn.add_if_new(conversation)
+    turn.add(message(conversation.id))
+    turn.execute(update(Conversation).where(Conversation.id == conversation.id).values(context={}))
+
+    writer = TurnWriter(mode=mode)
+    run(writer.persist(db, turn))
+    run(writer.persist(db, turn))  # a turn is persisted once
+
+    assert len(log) == 1
+    rows, statements = log[0]
+    assert rows == turn.rows
+    assert any("synchronous_commit = off" in s for s in statements) == (not synchronous)
+    assert any(s.startswith("UPDATE conversations") for s in statements)
+    assert writer.stats()["inline"] == 1
+
+
+def test_empty_turn_is_not_written():
+    log = []
+    run(TurnWriter(mode="sync").persist(RecordingSession(log), PendingTurn()))
+    assert log == []
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TurnWriter(mode="eventual")
+
+
+def test_async_mode_batches_queued_turns(monkeypatch):
+    log = []
+    monkeypatch.setattr(turn_writer_module, "AsyncSessionLocal", lambda: RecordingSession(log))
+
+    async def scenario():
+        writer = TurnWriter(mode="async", queue_size=10, batch_size=10)
+        await writer.start()
+        request_db = RecordingSession(log)
+        turns = []
+        for i in range(3):
+            turn = PendingTurn()
+            turn.add(message(uuid.uuid4(), f"turn {i}"))
+            await writer.persist(request_db, turn)
+            turns.append(turn)
+        queued = writer.stats()["queued"]
+        await writer.stop()
+        return writer, turns, queued
+
+    writer, turns, queued = run(scenario())
+    assert queued == 3
+    assert [row.content for rows, _ in log for row in rows] == ["turn 0", "turn 1", "turn 2"]
+    assert len(log) == 1  # one commit for the whole batch
+    assert writer.stats()["batches"] == 1
+
+
+def test_failed_batch_is_retried_turn_by_turn(monkeypatch):
+    log = []
+    poisoned = lambda rows: any(row.content == "bad" for row in rows)
+    monkeypatch.setattr(turn_writer_module, "AsyncSessionLocal", lambda: RecordingSession(log, poisoned))
+
+    async def scenario():
+        writer = TurnWriter(mode="async", queue_size=10, batch_size=10)
+        await writer.start()
+        for content in ("ok 1", "bad", "ok 2"):
+            turn = PendingTurn()
+            turn.add(message(uuid.uuid4(), content))
+            await writer.persist(None, turn)
+        await writer.stop()
+        return writer
+
+    writer = run(scenario())
+    assert [row.content for rows, _ in log for row in rows] == ["ok 1", "ok 2"]
+    assert writer.stats()["failed"] == 1
+
+
+def test_full_queue_writes_inline(monkeypatch):
+    log = []
+    monkeypatch.setattr(turn_writer_module, "AsyncSessionLocal", lambda: RecordingSession(log))
+
+    async def scenario():
+        writer = TurnWriter(mode="async", queue_size=1, batch_size=1)
+        await writer.start()
+        request_db = RecordingSession(log)
+        # the writer task has not run yet, so the second turn finds the queue full
+        for content in ("queued", "inline"):
+            turn = PendingTurn()
+            turn.add(message(uuid.uuid4(), content))
+            await writer.persist(request_db, turn)
+        stats = writer.stats()
+        await writer.stop()
+        return stats
+
+    stats = run(scenario())
+    assert (stats["queued"], stats["inline"]) == (1, 1)
+    assert sorted(row.content for rows, _ in log for row in rows) == ["inline", "queued"]